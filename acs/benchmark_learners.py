@@ -0,0 +1,125 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from acs.learner import Learner, learners_objectives_matrix, load_learners_score
+
+
+# Compara a leitura por colunas dos alunos e notas com a leitura antiga, que
+# preenchia dicionarios por aluno e as matrizes celula a celula.
+#
+# Para executar:
+# python -m acs.benchmark_learners -n 100 1000 10000 -c 300
+
+_axis_values = [-11, -9, -7, -5, -3, -1, 1, 3, 5, 7, 9, 11]
+
+
+def write_cohort(dirname, num_learners, num_concepts, goals_per_learner, seed=0):
+    rng = random.Random(seed)
+    concepts_keys = ['C{:04d}'.format(concept) for concept in range(num_concepts)]
+
+    learners_filename = os.path.join(dirname, 'learners.csv')
+    learners_score_filename = os.path.join(dirname, 'learners_score.csv')
+
+    with open(learners_filename, 'w') as learners_file, open(learners_score_filename, 'w') as learners_score_file:
+        for learner in range(num_learners):
+            learner_id = 'L{:07d}'.format(learner)
+            goals = rng.sample(concepts_keys, goals_per_learner)
+            styles = [rng.choice(_axis_values) for _ in range(4)]
+            learners_file.write(';'.join([learner_id, '0', '40'] + [str(style) for style in styles] + goals) + '\n')
+
+            for concept in concepts_keys:
+                learners_score_file.write('{};{};{}\n'.format(learner_id, concept, rng.choice(['0.0', '1.0', '2.5', '4.0'])))
+
+    return concepts_keys, learners_filename, learners_score_filename
+
+
+def load_learners(learners_filename):
+    learners = {}
+    with open(learners_filename, 'r') as learners_file:
+        for line in learners_file:
+            learner = Learner.load_from_string(line.rstrip('\n'))
+            learners[learner.id] = learner
+
+    return learners
+
+
+def legacy_load(concepts_keys, learners_filename, learners_score_filename):
+    learners = load_learners(learners_filename)
+    learners_keys = list(learners)
+
+    with open(learners_score_filename, 'r') as learners_score_file:
+        for line in learners_score_file:
+            score_fields = line.rstrip('\n').split(';')
+
+            learner_id = score_fields[0]
+            concept_abbreviation = score_fields[1]
+            concept_score = float(score_fields[2])
+
+            if learner_id in learners:
+                learners[learner_id].score[concept_abbreviation] = concept_score
+
+    num_learners = len(learners_keys)
+    num_concepts = len(concepts_keys)
+
+    student_abilities = np.empty((num_learners, num_concepts))
+    for learner in range(num_learners):
+        for concept in range(num_concepts):
+            try:
+                student_abilities[learner, concept] = learners[learners_keys[learner]].score[concepts_keys[concept]]
+            except KeyError:
+                student_abilities[learner, concept] = 0
+
+    objectives = np.empty((num_learners, num_concepts), dtype=bool)
+    for learner in range(num_learners):
+        for concept in range(num_concepts):
+            objectives[learner, concept] = concepts_keys[concept] in learners[learners_keys[learner]].learning_goals
+
+    return student_abilities, objectives
+
+
+def columnar_load(concepts_keys, learners_filename, learners_score_filename):
+    learners = load_learners(learners_filename)
+
+    concepts_index = {concept: index for index, concept in enumerate(concepts_keys)}
+    learners_index = {learner_id: index for index, learner_id in enumerate(learners)}
+
+    student_abilities, _ = load_learners_score(learners_score_filename, learners_index, concepts_index)
+    objectives = learners_objectives_matrix(learners, concepts_index)
+
+    return student_abilities, objectives
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--num-learners', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('-c', '--num-concepts', type=int, default=100)
+    parser.add_argument('-g', '--goals', type=int, default=20)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    print("{:>10} {:>12} {:>12} {:>8}".format("alunos", "antigo (s)", "colunas (s)", "ganho"))
+    for num_learners in args.num_learners:
+        with tempfile.TemporaryDirectory() as dirname:
+            concepts_keys, learners_filename, learners_score_filename = write_cohort(dirname, num_learners, args.num_concepts, args.goals)
+
+            start = time.perf_counter()
+            columnar_result = columnar_load(concepts_keys, learners_filename, learners_score_filename)
+            columnar_time = time.perf_counter() - start
+
+            if args.skip_legacy:
+                print("{:>10} {:>12} {:>12.3f} {:>8}".format(num_learners, "-", columnar_time, "-"))
+                continue
+
+            start = time.perf_counter()
+            legacy_result = legacy_load(concepts_keys, learners_filename, learners_score_filename)
+            legacy_time = time.perf_counter() - start
+
+            assert np.array_equal(legacy_result[0], columnar_result[0])
+            assert np.array_equal(legacy_result[1], columnar_result[1])
+
+            print("{:>10} {:>12.3f} {:>12.3f} {:>7.1f}x".format(num_learners, legacy_time, columnar_time, legacy_time / columnar_time))
@@ -1,30 +1,92 @@
-import xml.etree.ElementTree as xml
 import configparser
 import os
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 from acs.concept import Concept
-from acs.learning_material import LearningMaterial
-from acs.learner import Learner
+from acs.learning_material import LearningMaterial, extract_lom_fields
+from acs.learner import Learner, LearnerScore, learners_objectives_matrix, load_learners_score
+
+
+def get_course_filenames(config_filename):
+    # config_string = '[section]\n'  # python precisa de um "section" para ler o arquivo de configurações
+    with open(config_filename, 'r') as config_file:
+        config_string = config_file.read()
+    config = configparser.ConfigParser()
+    config.read_string(config_string)
+
+    dirname = os.path.dirname(config_filename)
+    path = config['section']['ppatosca.path']
+
+    return {
+        'learning_materials_lom': os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.path.learningMaterialsLOM'])),
+        'concepts': os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.concepts'])),
+        'material_coverage': os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.materialsCoverage'])),
+        'learners': os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.learners'])),
+        'learners_score': os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.learnersScore'])),
+        'fitness_parameters': os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.fitnessParameters'])),
+        # 'prerequisites': os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.prerequisites'])),
+    }
+
+
+# Abaixo dessa quantidade de arquivos o custo de iniciar os processos e maior
+# que o ganho da leitura em paralelo
+PARALLEL_LOM_MIN_FILES = 500
+
+
+def _extract_lom_file(filename):
+    try:
+        return extract_lom_fields(filename), None
+    except Exception as error:
+        return None, "{}: {}".format(type(error).__name__, error)
+
+
+def load_learning_materials(learning_materials_lom, num_workers=None):
+    # Le todos os arquivos LOM do diretorio. Arquivos com erro sao informados e
+    # ignorados, sem interromper a leitura dos demais. Retorna os materiais e a
+    # lista de (arquivo, erro)
+    lom_filenames = []
+    for root, dirs, files in os.walk(learning_materials_lom):
+        for lom_file in files:
+            if lom_file.endswith('.xml'):
+                lom_filenames.append(os.path.join(root, lom_file))
+
+    if num_workers is None:
+        num_workers = os.cpu_count() if len(lom_filenames) >= PARALLEL_LOM_MIN_FILES else 1
+
+    if num_workers > 1:
+        chunksize = max(1, len(lom_filenames) // (4 * num_workers))
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            extracted = list(executor.map(_extract_lom_file, lom_filenames, chunksize=chunksize))
+    else:
+        extracted = [_extract_lom_file(lom_filename) for lom_filename in lom_filenames]
+
+    learning_materials = {}
+    errors = []
+    for lom_filename, (fields, error) in zip(lom_filenames, extracted):
+        if error is None:
+            try:
+                learning_material = LearningMaterial(*fields)
+                learning_materials[learning_material.id] = learning_material
+                continue
+            except Exception as construct_error:
+                error = "{}: {}".format(type(construct_error).__name__, construct_error)
+
+        print("Erro ao ler o material {}: {}".format(lom_filename, error))
+        errors.append((lom_filename, error))
+
+    return learning_materials, errors
 
 
 class Course:
-    def __init__(self, config_filename):
-        # config_string = '[section]\n'  # python precisa de um "section" para ler o arquivo de configurações
-        with open(config_filename, 'r') as config_file:
-            config_string = config_file.read()
-        config = configparser.ConfigParser()
-        config.read_string(config_string)
-
-        dirname = os.path.dirname(config_filename)
-        path = config['section']['ppatosca.path']
-        learning_materials_lom      = os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.path.learningMaterialsLOM']))
-        concepts_filename           = os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.concepts']))
-        material_coverage_filename  = os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.materialsCoverage']))
-        learners_filename           = os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.learners']))
-        learners_score_filename     = os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.learnersScore']))
-        fitness_parameters_filename = os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.fitnessParameters']))
-        # prerequisites_filename      = os.path.normpath(os.path.join(dirname, path, config['section']['ppatosca.file.prerequisites']))
+    def __init__(self, config_filename, num_workers=None):
+        filenames = get_course_filenames(config_filename)
+        learning_materials_lom      = filenames['learning_materials_lom']
+        concepts_filename           = filenames['concepts']
+        material_coverage_filename  = filenames['material_coverage']
+        learners_filename           = filenames['learners']
+        learners_score_filename     = filenames['learners_score']
+        fitness_parameters_filename = filenames['fitness_parameters']
 
         self.concepts = {}
         with open(concepts_filename, 'r') as concepts_file:
@@ -33,12 +95,8 @@ class Course:
                 concept = Concept.load_from_string(line.rstrip('\n'))
                 self.concepts[concept.abbreviation] = concept
 
-        self.learning_materials = {}
-        for root, dirs, files in os.walk(learning_materials_lom):
-            for lom_file in files:
-                if lom_file.endswith('.xml'):
-                    learning_material = LearningMaterial.load_from_file(os.path.join(root, lom_file))
-                    self.learning_materials[learning_material.id] = learning_material
+        # num_workers=None usa processos apenas para diretorios grandes
+        self.learning_materials, self.learning_materials_errors = load_learning_materials(learning_materials_lom, num_workers)
 
         # TODO(andre:2018-06-15): Oferecer opção 'strict' para retornar erro
         # caso o curso ou o material nesse arquivo não existam
@@ -57,18 +115,18 @@ class Course:
                 learner = Learner.load_from_string(line.rstrip('\n'))
                 self.learners[learner.id] = learner
 
+        concepts_keys = list(self.concepts)
+        learners_keys = list(self.learners)
+        concepts_index = {concept: index for index, concept in enumerate(concepts_keys)}
+        learners_index = {learner_id: index for index, learner_id in enumerate(learners_keys)}
+
         # TODO(andre:2018-06-15): Oferecer opção 'strict' para retornar erro
         # caso o aluno nesse arquivo não exista
-        with open(learners_score_filename, 'r') as learners_score_file:
-            for line in learners_score_file:
-                score_fields = line.rstrip('\n').split(';')
-
-                learner_id = score_fields[0]
-                concept_abbreviation = score_fields[1]
-                concept_score = float(score_fields[2])
+        self.learners_score, learners_score_mask = load_learners_score(learners_score_filename, learners_index, concepts_index)
+        for index, learner_id in enumerate(learners_keys):
+            self.learners[learner_id].score = LearnerScore(self.learners_score[index], learners_score_mask[index], concepts_keys, concepts_index)
 
-                if learner_id in self.learners:
-                    self.learners[learner_id].score[concept_abbreviation] = concept_score
+        self.learners_objectives = learners_objectives_matrix(self.learners, concepts_index)
 
         with open(fitness_parameters_filename, 'r') as fitness_parameters_file:
             fitness_string = fitness_parameters_file.read()
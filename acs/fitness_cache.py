@@ -0,0 +1,146 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from acs.student_context import StudentContext
+
+
+class FitnessCache:
+    # Guarda a avaliacao de individuos ja avaliados, indexados pelo aluno e pelos
+    # bytes compactados do individuo. Um cache deve ser usado com uma unica instancia.
+    #
+    # count_hits define se as avaliacoes encontradas no cache contam no
+    # orcamento (cost_budget) dos algoritmos. Com count_hits=True o custo e os
+    # resultados sao os mesmos de uma execucao sem cache, o que mantem os
+    # resultados comparaveis com os publicados.
+    #
+    # Cada entrada guarda a avaliacao e as penalidades parciais (parametro data
+    # das funcoes de avaliacao), entao as chamadas com data tambem usam o cache
+    def __init__(self, fitness_function, fitness_population_function=None, max_entries=100000, count_hits=True):
+        self.fitness_function = fitness_function
+        self.fitness_population_function = fitness_population_function
+        self.max_entries = max_entries
+        self.count_hits = count_hits
+
+        self.entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Quantidade de avaliacoes da ultima chamada que deve ser contada no orcamento
+        self.last_cost = 0
+
+    def _key(self, individual, student):
+        if isinstance(student, StudentContext):
+            student = student.student
+
+        return (student, np.packbits(individual).tobytes())
+
+    def _get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+
+        return value
+
+    def _put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __call__(self, individual, instance, student, timer=None, print_results=False, data=None):
+        # As chamadas que exibem as penalidades parciais sempre calculam a
+        # avaliacao completa
+        if print_results:
+            self.last_cost = 1
+            return self.fitness_function(individual, instance, student, timer, print_results, data=data)
+
+        key = self._key(individual, student)
+        entry = self._get(key)
+
+        if entry is not None:
+            self.hits += 1
+            self.last_cost = 1 if self.count_hits else 0
+        else:
+            self.misses += 1
+            self.last_cost = 1
+
+            entry_data = []
+            value = self.fitness_function(individual, instance, student, timer, data=entry_data)
+            entry = (value, entry_data[0])
+            self._put(key, entry)
+
+        if data is not None:
+            data.append(entry[1])
+
+        return entry[0]
+
+    def fitness_population(self, population, instance, student, timer=None, print_results=False, data=None):
+        population_size = population.shape[0]
+
+        if print_results:
+            self.last_cost = population_size
+            return self._evaluate_population(population, instance, student, timer, print_results, data)
+
+        survival_values = np.empty(population_size)
+        partial_fitness = [None] * population_size
+        keys = [self._key(individual, student) for individual in population]
+
+        # Individuos repetidos dentro da mesma populacao sao avaliados uma vez
+        missing = {}
+        for i, key in enumerate(keys):
+            entry = self._get(key)
+            if entry is not None:
+                self.hits += 1
+                (survival_values[i], partial_fitness[i]) = entry
+            elif key in missing:
+                self.hits += 1
+                missing[key].append(i)
+            else:
+                self.misses += 1
+                missing[key] = [i]
+
+        if missing:
+            missing_indices = [indices[0] for indices in missing.values()]
+            missing_data = []
+            missing_values = self._evaluate_population(population[missing_indices], instance, student, timer, data=missing_data)
+
+            for (key, indices), value, components in zip(missing.items(), missing_values, missing_data):
+                survival_values[indices] = value
+                for i in indices:
+                    partial_fitness[i] = components
+                self._put(key, (value, components))
+
+        if data is not None:
+            data.extend(partial_fitness)
+
+        self.last_cost = population_size if self.count_hits else len(missing)
+
+        return survival_values
+
+    def _evaluate_population(self, population, instance, student, timer=None, print_results=False, data=None):
+        if self.fitness_population_function is not None:
+            return self.fitness_population_function(population, instance, student, timer, print_results, data=data)
+
+        return np.array([self.fitness_function(individual, instance, student, timer, print_results, data=data) for individual in population])
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0
+
+        return self.hits / total
+
+    def clear(self):
+        self.entries.clear()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return "FitnessCache{{entries={}, max_entries={}, hits={}, misses={}, evictions={}, hit_rate={:.3f}}}".format(len(self.entries), self.max_entries, self.hits, self.misses, self.evictions, self.hit_rate())
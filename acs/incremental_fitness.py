@@ -0,0 +1,115 @@
+import numpy as np
+
+from acs.objective import INVALID_VALUE
+from acs.student_context import get_student_context
+
+
+class IncrementalFitness:
+    # Mantem as estatisticas suficientes da avaliacao de um individuo para que
+    # a troca de k materiais seja avaliada em O(k * conceitos), sem recalcular
+    # as somas sobre todos os materiais
+    def __init__(self, instance, student, individual):
+        self.instance = instance
+        self.context = get_student_context(instance, student)
+
+        self.reset(individual)
+
+    def reset(self, individual):
+        context = self.context
+
+        self.individual = np.array(individual, dtype=bool)
+        individual_matrix = self.individual.astype(float)
+
+        self.covered_concepts = individual_matrix @ context.concepts_materials_matrix
+        self.total_time = individual_matrix @ context.estimated_time
+        self.difficulty_sum = individual_matrix @ context.materials_difficulty_distance
+        self.valid_count = individual_matrix @ context.valid_materials
+        self.style_sum = individual_matrix @ context.materials_style_distance
+        self.num_selected = individual_matrix.sum()
+
+    def _flip_delta(self, indices):
+        # +1 para materiais que serao adicionados e -1 para os que serao removidos
+        return np.where(self.individual[indices], -1., 1.)
+
+    def _flip_statistics(self, indices):
+        context = self.context
+        delta = self._flip_delta(indices)
+
+        return (self.covered_concepts + delta @ context.concepts_materials_matrix[indices],
+                self.total_time + delta @ context.estimated_time[indices],
+                self.difficulty_sum + delta @ context.materials_difficulty_distance[indices],
+                self.valid_count + delta @ context.valid_materials[indices],
+                self.style_sum + delta @ context.materials_style_distance[indices],
+                self.num_selected + delta.sum())
+
+    def _evaluate(self, covered_concepts, total_time, difficulty_sum, valid_count, style_sum, num_selected):
+        # Todos os argumentos podem ter dimensoes extras no inicio para avaliar
+        # varias trocas de uma vez
+        instance = self.instance
+        context = self.context
+        objectives = context.objectives
+
+        over_covered = covered_concepts[..., ~objectives].sum(axis=-1)
+        under_covered = (covered_concepts[..., objectives] == 0).sum(axis=-1)
+        concepts_covered_objective = over_covered + instance.missing_concepts_coeficient * under_covered
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if context.num_objectives == 0:
+                difficulty_objective = np.zeros_like(difficulty_sum)
+                materials_balancing_objective = np.zeros_like(difficulty_sum)
+            else:
+                difficulty_objective = np.where(valid_count == 0, INVALID_VALUE, difficulty_sum / valid_count)
+
+                materials_per_concepts = covered_concepts[..., objectives]
+                mean_concepts_per_objective = materials_per_concepts.sum(axis=-1) / context.num_objectives
+                materials_balancing_objective = np.abs(materials_per_concepts - mean_concepts_per_objective[..., np.newaxis]).sum(axis=-1)
+
+            objective_style = np.where((num_selected == 0)[..., np.newaxis], INVALID_VALUE, style_sum / np.asarray(num_selected)[..., np.newaxis])
+
+        total_time_objective = np.maximum(context.duration_min - total_time, 0) + np.maximum(0, total_time - context.duration_max)
+        learning_style_objective = (objective_style[..., 0] + objective_style[..., 1] + objective_style[..., 2] + objective_style[..., 3]) / 4
+
+        return (instance.concepts_covered_weight * concepts_covered_objective
+                + instance.difficulty_weight * difficulty_objective
+                + instance.total_time_weight * total_time_objective
+                + instance.materials_balancing_weight * materials_balancing_objective
+                + instance.learning_style_weight * learning_style_objective)
+
+    def fitness(self):
+        return float(self._evaluate(self.covered_concepts, self.total_time, self.difficulty_sum,
+                                    self.valid_count, self.style_sum, self.num_selected))
+
+    def flip_fitness(self, indices):
+        # Avalia a troca simultanea dos materiais em indices (sem repeticoes)
+        # sem alterar o individuo atual
+        indices = np.atleast_1d(indices)
+
+        return float(self._evaluate(*self._flip_statistics(indices)))
+
+    def single_flip_fitness(self, indices=None):
+        # Avalia, de uma vez, a troca de cada material de indices isoladamente.
+        # Util para percorrer toda a vizinhanca de distancia 1
+        context = self.context
+
+        if indices is None:
+            indices = np.arange(self.individual.shape[0])
+        indices = np.atleast_1d(indices)
+
+        delta = self._flip_delta(indices)
+
+        return self._evaluate(self.covered_concepts + delta[:, np.newaxis] * context.concepts_materials_matrix[indices],
+                              self.total_time + delta * context.estimated_time[indices],
+                              self.difficulty_sum + delta * context.materials_difficulty_distance[indices],
+                              self.valid_count + delta * context.valid_materials[indices],
+                              self.style_sum + delta[:, np.newaxis] * context.materials_style_distance[indices],
+                              self.num_selected + delta)
+
+    def flip(self, indices):
+        # Aplica a troca dos materiais em indices e retorna a nova avaliacao
+        indices = np.atleast_1d(indices)
+
+        (self.covered_concepts, self.total_time, self.difficulty_sum,
+         self.valid_count, self.style_sum, self.num_selected) = self._flip_statistics(indices)
+        self.individual[indices] = ~self.individual[indices]
+
+        return self.fitness()
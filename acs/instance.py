@@ -1,6 +1,7 @@
 import numpy as np
 
 from acs.course import Course
+from acs.instance_cache import course_fingerprint, get_cache_filename, load_instance_cache, save_instance_cache
 
 
 class Instance:
@@ -36,10 +37,32 @@ class Instance:
         self.learning_style_weight = 1
 
     @classmethod
-    def load_from_file(cls, config_filename):
+    def load_from_file(cls, config_filename, use_cache=True):
+        # O resultado da leitura e salvo em um cache .npz ao lado do arquivo de
+        # configuracao e reaproveitado enquanto nenhum arquivo da instancia mudar.
+        # Instancias carregadas do cache nao possuem os objetos do curso
+        # (concepts, materials e learners), apenas os dados numericos e as chaves
+        if not use_cache:
+            return cls.load_from_course(Course(config_filename))
+
+        fingerprint = course_fingerprint(config_filename)
+        cache_filename = get_cache_filename(config_filename)
+
         instance = cls()
+        if load_instance_cache(instance, cache_filename, fingerprint):
+            instance.concepts = None
+            instance.materials = None
+            instance.learners = None
+            return instance
+
+        instance = cls.load_from_course(Course(config_filename))
+        save_instance_cache(instance, cache_filename, fingerprint)
+
+        return instance
 
-        course = Course(config_filename)
+    @classmethod
+    def load_from_course(cls, course):
+        instance = cls()
 
         instance.concepts = course.concepts
         instance.materials = course.learning_materials
@@ -53,24 +76,8 @@ class Instance:
         instance.num_materials = len(course.learning_materials)
         instance.num_learners = len(course.learners)
 
-        instance.student_abilities = np.empty((instance.num_learners, instance.num_concepts))
-        for learner in range(instance.num_learners):
-            for concept in range(instance.num_concepts):
-                try:
-                    instance.student_abilities[learner, concept] = course.learners[instance.learners_keys[learner]].score[instance.concepts_keys[concept]]
-                except KeyError:
-                    instance.student_abilities[learner, concept] = 0
-
-        instance.objectives = np.empty((instance.num_learners, instance.num_concepts), dtype=bool)
-        for learner in range(instance.num_learners):
-            for concept in range(instance.num_concepts):
-                try:
-                    if instance.concepts_keys[concept] in course.learners[instance.learners_keys[learner]].learning_goals:
-                        instance.objectives[learner, concept] = True
-                    else:
-                        instance.objectives[learner, concept] = False
-                except (KeyError, TypeError):
-                    instance.objectives[learner, concept] = False
+        instance.student_abilities = course.learners_score.copy()
+        instance.objectives = course.learners_objectives.copy()
 
         instance.duration_min = np.array([course.learners[learner].lower_time for learner in course.learners])
 
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from acs.course import get_course_filenames
+
+
+# Deve ser incrementado sempre que o formato do cache ou a forma de montar a
+# instancia mudarem, para que os caches antigos sejam descartados
+CACHE_VERSION = 1
+
+CACHE_DIRNAME = '.instance_cache'
+
+_ARRAY_ATTRIBUTES = [
+    'student_abilities',
+    'objectives',
+    'duration_min',
+    'duration_max',
+    'student_active_reflexive',
+    'student_sensory_intuitive',
+    'student_visual_verbal',
+    'student_sequential_global',
+    'materials_difficulty',
+    'concepts_materials',
+    'estimated_time',
+    'materials_active_reflexive',
+    'materials_sensory_intuitive',
+    'materials_visual_verbal',
+    'materials_sequential_global',
+]
+
+_METADATA_ATTRIBUTES = [
+    'concepts_keys',
+    'materials_keys',
+    'learners_keys',
+    'num_concepts',
+    'num_materials',
+    'num_learners',
+    'materials_learning_resource_types',
+    'materials_interactivity_level',
+    'materials_interactivity_type',
+    'missing_concepts_coeficient',
+    'concepts_covered_weight',
+    'difficulty_weight',
+    'total_time_weight',
+    'materials_balancing_weight',
+    'learning_style_weight',
+]
+
+
+def get_cache_filename(config_filename):
+    dirname, basename = os.path.split(os.path.abspath(config_filename))
+    return os.path.join(dirname, CACHE_DIRNAME, basename + '.npz')
+
+
+def _file_signature(filename):
+    stat = os.stat(filename)
+    return '{}:{}:{}'.format(filename, stat.st_mtime_ns, stat.st_size)
+
+
+def course_fingerprint(config_filename):
+    # Conteudo do arquivo de configuracao mais data de modificacao e tamanho
+    # de todos os arquivos referenciados, incluindo cada XML do LOM
+    fingerprint = hashlib.sha1()
+    fingerprint.update(str(CACHE_VERSION).encode())
+
+    with open(config_filename, 'rb') as config_file:
+        fingerprint.update(config_file.read())
+
+    filenames = get_course_filenames(config_filename)
+    for key in sorted(filenames):
+        if key == 'learning_materials_lom':
+            continue
+        fingerprint.update(_file_signature(filenames[key]).encode())
+
+    lom_files = []
+    for root, dirs, files in os.walk(filenames['learning_materials_lom']):
+        for lom_file in files:
+            if lom_file.endswith('.xml'):
+                lom_files.append(os.path.join(root, lom_file))
+
+    # A ordem do os.walk nao e garantida, mas a ordem dos materiais na
+    # instancia depende dela. Por isso a ordem tambem faz parte da chave
+    for lom_file in lom_files:
+        fingerprint.update(_file_signature(lom_file).encode())
+
+    return fingerprint.hexdigest()
+
+
+def instance_fingerprint(instance):
+    # Conteudo de uma instancia ja carregada: os dados de todos os arrays e os
+    # metadados, incluindo os pesos da funcao de avaliacao. Diferente de
+    # course_fingerprint, tambem vale para instancias que nao vieram de arquivo
+    fingerprint = hashlib.sha1()
+    fingerprint.update(str(CACHE_VERSION).encode())
+
+    for attribute in _ARRAY_ATTRIBUTES:
+        value = np.ascontiguousarray(getattr(instance, attribute, None))
+        fingerprint.update('{}:{}:{}:'.format(attribute, value.dtype, value.shape).encode())
+        if value.dtype != object:
+            fingerprint.update(value.tobytes())
+
+    metadata = {attribute: getattr(instance, attribute, None) for attribute in _METADATA_ATTRIBUTES}
+    fingerprint.update(json.dumps(metadata, sort_keys=True, default=str).encode())
+
+    return fingerprint.hexdigest()
+
+
+def load_instance_cache(instance, cache_filename, fingerprint):
+    # Preenche instance com os dados do cache. Retorna False se o cache nao
+    # existir ou estiver desatualizado
+    try:
+        with np.load(cache_filename, allow_pickle=False) as cache:
+            if str(cache['fingerprint']) != fingerprint:
+                return False
+
+            metadata = json.loads(str(cache['metadata']))
+            for attribute in _ARRAY_ATTRIBUTES:
+                setattr(instance, attribute, cache[attribute])
+    except (OSError, KeyError, ValueError):
+        return False
+
+    for attribute in _METADATA_ATTRIBUTES:
+        setattr(instance, attribute, metadata[attribute])
+
+    return True
+
+
+def save_instance_cache(instance, cache_filename, fingerprint):
+    arrays = {attribute: getattr(instance, attribute) for attribute in _ARRAY_ATTRIBUTES}
+    metadata = {attribute: getattr(instance, attribute) for attribute in _METADATA_ATTRIBUTES}
+
+    # O arquivo e escrito com outro nome e depois renomeado para que execucoes
+    # simultaneas (ex.: irace) nunca leiam um cache incompleto
+    temp_filename = '{}.{}.tmp'.format(cache_filename, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_filename), exist_ok=True)
+        with open(temp_filename, 'wb') as cache_file:
+            np.savez(cache_file, fingerprint=np.array(fingerprint), metadata=np.array(json.dumps(metadata)), **arrays)
+        os.replace(temp_filename, cache_filename)
+    except OSError:
+        # Sem permissao de escrita a instancia continua sendo carregada sem cache
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
@@ -1,3 +1,9 @@
+from collections.abc import Mapping
+from itertools import chain, repeat
+
+import numpy as np
+
+
 _map_axis_values = {
     -11: -3,
     -9: -3,
@@ -13,6 +19,83 @@ _map_axis_values = {
     11: 3,
 }
 
+class LearnerScore(Mapping):
+    # Notas de um aluno vistas como dicionario {conceito: nota}. Os valores
+    # ficam na linha do aluno na matriz de notas do curso
+    def __init__(self, values, mask, concepts_keys, concepts_index):
+        self.values = values
+        self.mask = mask
+        self.concepts_keys = concepts_keys
+        self.concepts_index = concepts_index
+
+    def __getitem__(self, concept):
+        index = self.concepts_index[concept]
+        if not self.mask[index]:
+            raise KeyError(concept)
+
+        return self.values[index]
+
+    def __iter__(self):
+        for index in np.flatnonzero(self.mask):
+            yield self.concepts_keys[index]
+
+    def __len__(self):
+        return int(self.mask.sum())
+
+
+def load_learners_score(learners_score_filename, learners_index, concepts_index):
+    # Le o arquivo de notas por colunas e preenche a matriz (alunos x conceitos)
+    # de uma vez. Retorna as notas e a mascara das notas presentes no arquivo.
+    # Alunos e conceitos que nao estao nos indices sao ignorados e, para notas
+    # repetidas, vale a ultima
+    with open(learners_score_filename, 'r') as learners_score_file:
+        lines = learners_score_file.read().splitlines()
+    if '' in lines:
+        lines = [line for line in lines if line]
+
+    fields = ';'.join(lines).split(';')
+    if len(fields) != 3 * len(lines):
+        fields = [field for line in lines for field in line.split(';')[:3]]
+
+    num_lines = len(lines)
+    learners_codes = np.fromiter(map(learners_index.get, fields[0::3], repeat(-1)), dtype=int, count=num_lines)
+    concepts_codes = np.fromiter(map(concepts_index.get, fields[1::3], repeat(-1)), dtype=int, count=num_lines)
+    scores = np.array(fields[2::3], dtype=float)
+
+    num_learners = len(learners_index)
+    num_concepts = len(concepts_index)
+
+    valid = (learners_codes >= 0) & (concepts_codes >= 0)
+    cells = (learners_codes * num_concepts + concepts_codes)[valid]
+    scores = scores[valid]
+
+    # Indices da ultima ocorrencia de cada celula
+    unique_cells, reversed_index = np.unique(cells[::-1], return_index=True)
+    last_index = cells.shape[0] - 1 - reversed_index
+
+    learners_score = np.zeros(num_learners * num_concepts)
+    learners_score_mask = np.zeros(num_learners * num_concepts, dtype=bool)
+    learners_score[unique_cells] = scores[last_index]
+    learners_score_mask[unique_cells] = True
+
+    return learners_score.reshape((num_learners, num_concepts)), learners_score_mask.reshape((num_learners, num_concepts))
+
+
+def learners_objectives_matrix(learners, concepts_index):
+    # Matriz (alunos x conceitos) com os objetivos de cada aluno, na ordem do
+    # dicionario learners. Objetivos fora de concepts_index sao ignorados
+    num_goals = np.fromiter((len(learner.learning_goals) for learner in learners.values()), dtype=int, count=len(learners))
+    learners_codes = np.repeat(np.arange(len(learners)), num_goals)
+    concepts_codes = np.fromiter(map(concepts_index.get, chain.from_iterable(learner.learning_goals for learner in learners.values()), repeat(-1)),
+                                 dtype=int, count=num_goals.sum())
+
+    valid = concepts_codes >= 0
+    objectives = np.zeros((len(learners), len(concepts_index)), dtype=bool)
+    objectives[learners_codes[valid], concepts_codes[valid]] = True
+
+    return objectives
+
+
 class Learner:
     def __init__(self, id, lower_time, upper_time, active_reflexive, sensory_intuitive, visual_verbal, sequential_global, learning_goals):
         self.score = {}
@@ -41,6 +41,57 @@ _interactivity_type_reflexive_values = {
     "mixed": 1
 }
 
+# Campos do educational usados pelo LearningMaterial e o filho que guarda o valor
+_educational_fields = {
+    'typicalLearningTime': 'duration',
+    'difficulty': 'value',
+    'interactivityLevel': 'value',
+    'interactivityType': 'value',
+}
+
+
+def extract_lom_fields(filename):
+    # Percorre uma unica vez as secoes do LOM guardando apenas os campos
+    # necessarios. Retorna os argumentos do construtor do LearningMaterial na
+    # mesma ordem
+    with open(filename, 'rb') as lom_file:
+        xml_root = xml.fromstring(lom_file.read())
+    pref = xml_root.tag.split('}')[0] + '}' if xml_root.tag.startswith('{') else ''
+
+    fields = {}
+    learning_resource_types = []
+    for section in xml_root:
+        if section.tag == pref + 'general':
+            entry = section.find(pref + 'identifier/' + pref + 'entry')
+            if entry is not None:
+                fields.setdefault('id', entry.text)
+        elif section.tag == pref + 'technical':
+            format = section.find(pref + 'format')
+            if format is not None:
+                fields.setdefault('format', format.text)
+        elif section.tag == pref + 'educational':
+            for item in section:
+                name = item.tag[len(pref):]
+                if name == 'learningResourceType':
+                    learning_resource_types.extend(value.text for value in item.findall(pref + 'value'))
+                elif name in _educational_fields:
+                    value = item.find(pref + _educational_fields[name])
+                    if value is not None:
+                        fields.setdefault(name, value.text)
+
+    missing = [name for name in ['id', 'format'] + list(_educational_fields) if name not in fields]
+    if missing:
+        raise ValueError("Campos ausentes no LOM: {}".format(', '.join(missing)))
+
+    # TODO(andre:2018-06-15): Medida provisória. Remover isso depois que os arquivos de LOM for arrumado
+    material_id = int(fields['id'])
+    # material_name = xml_root.find('./' + pref + 'general/' + pref + 'title/' + pref + 'string').text
+    material_name = "a"
+
+    return (material_id, material_name, fields['format'], fields['typicalLearningTime'], fields['difficulty'],
+            learning_resource_types, fields['interactivityLevel'], fields['interactivityType'])
+
+
 class LearningMaterial:
     def __init__(self, id, name, type, typical_learning_time, difficulty, learning_resource_types, interactivity_level, interactivity_type):
         self.id = id
@@ -121,31 +172,7 @@ class LearningMaterial:
 
     @classmethod
     def load_from_file(cls, filename):
-        tree = xml.parse(filename)
-        xml_root = tree.getroot()
-        pref = xml_root.tag.split('}')[0] + '}'
-        # print(xml_root)
-        # xml.dump(xml_root)
-
-        # TODO(andre:2018-06-15): Medida provisória. Remover isso depois que os arquivos de LOM for arrumado
-        material_id = int(xml_root.find('./' + pref + 'general/' + pref + 'identifier/' + pref + 'entry').text)
-        # material_name = xml_root.find('./' + pref + 'general/' + pref + 'title/' + pref + 'string').text
-        material_name = "a"
-
-        # material_id = int(xml_root.find('./' + pref + 'entry').text)
-        # material_name = xml_root.find('./' + pref + 'title/' + pref + 'string').text
-
-        material_type = xml_root.find('./' + pref + 'technical/' + pref + 'format').text
-        typical_learning_time = xml_root.find('./' + pref + 'educational/' + pref + 'typicalLearningTime/' + pref + 'duration').text
-        difficulty = xml_root.find('./' + pref + 'educational/' + pref + 'difficulty/' + pref + 'value').text
-        interactivity_level = xml_root.find('./' + pref + 'educational/' + pref + 'interactivityLevel/' + pref + 'value').text
-        interactivity_type = xml_root.find('./' + pref + 'educational/' + pref + 'interactivityType/' + pref + 'value').text
-
-        learning_resource_type = []
-        for type in xml_root.findall('./' + pref + 'educational/' + pref + 'learningResourceType/' + pref + 'value'):
-            learning_resource_type.append(type.text)
-
-        return cls(material_id, material_name, material_type, typical_learning_time, difficulty, learning_resource_type, interactivity_level, interactivity_type)
+        return cls(*extract_lom_fields(filename))
 
     def __str__(self):
         return "LearningMaterial{{id={}, typical_learning_time={}, difficulty={}, style=({}, {}, {}, {})}}".format(self.id, self.typical_learning_time, self.difficulty, self.active_reflexive, self.sensory_intuitive, self.visual_verbal, self.sequential_global)
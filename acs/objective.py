@@ -2,11 +2,17 @@ import warnings
 
 import numpy as np
 
+from acs.student_context import get_student_context
+from utils.timer import NULL_TIMER
+
 
 INVALID_VALUE = 1000
 
-def concepts_covered_function(individual, instance, student, timer):
-    objectives = instance.objectives[student]
+def concepts_covered_function(individual, instance, student, timer=None):
+    if timer is None:
+        timer = NULL_TIMER
+    context = get_student_context(instance, student)
+    objectives = context.objectives
     concepts_materials = instance.concepts_materials
     missing_concepts_coeficient = instance.missing_concepts_coeficient
     timer.add_time("fitness_concept_start")
@@ -32,14 +38,14 @@ def concepts_covered_function(individual, instance, student, timer):
     return result
 
 
-def difficulty_function(individual, instance, student, timer):
+def difficulty_function(individual, instance, student, timer=None):
+    if timer is None:
+        timer = NULL_TIMER
     timer.add_time()
-    objectives = instance.objectives[student]
-    student_abilities = instance.student_abilities[student]
-    concepts_materials = instance.concepts_materials
+    context = get_student_context(instance, student)
     materials_difficulty = instance.materials_difficulty
 
-    if (objectives.sum() == 0):
+    if (context.num_objectives == 0):
         return 0
 
     # print(objectives)
@@ -50,9 +56,9 @@ def difficulty_function(individual, instance, student, timer):
 
     timer.add_time("fitness_difficulty_start")
 
-    selected_concepts_ability = student_abilities[objectives]
+    selected_concepts_ability = context.objectives_abilities
     selected_materials_difficulty = materials_difficulty[individual]
-    selected_concepts_materials = concepts_materials[objectives, :][:, individual]
+    selected_concepts_materials = context.objectives_materials[:, individual]
 
     if selected_concepts_materials.size == 0:
         return INVALID_VALUE
@@ -86,8 +92,9 @@ def difficulty_function(individual, instance, student, timer):
 
 
 def total_time_function(individual, instance, student):
-    duration_min = instance.duration_min[student]
-    duration_max = instance.duration_max[student]
+    context = get_student_context(instance, student)
+    duration_min = context.duration_min
+    duration_max = context.duration_max
     estimated_time = instance.estimated_time
 
     masked_estimated_time = np.ma.array(estimated_time, mask=~individual)
@@ -102,11 +109,10 @@ def total_time_function(individual, instance, student):
 
 
 def materials_balancing_function(individual, instance, student):
-    objectives = instance.objectives[student]
-    concepts_materials = instance.concepts_materials
+    context = get_student_context(instance, student)
 
-    selected_concepts_materials = concepts_materials[objectives, :][:, individual]
-    mean_concepts_per_objective = selected_concepts_materials.sum() / objectives.sum()
+    selected_concepts_materials = context.objectives_materials[:, individual]
+    mean_concepts_per_objective = selected_concepts_materials.sum() / context.num_objectives
 
     materials_per_concepts = selected_concepts_materials.sum(axis=1)
 
@@ -124,25 +130,17 @@ def materials_balancing_function(individual, instance, student):
 
 
 def learning_style_function(individual, instance, student):
-    student_active_reflexive = instance.student_active_reflexive[student]
-    student_sensory_intuitive = instance.student_sensory_intuitive[student]
-    student_visual_verbal = instance.student_visual_verbal[student]
-    student_sequential_global = instance.student_sequential_global[student]
-
-    materials_active_reflexive = instance.materials_active_reflexive
-    materials_sensory_intuitive = instance.materials_sensory_intuitive
-    materials_visual_verbal = instance.materials_visual_verbal
-    materials_sequential_global = instance.materials_sequential_global
-
-    selected_active_reflexive = materials_active_reflexive[individual]
-    selected_sensory_intuitive = materials_sensory_intuitive[individual]
-    selected_visual_verbal = materials_visual_verbal[individual]
-    selected_sequential_global = materials_sequential_global[individual]
-
-    signal_active_reflexive = np.sign(selected_active_reflexive)
-    signal_sensory_intuitive = np.sign(selected_sensory_intuitive)
-    signal_visual_verbal = np.sign(selected_visual_verbal)
-    signal_sequential_global = np.sign(selected_sequential_global)
+    context = get_student_context(instance, student)
+
+    student_active_reflexive = context.student_active_reflexive
+    student_sensory_intuitive = context.student_sensory_intuitive
+    student_visual_verbal = context.student_visual_verbal
+    student_sequential_global = context.student_sequential_global
+
+    signal_active_reflexive = context.signal_active_reflexive[individual]
+    signal_sensory_intuitive = context.signal_sensory_intuitive[individual]
+    signal_visual_verbal = context.signal_visual_verbal[individual]
+    signal_sequential_global = context.signal_sequential_global[individual]
 
     with warnings.catch_warnings():
         warnings.filterwarnings("error")
@@ -170,8 +168,14 @@ def learning_style_function(individual, instance, student):
     return (objective_active_reflexive + objective_sensory_intuitive + objective_visual_verbal + objective_sequential_global) / 4
 
 
-def fitness(individual, instance, student, timer, print_results=False, data=None):
+def fitness(individual, instance, student, timer=None, print_results=False, data=None):
+    if timer is None:
+        timer = NULL_TIMER
+
+    timer.push("fitness", sample=True)
     timer.add_time()
+    student = get_student_context(instance, student)
+    timer.add_time("fitness_context")
     concepts_covered_objective = concepts_covered_function(individual, instance, student, timer)
     timer.add_time()
     difficulty_objective = difficulty_function(individual, instance, student, timer)
@@ -211,15 +215,165 @@ def fitness(individual, instance, student, timer, print_results=False, data=None
             instance.learning_style_weight * learning_style_objective,
             sum_objective))
 
+    timer.pop()
+
+    return sum_objective
+
+
+def concepts_covered_population_function(population, instance, student, timer=None):
+    if timer is None:
+        timer = NULL_TIMER
+    context = get_student_context(instance, student)
+    objectives = context.objectives
+    missing_concepts_coeficient = instance.missing_concepts_coeficient
+
+    # Quantidade de materiais selecionados que cobrem cada conceito, para cada individuo
+    covered_concepts = population @ context.concepts_materials_matrix
+    timer.add_time("fitness_population_concept_lists")
+
+    over_covered = covered_concepts[:, ~objectives].sum(axis=1)
+    under_covered = (covered_concepts[:, objectives] == 0).sum(axis=1)
+
+    result = over_covered + missing_concepts_coeficient * under_covered
+
+    timer.add_time("fitness_population_concept_result")
+
+    return result
+
+
+def difficulty_population_function(population, instance, student, timer=None):
+    if timer is None:
+        timer = NULL_TIMER
+    context = get_student_context(instance, student)
+
+    if (context.num_objectives == 0):
+        return np.zeros(population.shape[0])
+
+    difficulty_sum = population @ context.materials_difficulty_distance
+    valid_count = population @ context.valid_materials
+
+    timer.add_time("fitness_population_difficulty_sum")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_student_materials_difficulty = difficulty_sum / valid_count
+    # Nenhum material selecionado cobre os objetivos do aluno
+    mean_student_materials_difficulty[valid_count == 0] = INVALID_VALUE
+
+    timer.add_time("fitness_population_difficulty_mean")
+
+    return mean_student_materials_difficulty
+
+
+def total_time_population_function(population, instance, student):
+    context = get_student_context(instance, student)
+
+    total_time = population @ context.estimated_time
+
+    return np.maximum(context.duration_min - total_time, 0) + np.maximum(0, total_time - context.duration_max)
+
+
+def materials_balancing_population_function(population, instance, student):
+    context = get_student_context(instance, student)
+
+    if context.num_objectives == 0:
+        return np.zeros(population.shape[0])
+
+    materials_per_concepts = population @ context.objectives_materials_matrix
+    mean_concepts_per_objective = materials_per_concepts.sum(axis=1) / context.num_objectives
+
+    distance_from_mean = np.abs(materials_per_concepts - mean_concepts_per_objective[:, np.newaxis])
+
+    return distance_from_mean.sum(axis=1)
+
+
+def learning_style_population_function(population, instance, student):
+    context = get_student_context(instance, student)
+
+    objective_sum = population @ context.materials_style_distance
+    num_selected = population.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        objective_style = objective_sum / num_selected[:, np.newaxis]
+    # Nenhum material selecionado
+    objective_style[num_selected == 0] = INVALID_VALUE
+
+    return (objective_style[:, 0] + objective_style[:, 1] + objective_style[:, 2] + objective_style[:, 3]) / 4
+
+
+def fitness_population(population, instance, student, timer=None, print_results=False, data=None):
+    # Avalia toda a populacao de uma vez com produtos de matrizes. Retorna os
+    # mesmos valores que chamar fitness para cada individuo
+    if timer is None:
+        timer = NULL_TIMER
+
+    timer.push("fitness_population", sample=True)
+    timer.add_time()
+    student = get_student_context(instance, student)
+    population_matrix = np.asarray(population, dtype=float)
+    timer.add_time("fitness_population_convert")
+
+    concepts_covered_objective = concepts_covered_population_function(population_matrix, instance, student, timer)
+    timer.add_time()
+    difficulty_objective = difficulty_population_function(population_matrix, instance, student, timer)
+    timer.add_time()
+    total_time_objective = total_time_population_function(population_matrix, instance, student)
+    timer.add_time("fitness_population_total_time")
+    materials_balancing_objective = materials_balancing_population_function(population_matrix, instance, student)
+    timer.add_time("fitness_population_materials")
+    learning_style_objective = learning_style_population_function(population_matrix, instance, student)
+    timer.add_time("fitness_population_learning_style")
+
+    sum_objective = (instance.concepts_covered_weight * concepts_covered_objective
+                     + instance.difficulty_weight * difficulty_objective
+                     + instance.total_time_weight * total_time_objective
+                     + instance.materials_balancing_weight * materials_balancing_objective
+                     + instance.learning_style_weight * learning_style_objective)
+
+    timer.add_time("fitness_population_sum")
+
+    if data is not None or print_results:
+        partial_objective = np.stack((instance.concepts_covered_weight * concepts_covered_objective,
+                                      instance.difficulty_weight * difficulty_objective,
+                                      instance.total_time_weight * total_time_objective,
+                                      instance.materials_balancing_weight * materials_balancing_objective,
+                                      instance.learning_style_weight * learning_style_objective), axis=1)
+
+        if data is not None:
+            data.extend(map(tuple, partial_objective.tolist()))
+
+        if print_results:
+            for i in range(population.shape[0]):
+                print("Materiais do aluno:")
+                print(population[i])
+                print("Penalidades: [{}, {}, {}, {}, {}] = {}".format(*partial_objective[i], sum_objective[i]))
+
+    timer.pop()
+
     return sum_objective
 
 
-def fitness_population(population, instance, student, timer, print_results=False, data=None):
-    population_size = population.shape[0]
-    survival_values = np.empty(population_size)
+def looped_fitness_population(fitness_function):
+    # Adapta uma funcao de avaliacao que recebe um individuo por vez para a
+    # interface de avaliacao da populacao inteira
+    def fitness_population_function(population, instance, student, timer=None, print_results=False, data=None):
+        population_size = population.shape[0]
+        survival_values = np.empty(population_size)
+
+        cost = 0
+        for i in range(population_size):
+            survival_values[i] = fitness_function(population[i], instance, student, timer, print_results, data=data)
+            cost += evaluation_cost(fitness_function, 1)
+        fitness_population_function.last_cost = cost
+
+        return survival_values
+
+    return fitness_population_function
+
 
-    for i in range(population_size):
-        # Calcula o valor de sobrevivencia do individuo i
-        survival_values[i] = fitness(population[i], instance, student, timer, print_results, data)
+def evaluation_cost(fitness_function, num_evaluations):
+    # Quantidade de avaliacoes da ultima chamada de fitness_function que deve
+    # ser contada no orcamento. Funcoes com cache (ver acs.fitness_cache) podem
+    # nao cobrar as avaliacoes repetidas
+    cache = getattr(fitness_function, '__self__', fitness_function)
 
-    return survival_values
+    return getattr(cache, 'last_cost', num_evaluations)
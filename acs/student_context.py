@@ -0,0 +1,78 @@
+import weakref
+
+import numpy as np
+
+
+class StudentContext:
+    # Dados da instancia que nao mudam durante a otimizacao de um aluno.
+    # Construido uma vez por aluno e passado para as funcoes de avaliacao no
+    # lugar do indice do aluno
+    def __init__(self, instance, student):
+        self.student = student
+
+        self.objectives = instance.objectives[student]
+        self.num_objectives = self.objectives.sum()
+
+        self.student_abilities = instance.student_abilities[student]
+        self.objectives_abilities = self.student_abilities[self.objectives]
+        self.objectives_materials = instance.concepts_materials[self.objectives, :]
+
+        self.duration_min = instance.duration_min[student]
+        self.duration_max = instance.duration_max[student]
+
+        self.student_active_reflexive = instance.student_active_reflexive[student]
+        self.student_sensory_intuitive = instance.student_sensory_intuitive[student]
+        self.student_visual_verbal = instance.student_visual_verbal[student]
+        self.student_sequential_global = instance.student_sequential_global[student]
+
+        self.signal_active_reflexive = np.sign(instance.materials_active_reflexive)
+        self.signal_sensory_intuitive = np.sign(instance.materials_sensory_intuitive)
+        self.signal_visual_verbal = np.sign(instance.materials_visual_verbal)
+        self.signal_sequential_global = np.sign(instance.materials_sequential_global)
+
+        # Valores por material usados pela avaliacao em lote
+        self.concepts_materials_matrix = instance.concepts_materials.T.astype(float)
+        self.objectives_materials_matrix = self.objectives_materials.T.astype(float)
+        self.estimated_time = instance.estimated_time.astype(float)
+
+        # Habilidade media do aluno nos objetivos cobertos por cada material.
+        # Os materiais que nao cobrem nenhum objetivo sao ignorados no calculo
+        # da dificuldade
+        objectives_per_material = self.objectives_materials.sum(axis=0)
+        self.valid_materials = (objectives_per_material > 0).astype(float)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_student_ability = (self.objectives_abilities @ self.objectives_materials) / objectives_per_material
+        self.materials_difficulty_distance = np.where(objectives_per_material > 0, np.abs(instance.materials_difficulty - mean_student_ability), 0)
+
+        student_style = np.array([self.student_active_reflexive,
+                                  self.student_sensory_intuitive,
+                                  self.student_visual_verbal,
+                                  self.student_sequential_global])
+        materials_signal = np.stack((self.signal_active_reflexive,
+                                     self.signal_sensory_intuitive,
+                                     self.signal_visual_verbal,
+                                     self.signal_sequential_global), axis=1)
+        self.materials_style_distance = np.abs(3 * materials_signal - student_style).astype(float)
+
+
+# Contextos ja construidos, por instancia e aluno. As instancias sao chaves
+# fracas, entao os contextos sao descartados junto com a instancia e nao sao
+# copiados quando a instancia e enviada para outro processo
+_student_contexts = weakref.WeakKeyDictionary()
+
+
+def get_student_context(instance, student):
+    # Com o indice do aluno reaproveita o contexto construido na primeira
+    # chamada. Os dados da instancia nao devem ser alterados depois disso
+    if isinstance(student, StudentContext):
+        return student
+
+    instance_contexts = _student_contexts.setdefault(instance, {})
+
+    context = instance_contexts.get(student)
+    if context is None:
+        context = StudentContext(instance, student)
+        instance_contexts[student] = context
+
+    return context
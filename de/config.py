@@ -7,6 +7,14 @@ class Evaluator(Enum):
     FIXED_EVALUATOR = 2
 
 
+class Variant(Enum):
+    # ASYNCHRONOUS_VARIANT e a versao original, um individuo por vez.
+    # SYNCHRONOUS_VARIANT gera e avalia todos os candidatos da geracao de uma
+    # vez, com outra sequencia de sorteios
+    ASYNCHRONOUS_VARIANT = 1
+    SYNCHRONOUS_VARIANT = 2
+
+
 class Config:
     def __init__(self):
         self.max_velocity = 1
@@ -15,11 +23,17 @@ class Config:
         self.num_iterations = None
         self.max_stagnation = None
 
+        # Decimacao e reamostragem do registro da convergencia. Ver utils.trace.ConvergenceTrace
+        self.trace_every = None
+        self.trace_only_improvement = False
+        self.trace_cost_grid = None
+
         self.population_size = 1
         self.mutation_chance = 0.8
         self.crossover_rate = 0.9
 
         self.evaluator = Evaluator.RANDOM_EVALUATOR
+        self.variant = Variant.ASYNCHRONOUS_VARIANT
 
     @classmethod
     def load_from_file(cls, config_filename):
@@ -47,6 +61,9 @@ class Config:
 
         config.evaluator = Evaluator[config_values['section']['acs.de.evaluator']]
 
+        if config_values.has_option('section', 'acs.de.variant'):
+            config.variant = Variant[config_values['section']['acs.de.variant']]
+
         return config
 
     @classmethod
@@ -80,5 +97,6 @@ class Config:
         config.crossover_rate = args.crossover_rate
 
         config.evaluator = Evaluator[args.evaluator + '_EVALUATOR']
+        config.variant = Variant[args.variant + '_VARIANT']
 
         return config
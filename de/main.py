@@ -5,16 +5,32 @@ import math
 import numpy as np
 import matplotlib.pyplot as plt
 
-from acs.objective import fitness, fitness_population
+from acs.objective import fitness, looped_fitness_population, evaluation_cost
+from acs.student_context import StudentContext
 from acs.instance import Instance
 
-from utils.timer import Timer
-from utils.misc import evaluate_population_random, evaluate_population_fixed
+from utils.timer import Timer, NULL_TIMER
+from utils.learner_runner import run_learners
+from utils.trace import ConvergenceTrace
+from utils.misc import evaluate_population_random, evaluate_population_fixed, sample_distinct_indices, improve_population
 
-from de.config import Config, Evaluator
+from de.config import Config, Evaluator, Variant
 
 
-def differential_evolution(instance, config, fitness_function, out_info=None):
+def differential_evolution(instance, config, fitness_function, out_info=None, fitness_population_function=None, timer=None, num_learner_workers=1, seed=None, checkpoint=None):
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
+    timer.push("de")
+
+    results = run_learners(differential_evolution_student, instance, config, fitness_function, out_info, fitness_population_function, timer, num_learner_workers, seed, checkpoint)
+
+    timer.pop()
+
+    return results
+
+
+def differential_evolution_student(instance, config, fitness_function, student, rng, out_info=None, fitness_population_function=None, timer=None):
     population_size = config.population_size
 
     if config.evaluator == Evaluator.FIXED_EVALUATOR:
@@ -22,82 +38,111 @@ def differential_evolution(instance, config, fitness_function, out_info=None):
     else:
         evaluate_function = evaluate_population_random
 
-    def counter_fitness(individual, instance, student, timer, print_results=False, data=None):
+    def counter_fitness(individual, instance, student, timer=None, print_results=False, data=None):
         nonlocal cost_counter
-        cost_counter += 1
-        return fitness_function(individual, instance, student, timer, print_results, data=data)
+        result = fitness_function(individual, instance, student, timer, print_results, data=data)
+        cost_counter += evaluation_cost(fitness_function, 1)
+        return result
 
-    if out_info is not None:
-        out_info["best_fitness"] = []
-        out_info["partial_fitness"] = []
-        out_info["perf_counter"] = []
-        out_info["process_time"] = []
-        out_info["cost_value"] = []
-
-    results = []
-
-    for student in range(instance.num_learners):
-        cost_counter = 0
-        iteration_counter = 0
-        stagnation_counter = 0
-
-        if out_info is not None:
-            out_info['best_fitness'].append([])
-            out_info['partial_fitness'].append([])
-            out_info['perf_counter'].append([])
-            out_info['process_time'].append([])
-            out_info['cost_value'].append([])
+    if fitness_population_function is None:
+        fitness_population_function = looped_fitness_population(fitness_function)
 
-        timer = Timer()
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
+
+    def counter_fitness_population(population, instance, student, timer=None, print_results=False, data=None):
+        nonlocal cost_counter
+        result = fitness_population_function(population, instance, student, timer, print_results, data=data)
+        cost_counter += evaluation_cost(fitness_population_function, population.shape[0])
+        return result
 
-        # TODO(andre: 2019-04-25): Testar utilizar um valor limite para os valores
-        # dos individuos, similar ao PSO e ao PPA_C
-        population = np.random.rand(population_size, instance.num_materials) * (2 * config.max_velocity) - config.max_velocity
-        population_evaluation = evaluate_function(population)
-        survival_values = np.apply_along_axis(counter_fitness, 1, population_evaluation, instance, student, timer)
-
-        population_best_index = np.argmin(survival_values, axis=0)
-        population_best_evaluation = np.copy(population_evaluation[population_best_index])
-        population_best_fitness = survival_values[population_best_index]
-
-        start_perf_counter = time.perf_counter()
-        start_process_time = time.process_time()
-        while ((not config.cost_budget or cost_counter < config.cost_budget) and
-               (not config.num_iterations or iteration_counter < config.num_iterations) and
-               (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
-            timer.add_time()
-            old_population_best_fitness = population_best_fitness
-
-            sorted_indices = np.argsort(survival_values)
-            population = population[sorted_indices]
-            survival_values = survival_values[sorted_indices]
-
-            if out_info is not None:
-                out_info["best_fitness"][-1].append(population_best_fitness)
-                fitness_function(population_best_evaluation, instance, student, timer, data=out_info["partial_fitness"][-1])
-                out_info["perf_counter"][-1].append(time.perf_counter() - start_perf_counter)
-                out_info["process_time"][-1].append(time.process_time() - start_process_time)
-                out_info["cost_value"][-1].append(cost_counter)
+    cost_counter = 0
+    iteration_counter = 0
+    stagnation_counter = 0
 
+    student_context = StudentContext(instance, student)
+
+    trace = None
+    if out_info is not None:
+        trace = ConvergenceTrace.from_config(config)
+
+    # TODO(andre: 2019-04-25): Testar utilizar um valor limite para os valores
+    # dos individuos, similar ao PSO e ao PPA_C
+    population = rng.random((population_size, instance.num_materials)) * (2 * config.max_velocity) - config.max_velocity
+    population_evaluation = evaluate_function(population, rng)
+
+    # Com trace as penalidades parciais vem da avaliacao que encontrou a melhor solucao
+    data = None if trace is None else []
+    survival_values = counter_fitness_population(population_evaluation, instance, student_context, timer, data=data)
+
+    population_best_index = np.argmin(survival_values, axis=0)
+    population_best_evaluation = np.copy(population_evaluation[population_best_index])
+    population_best_fitness = survival_values[population_best_index]
+    population_best_partial_fitness = None if trace is None else data[population_best_index]
+
+    start_perf_counter = time.perf_counter()
+    start_process_time = time.process_time()
+    while ((not config.cost_budget or cost_counter < config.cost_budget) and
+           (not config.num_iterations or iteration_counter < config.num_iterations) and
+           (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
+        timer.push("iteration")
+        timer.add_time()
+        old_population_best_fitness = population_best_fitness
+
+        sorted_indices = np.argsort(survival_values)
+        population = population[sorted_indices]
+        survival_values = survival_values[sorted_indices]
+
+        if trace is not None and trace.should_record(cost_counter, population_best_fitness):
+            trace.record(population_best_fitness, population_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
+
+        if config.variant == Variant.SYNCHRONOUS_VARIANT:
+            # Os doadores, os candidatos e a selecao de toda a geracao de uma vez
+            donors = sample_distinct_indices(population_size, 3, rng)
+            (a, b, c) = (population[donors[:, 0]], population[donors[:, 1]], population[donors[:, 2]])
+
+            mutants = np.clip(a + config.mutation_chance * (b - c), -config.max_velocity, config.max_velocity)
+
+            cross_points = rng.random(population.shape) < config.crossover_rate
+            no_cross_points = np.where(~np.any(cross_points, axis=1))[0]
+            cross_points[no_cross_points, rng.integers(0, instance.num_materials, size=len(no_cross_points))] = True
+
+            applicants = np.where(cross_points, mutants, population)
+
+            applicants_evaluation = evaluate_function(applicants, rng)
+            data = None if trace is None else []
+            applicants_fit = counter_fitness_population(applicants_evaluation, instance, student_context, timer, data=data)
+
+            (new_population, survival_values) = improve_population(population, survival_values, applicants, applicants_fit)
+
+            applicants_best_index = np.argmin(applicants_fit)
+            if applicants_fit[applicants_best_index] < population_best_fitness:
+                population_best_evaluation = applicants_evaluation[applicants_best_index]
+                population_best_fitness = applicants_fit[applicants_best_index]
+                if trace is not None:
+                    population_best_partial_fitness = data[applicants_best_index]
+        else:
             new_population = np.copy(population)
 
             #--de
             for p in range(population_size):
                 idxs = [idx for idx in range(population_size) if idx != p]
-                a, b, c = population[np.random.choice(idxs, 3, replace = False)]
+                a, b, c = population[rng.choice(idxs, 3, replace = False)]
 
                 # mutant = np.clip(a + config.mutation_chance * (b - c), 0, 1)
                 # mutant = np.copy(a + config.mutation_chance * (b - c))
                 mutant = np.clip(a + config.mutation_chance * (b - c), -config.max_velocity, config.max_velocity)
 
-                cross_points = np.random.rand(instance.num_materials) < config.crossover_rate
+                cross_points = rng.random(instance.num_materials) < config.crossover_rate
                 if not np.any(cross_points):
-                    cross_points[np.random.randint(0, instance.num_materials)] = True
+                    cross_points[rng.integers(0, instance.num_materials)] = True
 
                 applicant = np.where(cross_points, mutant, population[p])
 
-                applicant_evaluation = evaluate_function(applicant)
-                applicant_fit = counter_fitness(applicant_evaluation, instance, student, timer)
+                applicant_evaluation = evaluate_function(applicant, rng)
+                data = None if trace is None else []
+                applicant_fit = counter_fitness(applicant_evaluation, instance, student_context, timer, data=data)
 
                 if applicant_fit < survival_values[p]:
                     new_population[p] = applicant
@@ -106,26 +151,25 @@ def differential_evolution(instance, config, fitness_function, out_info=None):
                     if applicant_fit < population_best_fitness:
                         population_best_evaluation = applicant_evaluation
                         population_best_fitness = applicant_fit
+                        if trace is not None:
+                            population_best_partial_fitness = data[0]
             #--end de
 
-            iteration_counter += 1
-            if population_best_fitness < old_population_best_fitness:
-                stagnation_counter = 0
-            else:
-                stagnation_counter += 1
+        iteration_counter += 1
+        if population_best_fitness < old_population_best_fitness:
+            stagnation_counter = 0
+        else:
+            stagnation_counter += 1
 
-            population = new_population
+        population = new_population
 
-        if out_info is not None:
-            out_info["best_fitness"][-1].append(population_best_fitness)
-            fitness_function(population_best_evaluation, instance, student, timer, data=out_info["partial_fitness"][-1])
-            out_info["perf_counter"][-1].append(time.perf_counter() - start_perf_counter)
-            out_info["process_time"][-1].append(time.process_time() - start_process_time)
-            out_info["cost_value"][-1].append(cost_counter)
+        timer.pop()
 
-        results.append((population_best_evaluation, population_best_fitness))
+    if trace is not None:
+        trace.record(population_best_fitness, population_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
+        trace.save(out_info)
 
-    return results
+    return (population_best_evaluation, population_best_fitness)
 
 
 def read_files(instance_config_filename, config_filename):
@@ -165,8 +209,7 @@ if __name__ == "__main__":
     popularity = np.zeros((instance.num_materials,))
 
     for i in range(num_repetitions):
-        np.random.seed(i)
-        (individual, survival_value) = differential_evolution(instance, config, fitness, out_info=out_info)
+        (individual, survival_value) = differential_evolution(instance, config, fitness, out_info=out_info, seed=i)
 
         best_fitness.append(out_info["best_fitness"])
         perf_counter.append(out_info["perf_counter"])
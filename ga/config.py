@@ -20,6 +20,11 @@ class Config:
         self.cost_budget = None
         self.num_iterations = None
         self.max_stagnation = None
+
+        # Decimacao e reamostragem do registro da convergencia. Ver utils.trace.ConvergenceTrace
+        self.trace_every = None
+        self.trace_only_improvement = False
+        self.trace_cost_grid = None
         self.population_size = 1
 
         self.top_selection_ratio = 0.1
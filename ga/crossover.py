@@ -11,20 +11,20 @@ class Crossover(Enum):
     DECIMAL_CROSSOVER = 5
 
 
-def crossover_gene(parents, method, config):
+def crossover_gene(parents, method, config, rng):
     children = None
 
     if method == Crossover.SINGLE_POINT_CROSSOVER:
-        children = _single_point_crossover_gene(parents, config)
+        children = _single_point_crossover_gene(parents, config, rng)
 
     elif method == Crossover.TWO_POINT_CROSSOVER:
-        children = _two_point_crossover_gene(parents, config)
+        children = _two_point_crossover_gene(parents, config, rng)
 
     elif method == Crossover.THREE_PARENT_CROSSOVER:
-        children = _three_parent_crossover_gene(parents, config)
+        children = _three_parent_crossover_gene(parents, config, rng)
 
     elif method == Crossover.UNIFORM_CROSSOVER:
-        children = _uniform_crossover_gene(parents, config)
+        children = _uniform_crossover_gene(parents, config, rng)
 
     # elif method == Crossover.DECIMAL_CROSSOVER:
     #     precision = children.variables_descriptor['x'][2]
@@ -33,7 +33,7 @@ def crossover_gene(parents, method, config):
     return children
 
 
-def _single_point_crossover_gene(parents, config, cut_point=None):
+def _single_point_crossover_gene(parents, config, rng, cut_point=None):
     assert parents.shape[0] % 2 == 0
 
     # Exemplo:
@@ -58,7 +58,7 @@ def _single_point_crossover_gene(parents, config, cut_point=None):
     bitsize = parents.shape[1]
 
     if cut_point is None:
-        cut_point = np.random.randint(0, bitsize, size=int(parents.shape[0] / 2))
+        cut_point = rng.integers(0, bitsize, size=int(parents.shape[0] / 2))
 
     r = np.arange(bitsize)
     mask = cut_point[:, np.newaxis] >= r
@@ -71,7 +71,7 @@ def _single_point_crossover_gene(parents, config, cut_point=None):
     return np.concatenate((value1, value2))
 
 
-def _two_point_crossover_gene(parents, config, cut_point1=None, cut_point2=None):
+def _two_point_crossover_gene(parents, config, rng, cut_point1=None, cut_point2=None):
     assert parents.shape[0] % 2 == 0
 
     # Exemplo:
@@ -96,9 +96,9 @@ def _two_point_crossover_gene(parents, config, cut_point1=None, cut_point2=None)
     bitsize = parents.shape[1]
 
     if(cut_point1 is None):
-        cut_point1 = np.random.randint(0, bitsize, size=int(parents.shape[0] / 2))
+        cut_point1 = rng.integers(0, bitsize, size=int(parents.shape[0] / 2))
     if(cut_point2 is None):
-        cut_point2 = np.random.randint(0, bitsize, size=int(parents.shape[0] / 2))
+        cut_point2 = rng.integers(0, bitsize, size=int(parents.shape[0] / 2))
 
     r = np.arange(bitsize)
     mask1 = cut_point1[:, np.newaxis] >= r
@@ -111,7 +111,7 @@ def _two_point_crossover_gene(parents, config, cut_point1=None, cut_point2=None)
     return np.concatenate((value1, value2))
 
 
-def _three_parent_crossover_gene(parents, config):
+def _three_parent_crossover_gene(parents, config, rng):
     assert parents.shape[0] % 3 == 0
 
     # Exemplo:
@@ -133,7 +133,7 @@ def _three_parent_crossover_gene(parents, config):
     return new_gene
 
 
-def _uniform_crossover_gene(parents, config):
+def _uniform_crossover_gene(parents, config, rng):
     assert parents.shape[0] % 2 == 0
 
     # Exemplo:
@@ -149,7 +149,7 @@ def _uniform_crossover_gene(parents, config):
 
     bitsize = parents.shape[1]
 
-    mask = np.random.rand(*parents[::2].shape) < 0.5
+    mask = rng.random(parents[::2].shape) < 0.5
 
     new_gene1 = ((parents[::2] & ~mask) | (parents[1::2] &  mask))
     new_gene2 = ((parents[::2] &  mask) | (parents[1::2] & ~mask))
@@ -6,10 +6,13 @@ import random
 import numpy as np
 import matplotlib.pyplot as plt
 
-from acs.objective import fitness, fitness_population
+from acs.objective import fitness, looped_fitness_population, evaluation_cost
+from acs.student_context import StudentContext
 from acs.instance import Instance, print_instance
 
-from utils.timer import Timer
+from utils.timer import Timer, NULL_TIMER
+from utils.learner_runner import run_learners
+from utils.trace import ConvergenceTrace
 
 from ga.config import Config
 from ga.copying import copying_gene
@@ -19,99 +22,114 @@ from ga.crossover import crossover_gene, Crossover
 from ga.mutation import mutation_gene
 
 
-def genetic_algorithm(instance, config, fitness_function, out_info=None):
+def genetic_algorithm(instance, config, fitness_function, out_info=None, fitness_population_function=None, timer=None, num_learner_workers=1, seed=None, checkpoint=None):
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
+    timer.push("ga")
+
+    results = run_learners(genetic_algorithm_student, instance, config, fitness_function, out_info, fitness_population_function, timer, num_learner_workers, seed, checkpoint)
+
+    timer.pop()
+
+    return results
+
+
+def genetic_algorithm_student(instance, config, fitness_function, student, rng, out_info=None, fitness_population_function=None, timer=None):
     population_size = config.population_size
 
-    def counter_fitness(individual, instance, student, timer, print_results=False, data=None):
+    def counter_fitness(individual, instance, student, timer=None, print_results=False, data=None):
         nonlocal cost_counter
-        cost_counter += 1
-        return fitness_function(individual, instance, student, timer, print_results, data=data)
+        result = fitness_function(individual, instance, student, timer, print_results, data=data)
+        cost_counter += evaluation_cost(fitness_function, 1)
+        return result
+
+    if fitness_population_function is None:
+        fitness_population_function = looped_fitness_population(fitness_function)
 
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
+
+    def counter_fitness_population(population, instance, student, timer=None, print_results=False, data=None):
+        nonlocal cost_counter
+        result = fitness_population_function(population, instance, student, timer, print_results, data=data)
+        cost_counter += evaluation_cost(fitness_population_function, population.shape[0])
+        return result
+
+    cost_counter = 0
+    iteration_counter = 0
+    stagnation_counter = 0
+
+    student_context = StudentContext(instance, student)
+
+    trace = None
     if out_info is not None:
-        out_info['best_fitness'] = []
-        out_info['partial_fitness'] = []
-        out_info['perf_counter'] = []
-        out_info['process_time'] = []
-        out_info['cost_value'] = []
-
-    results = []
-
-    for student in range(instance.num_learners):
-        cost_counter = 0
-        iteration_counter = 0
-        stagnation_counter = 0
-
-        if out_info is not None:
-            out_info['best_fitness'].append([])
-            out_info['partial_fitness'].append([])
-            out_info['perf_counter'].append([])
-            out_info['process_time'].append([])
-            out_info['cost_value'].append([])
+        trace = ConvergenceTrace.from_config(config)
 
-        timer = Timer()
+    population = rng.integers(2, size=(population_size, instance.num_materials), dtype=bool)
 
-        population = np.random.randint(2, size=(population_size, instance.num_materials), dtype=bool)
-        population_best_individual = population[0]
-        population_best_fitness = counter_fitness(population[0], instance, student, timer)
-
-        start_perf_counter = time.perf_counter()
-        start_process_time = time.process_time()
-        while ((not config.cost_budget or cost_counter < config.cost_budget) and
-               (not config.num_iterations or iteration_counter < config.num_iterations) and
-               (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
-            timer.add_time()
-            survival_values = np.apply_along_axis(counter_fitness, 1, population, instance, student, timer)
-            sorted_indices = np.argsort(survival_values)
-            population = population[sorted_indices]
-            survival_values = survival_values[sorted_indices]
-
-            iteration_counter += 1
-            if survival_values[0] < population_best_fitness:
-                population_best_individual = population[0]
-                population_best_fitness = survival_values[0]
-
-                stagnation_counter = 0
-            else:
-                stagnation_counter += 1
-
-            if out_info is not None:
-                out_info['best_fitness'][-1].append(population_best_fitness)
-                fitness_function(population_best_individual, instance, student, timer, data=out_info['partial_fitness'][-1])
-                out_info['perf_counter'][-1].append(time.perf_counter() - start_perf_counter)
-                out_info['process_time'][-1].append(time.process_time() - start_process_time)
-                out_info['cost_value'][-1].append(cost_counter)
-
-            new_population = copying_gene(population, config.copying_method, config)
-
-            if config.use_local_search:
-                new_population = local_search_gene(new_population, counter_fitness, config.local_search_method, config)
-
-            remaining_spots = np.random.randint(2, size=(population_size - new_population.shape[0], instance.num_materials), dtype=bool)
-            remaining_spots = population_size - len(new_population)
-
-            selection_spots = remaining_spots
-            if (config.crossover_method == Crossover.THREE_PARENT_CROSSOVER):
-                selection_spots = int(3 * math.ceil(remaining_spots / 3.)) * 3
-            else:
-                selection_spots = int(2 * math.ceil(remaining_spots / 2.))
-
-            parents = selection_gene(population, survival_values, selection_spots, config.selection_method, config)
-            children = crossover_gene(parents, config.crossover_method, config)
-            mutated = mutation_gene(children, config.mutation_method, config)
-
-            new_population = np.append(new_population, mutated[:remaining_spots], axis=0)
-            population = new_population
-
-        if out_info is not None:
-            out_info['best_fitness'][-1].append(population_best_fitness)
-            fitness_function(population_best_individual, instance, student, timer, data=out_info['partial_fitness'][-1])
-            out_info['perf_counter'][-1].append(time.perf_counter() - start_perf_counter)
-            out_info['process_time'][-1].append(time.process_time() - start_process_time)
-            out_info['cost_value'][-1].append(cost_counter)
-
-        results.append((population_best_individual, population_best_fitness))
+    # Com trace as penalidades parciais vem da avaliacao que encontrou a melhor solucao
+    data = None if trace is None else []
+    population_best_individual = population[0]
+    population_best_fitness = counter_fitness(population[0], instance, student_context, timer, data=data)
+    population_best_partial_fitness = None if trace is None else data[0]
 
-    return results
+    start_perf_counter = time.perf_counter()
+    start_process_time = time.process_time()
+    while ((not config.cost_budget or cost_counter < config.cost_budget) and
+           (not config.num_iterations or iteration_counter < config.num_iterations) and
+           (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
+        timer.push("iteration")
+        timer.add_time()
+        data = None if trace is None else []
+        survival_values = counter_fitness_population(population, instance, student_context, timer, data=data)
+        sorted_indices = np.argsort(survival_values)
+        population = population[sorted_indices]
+        survival_values = survival_values[sorted_indices]
+
+        iteration_counter += 1
+        if survival_values[0] < population_best_fitness:
+            population_best_individual = population[0]
+            population_best_fitness = survival_values[0]
+            if trace is not None:
+                population_best_partial_fitness = data[sorted_indices[0]]
+
+            stagnation_counter = 0
+        else:
+            stagnation_counter += 1
+
+        if trace is not None and trace.should_record(cost_counter, population_best_fitness):
+            trace.record(population_best_fitness, population_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
+
+        new_population = copying_gene(population, config.copying_method, config)
+
+        if config.use_local_search:
+            new_population = local_search_gene(new_population, counter_fitness, config.local_search_method, config)
+
+        remaining_spots = rng.integers(2, size=(population_size - new_population.shape[0], instance.num_materials), dtype=bool)
+        remaining_spots = population_size - len(new_population)
+
+        selection_spots = remaining_spots
+        if (config.crossover_method == Crossover.THREE_PARENT_CROSSOVER):
+            selection_spots = int(3 * math.ceil(remaining_spots / 3.)) * 3
+        else:
+            selection_spots = int(2 * math.ceil(remaining_spots / 2.))
+
+        parents = selection_gene(population, survival_values, selection_spots, config.selection_method, config, rng)
+        children = crossover_gene(parents, config.crossover_method, config, rng)
+        mutated = mutation_gene(children, config.mutation_method, config, rng)
+
+        new_population = np.append(new_population, mutated[:remaining_spots], axis=0)
+        population = new_population
+
+        timer.pop()
+
+    if trace is not None:
+        trace.record(population_best_fitness, population_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
+        trace.save(out_info)
+
+    return (population_best_individual, population_best_fitness)
 
 
 def read_files(instance_config_filename, config_filename):
@@ -150,8 +168,7 @@ if __name__ == '__main__':
     popularity = np.zeros((instance.num_materials,))
 
     for i in range(num_repetitions):
-        np.random.seed(i)
-        (individual, survival_value) = genetic_algorithm(instance, config, fitness, out_info=out_info)
+        (individual, survival_value) = genetic_algorithm(instance, config, fitness, out_info=out_info, seed=i)
 
         best_fitness.append(out_info['best_fitness'])
         perf_counter.append(out_info['perf_counter'])
@@ -1,7 +1,5 @@
 from enum import Enum
 
-import numpy as np
-
 from utils.roulette import Roulette
 
 
@@ -12,29 +10,29 @@ class Selection(Enum):
     TRUNCATION_SELECTION = 4
 
 
-def selection_gene(population, survival_values, quant, method, config):
+def selection_gene(population, survival_values, quant, method, config, rng):
     parents = None
 
     if method == Selection.RANDOM_SELECTION:
-        parents = _random_selection_gene(population, quant)
+        parents = _random_selection_gene(population, quant, rng)
 
     elif method == Selection.ROULETTE_SELECTION:
-        parents = _roulette_selection_gene(population, survival_values, quant)
+        parents = _roulette_selection_gene(population, survival_values, quant, rng)
 
     return parents
 
 
-def _random_selection_gene(population, quant):
-    parents_indexes = np.random.randint(len(population), size=quant)
+def _random_selection_gene(population, quant, rng):
+    parents_indexes = rng.integers(len(population), size=quant)
     parents = population[parents_indexes]
 
     return parents
 
-def _roulette_selection_gene(population, survival_values, quant):
+def _roulette_selection_gene(population, survival_values, quant, rng):
     # TODO(andre:2018-08-17): Rever a forma como as chances de escolher um gene são calculadas
-    roulette = Roulette(1 / survival_values)
+    roulette = Roulette(1 / survival_values, rng=rng)
 
-    parents_indexes = [roulette.spin() for i in range(quant)]
+    parents_indexes = roulette.spin(quant)
     parents = population[parents_indexes]
 
     return parents
@@ -0,0 +1,49 @@
+import json
+import os
+import socket
+import sys
+
+
+# Substituto do irace.test no targetRunner do irace. Envia os argumentos para
+# o irace.server, que mantem as instancias carregadas, e imprime o valor
+# retornado. Este modulo importa apenas a biblioteca padrao para iniciar rapido.
+#
+# Se o servidor nao estiver em execucao, executa o irace.test normalmente.
+#
+# Para executar:
+# python3 -m irace.client ga 1 1 0 instances/irace/scenarios/student00.txt -b 100000
+
+DEFAULT_SOCKET = '/tmp/acs-irace.sock'
+
+
+def get_socket_filename():
+    return os.environ.get('ACS_IRACE_SOCKET', DEFAULT_SOCKET)
+
+
+def request(argv, socket_filename=None):
+    if socket_filename is None:
+        socket_filename = get_socket_filename()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_filename)
+
+        with connection.makefile('rw') as stream:
+            stream.write(json.dumps({'argv': argv, 'cwd': os.getcwd()}) + '\n')
+            stream.flush()
+
+            return json.loads(stream.readline())
+
+
+if __name__ == '__main__':
+    argv = sys.argv[1:]
+
+    try:
+        response = request(argv)
+    except (FileNotFoundError, ConnectionRefusedError):
+        os.execv(sys.executable, [sys.executable, '-m', 'irace.test'] + argv)
+
+    if response['error'] is not None:
+        print(response['error'], file=sys.stderr)
+        sys.exit(1)
+
+    print(response['cost'])
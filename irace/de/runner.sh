@@ -1 +1 @@
-python3 -m irace.test de $@ -b 100000
+python3 -m irace.client de $@ -b 100000
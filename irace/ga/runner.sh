@@ -1 +1 @@
-python3 -m irace.test ga $@ -b 100000
+python3 -m irace.client ga $@ -b 100000
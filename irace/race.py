@@ -0,0 +1,247 @@
+import argparse
+import re
+import shlex
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import stats
+
+from acs.objective import fitness, fitness_population
+from acs.fitness_cache import FitnessCache
+
+from irace.server import read_instance_list
+from irace.test import config_class_dict, create_parser
+from utils.runner import get_repetition_seed
+from utils.scheduler import get_instance
+
+from ppa_b.main import prey_predator_algorithm_binary
+from ppa_c.main import prey_predator_algorithm_continuous
+from pso.main import particle_swarm_optmization
+from ga.main import genetic_algorithm
+from de.main import differential_evolution
+
+
+# Ajuste de parametros por corrida (F-race) sem o irace. As configuracoes
+# candidatas sao sorteadas do mesmo parameters.txt usado pelo irace e
+# convertidas com os mesmos argumentos do irace.test (Config.load_args). Cada
+# passo avalia todas as candidatas vivas em uma nova instancia, em paralelo,
+# e a partir de first_test instancias o teste de Friedman elimina as
+# candidatas piores que a melhor.
+#
+# Para executar:
+# python -m irace.race ga --candidates 50 --max-experiments 2400 -b 100000
+
+method_dict = {
+    'ga': genetic_algorithm,
+    'pso': particle_swarm_optmization,
+    'ppa_b': prey_predator_algorithm_binary,
+    'ppa_c': prey_predator_algorithm_continuous,
+    'de': differential_evolution,
+}
+
+_parameter_pattern = re.compile(r'^(\w+)\s+"([^"]*)"\s+([ciro])\s+\((.*?)\)\s*(?:\|\s*(.*))?$')
+
+
+class Parameter:
+    def __init__(self, name, switch, parameter_type, values, condition=None):
+        self.name = name
+        self.switch = switch
+        self.parameter_type = parameter_type
+        self.values = values
+        self.condition = condition
+
+    def sample(self, rng):
+        if self.parameter_type in ('c', 'o'):
+            return self.values[rng.integers(len(self.values))]
+
+        (low, high) = self.values
+        if self.parameter_type == 'i':
+            return int(rng.integers(int(low), int(high) + 1))
+
+        return float(rng.uniform(float(low), float(high)))
+
+    def is_active(self, configuration):
+        if self.condition is None:
+            return True
+
+        # Condicoes do irace com a sintaxe do R, ex.: mutation != 'SINGLE_BIT_INVERSION'
+        condition = re.sub(r'(\w+)\s+%in%\s+c\((.*?)\)', r'\1 in (\2,)', self.condition)
+        condition = condition.replace('&', ' and ').replace('|', ' or ').replace('!=', ' != ').replace('! ', ' not ')
+
+        # Uma condicao que depende de um parametro inativo tambem e falsa
+        try:
+            return bool(eval(condition, {}, dict(configuration)))
+        except NameError:
+            return False
+
+
+def load_parameters(parameters_filename):
+    # Le o arquivo de parametros no formato do irace:
+    # nome "switch" tipo (valores) | condicao
+    parameters = []
+    with open(parameters_filename, 'r') as parameters_file:
+        for line in parameters_file:
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+
+            match = _parameter_pattern.match(line)
+            if match is None:
+                raise ValueError("Parametro invalido: {}".format(line))
+
+            (name, switch, parameter_type, values, condition) = match.groups()
+            values = [value.strip().strip('"\'') for value in values.split(',')]
+            parameters.append(Parameter(name, switch, parameter_type, values, condition))
+
+    return parameters
+
+
+def sample_configurations(parameters, num_candidates, rng):
+    # Os parametros sem condicao sao sorteados primeiro, ja que as condicoes
+    # podem depender de parametros que aparecem depois no arquivo
+    parameters = sorted(parameters, key=lambda parameter: parameter.condition is not None)
+
+    configurations = []
+    for _ in range(num_candidates):
+        configuration = {}
+        for parameter in parameters:
+            if parameter.is_active(configuration):
+                configuration[parameter.name] = parameter.sample(rng)
+
+        configurations.append(configuration)
+
+    return configurations
+
+
+def get_configuration_argv(parameters, configuration):
+    argv = []
+    for parameter in parameters:
+        if parameter.name in configuration:
+            # Valores como "RANDOM --max-velocity 6" incluem outros argumentos
+            argv.extend(shlex.split(parameter.switch + str(configuration[parameter.name])))
+
+    return argv
+
+
+# Caches de avaliacao deste processo, um por instancia. Com count_hits=True
+# o orcamento e os resultados sao os mesmos de uma execucao sem cache
+_fitness_caches = {}
+
+
+def evaluate(algorithm, argv, instance_filename, seed, cost_budget):
+    args = create_parser().parse_args([algorithm, '0', '0', str(seed), instance_filename, '-b', str(cost_budget)] + argv)
+    config = config_class_dict[algorithm].load_args(args)
+    instance = get_instance(instance_filename)
+
+    fitness_cache = _fitness_caches.get(instance_filename)
+    if fitness_cache is None:
+        fitness_cache = FitnessCache(fitness, fitness_population, count_hits=True)
+        _fitness_caches[instance_filename] = fitness_cache
+
+    results = method_dict[algorithm](instance, config, fitness_cache, fitness_population_function=fitness_cache.fitness_population,
+                                     seed=get_repetition_seed(seed, 0))
+
+    return np.mean([result[1] for result in results])
+
+
+def friedman_test(costs, confidence_level=0.95):
+    # costs e uma matriz (instancias, candidatas). Retorna os indices das
+    # candidatas que continuam na corrida, com o pos-teste de Conover usado
+    # pelo irace quando o teste de Friedman rejeita a igualdade
+    (n, k) = costs.shape
+    ranks = np.apply_along_axis(stats.rankdata, 1, costs)
+    rank_sums = ranks.sum(axis=0)
+
+    ties = 0
+    for row in ranks:
+        (_, counts) = np.unique(row, return_counts=True)
+        ties += np.sum(counts ** 3 - counts)
+
+    denominator = n * k * (k + 1) - ties / (k - 1)
+    if denominator == 0:
+        return np.arange(k)
+
+    statistic = 12 * np.sum((rank_sums - n * (k + 1) / 2) ** 2) / denominator
+    if stats.chi2.sf(statistic, k - 1) >= 1 - confidence_level:
+        return np.arange(k)
+
+    best = np.argmin(rank_sums)
+    degrees_of_freedom = (n - 1) * (k - 1)
+    deviation = np.sqrt(2 * (n * np.sum(ranks ** 2) - np.sum(rank_sums ** 2)) / degrees_of_freedom)
+    if deviation == 0:
+        return np.arange(k)
+
+    critical_value = stats.t.ppf(1 - (1 - confidence_level) / 2, degrees_of_freedom)
+
+    return np.where(np.abs(rank_sums - rank_sums[best]) / deviation < critical_value)[0]
+
+
+def race(algorithm, configurations, argvs, instances, cost_budget, max_experiments, first_test=5, each_test=1, confidence_level=0.95, num_workers=None, seed=0, file=sys.stdout):
+    # As instancias sao percorridas em ordem aleatoria e repetidas com novas
+    # sementes ate acabar o orcamento (max_experiments) ou restar uma candidata
+    rng = np.random.default_rng(seed)
+
+    alive = list(range(len(configurations)))
+    costs = []
+    num_experiments = 0
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        step = 0
+        while len(alive) > 1 and num_experiments + len(alive) <= max_experiments:
+            if step % len(instances) == 0:
+                order = rng.permutation(len(instances))
+
+            instance_filename = instances[order[step % len(instances)]]
+            futures = [executor.submit(evaluate, algorithm, argvs[candidate], instance_filename, step, cost_budget) for candidate in alive]
+
+            step_costs = np.full(len(configurations), np.nan)
+            for candidate, future in zip(alive, futures):
+                step_costs[candidate] = future.result()
+            costs.append(step_costs)
+
+            num_experiments += len(alive)
+            step += 1
+
+            if step >= first_test and (step - first_test) % each_test == 0:
+                alive_costs = np.array(costs)[:, alive]
+                alive = [alive[i] for i in friedman_test(alive_costs, confidence_level)]
+
+            print("Passo {}: {} candidatas vivas, {} experimentos".format(step, len(alive), num_experiments), file=file, flush=True)
+
+    costs = np.array(costs)
+    mean_costs = np.nanmean(costs[:, alive], axis=0)
+    elites = [alive[i] for i in np.argsort(mean_costs)]
+
+    return (elites, costs, num_experiments)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('algorithm', choices=list(method_dict))
+    parser.add_argument('--parameters')
+    parser.add_argument('--instances')
+    parser.add_argument('--candidates', type=int, default=50)
+    parser.add_argument('--max-experiments', type=int, default=2400)
+    parser.add_argument('--first-test', type=int, default=5)
+    parser.add_argument('--each-test', type=int, default=1)
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('-b', '--cost-budget', type=int, default=100000)
+    parser.add_argument('-w', '--workers', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    parameters_filename = args.parameters or 'irace/{}/parameters.txt'.format(args.algorithm)
+    instances_filename = args.instances or 'irace/{}/instances.txt'.format(args.algorithm)
+
+    parameters = load_parameters(parameters_filename)
+    configurations = sample_configurations(parameters, args.candidates, np.random.default_rng(args.seed))
+    argvs = [get_configuration_argv(parameters, configuration) for configuration in configurations]
+    instances = read_instance_list(instances_filename)
+
+    (elites, costs, num_experiments) = race(args.algorithm, configurations, argvs, instances, args.cost_budget, args.max_experiments,
+                                            args.first_test, args.each_test, args.confidence, args.workers, args.seed)
+
+    print("\nMelhores configuracoes ({} experimentos):".format(num_experiments))
+    for candidate in elites:
+        print("{:.6f}  {}".format(np.nanmean(costs[:, candidate]), ' '.join(argvs[candidate])))
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import signal
+import socketserver
+import sys
+import traceback
+
+from acs.instance import Instance
+
+from irace.client import get_socket_filename
+from irace.test import create_parser, get_cost, run
+
+
+# Servidor usado pelo irace.client. Os modulos e as instancias sao carregados
+# uma unica vez, e cada pedido e executado em um processo filho (fork), que
+# herda as instancias ja carregadas. Assim o custo de cada candidato do irace
+# e apenas o da otimizacao. Usa sockets Unix e fork, entao nao funciona no Windows.
+#
+# Para executar:
+# python3 -m irace.server --preload irace/ga/instances.txt &
+# irace -s irace/ga/scenario.txt  (com targetRunner usando irace.client)
+
+class TargetRunnerServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    def __init__(self, socket_filename):
+        self.parser = create_parser()
+        self.instances = {}
+        self.current_request = None
+
+        super().__init__(socket_filename, TargetRunnerHandler)
+
+    def get_instance(self, instance_filename):
+        instance_filename = os.path.normpath(instance_filename)
+
+        instance = self.instances.get(instance_filename)
+        if instance is None:
+            instance = Instance.load_from_file(instance_filename)
+            self.instances[instance_filename] = instance
+
+        return instance
+
+    def process_request(self, request, client_address):
+        # O pedido e lido antes do fork para que a instancia fique carregada
+        # no processo principal e seja reaproveitada nos proximos pedidos
+        try:
+            self.current_request = json.loads(request.makefile('r').readline())
+            args = self.parser.parse_args(self.current_request['argv'])
+            self.get_instance(os.path.join(self.current_request['cwd'], args.instance_file))
+        except (Exception, SystemExit):
+            self.current_request = {'error': traceback.format_exc()}
+
+        super().process_request(request, client_address)
+
+
+class TargetRunnerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        response = {'cost': None, 'error': None}
+
+        current_request = self.server.current_request
+        if 'error' in current_request:
+            response['error'] = current_request['error']
+        else:
+            try:
+                # Os caminhos relativos sao os do processo do cliente
+                os.chdir(current_request['cwd'])
+                args = self.server.parser.parse_args(current_request['argv'])
+                instance = self.server.get_instance(os.path.join(current_request['cwd'], args.instance_file))
+
+                (label, results) = run(args, instance)
+                response['cost'] = float(get_cost(results))
+            except (Exception, SystemExit):
+                response['error'] = traceback.format_exc()
+
+        self.wfile.write((json.dumps(response) + '\n').encode())
+
+
+def _terminate(signum, frame):
+    sys.exit(0)
+
+
+def read_instance_list(filename):
+    # Mesmo formato do trainInstancesFile do irace: um arquivo por linha
+    with open(filename, 'r') as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith('#')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket', default=get_socket_filename())
+    parser.add_argument('--preload', nargs='*', default=[], help='arquivos com a lista de instancias (trainInstancesFile do irace)')
+    args = parser.parse_args()
+
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+
+    # Com SIGTERM o socket tambem e removido
+    signal.signal(signal.SIGTERM, _terminate)
+
+    with TargetRunnerServer(args.socket) as server:
+        for instance_list in args.preload:
+            for instance_filename in read_instance_list(instance_list):
+                server.get_instance(os.path.abspath(instance_filename))
+
+        print("Aguardando pedidos em {} ({} instancias carregadas)".format(args.socket, len(server.instances)), file=sys.stderr, flush=True)
+
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(args.socket)
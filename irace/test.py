@@ -1,14 +1,14 @@
 import argparse
-import random
 
 import numpy as np
 import matplotlib.pyplot as plt
 
-from acs.objective import fitness
+from acs.objective import fitness, fitness_population
 from acs.instance import Instance
 
 from utils.misc import evaluate_population_fixed, evaluate_population_random
 from utils.runner import run_method
+from utils.profiler import Profiler
 
 from ppa_b.main import prey_predator_algorithm_binary
 from ppa_c.main import prey_predator_algorithm_continuous
@@ -23,6 +23,15 @@ import ga.config
 import de.config
 
 
+config_class_dict = {
+    'ga': ga.config.Config,
+    'pso': pso.config.Config,
+    'ppa_b': ppa_b.config.Config,
+    'ppa_c': ppa_c.config.Config,
+    'de': de.config.Config,
+}
+
+
 def create_base_parser(parser):
     parser.add_argument('config_id')
     parser.add_argument('instance_id')
@@ -35,21 +44,16 @@ def create_base_parser(parser):
     parser.add_argument('-s', '--max-stagnation', type=int)
     parser.add_argument('-i', '--num-iterations', type=int)
     parser.add_argument('--show', action='store_true')
+    parser.add_argument('--profile')
+    parser.add_argument('--profile-sample', type=int, default=1)
+    parser.add_argument('--learner-workers', type=int, default=1)
 
 
-if __name__ == '__main__':
+def create_parser():
     parser = argparse.ArgumentParser()
     subparsers = parser.add_subparsers(title='algorithm', dest='algorithm')
     subparsers.required = True
 
-    config_class_dict = {
-        'ga': ga.config.Config,
-        'pso': pso.config.Config,
-        'ppa_b': ppa_b.config.Config,
-        'ppa_c': ppa_c.config.Config,
-        'de': de.config.Config,
-    }
-
     parser_ga = subparsers.add_parser('ga')
     create_base_parser(parser_ga)
     parser_ga.add_argument('--mutation-chance', type=float, default=0.01)
@@ -96,13 +100,19 @@ if __name__ == '__main__':
     parser_de.add_argument('-m', '--mutation-chance', type=float, default=0.1)
     parser_de.add_argument('-c', '--crossover-rate', type=float, default=0.5)
     parser_de.add_argument('-e', '--evaluator', choices=['RANDOM', 'FIXED'], default='RANDOM')
+    parser_de.add_argument('--variant', choices=['ASYNCHRONOUS', 'SYNCHRONOUS'], default='ASYNCHRONOUS')
 
-    args = parser.parse_args()
+    return parser
 
+
+def run(args, instance=None):
+    # Executa o algoritmo escolhido em args. instance permite reaproveitar uma
+    # instancia ja carregada (ver irace.server)
     if not args.config and not args.cost_budget and not args.max_stagnation and not args.num_iterations:
         raise Exception("No end conditions")
 
-    instance = Instance.load_from_file(args.instance_file)
+    if instance is None:
+        instance = Instance.load_from_file(args.instance_file)
 
     # TODO(andre:2019-10-29): Fazer com que os parametros da linha de comando
     # sobrescrevam os parametros do arquivo de configuração ao invés de serem ignorados
@@ -112,21 +122,43 @@ if __name__ == '__main__':
     else:
         config = config_class.load_args(args)
 
+    # Com --profile os tempos de cada escopo sao salvos em <arquivo>.json e
+    # <arquivo>.folded (formato do flamegraph.pl)
+    profiler = None
+    if args.profile:
+        profiler = Profiler(sample_every=args.profile_sample)
+
     if args.algorithm == 'ppa_b':
         label = 'PPAB'
-        results = run_method(prey_predator_algorithm_binary, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full')
+        results = run_method(prey_predator_algorithm_binary, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full', fitness_population_function=fitness_population, timer=profiler, num_learner_workers=args.learner_workers)
     elif args.algorithm == 'ppa_c':
         label = 'PPAC'
-        results = run_method(prey_predator_algorithm_continuous, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full')
+        results = run_method(prey_predator_algorithm_continuous, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full', fitness_population_function=fitness_population, timer=profiler, num_learner_workers=args.learner_workers)
     elif args.algorithm == 'pso':
         label = 'PSO'
-        results = run_method(particle_swarm_optmization, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full')
+        results = run_method(particle_swarm_optmization, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full', fitness_population_function=fitness_population, timer=profiler, num_learner_workers=args.learner_workers)
     elif args.algorithm == 'ga':
         label = 'GA'
-        results = run_method(genetic_algorithm, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full')
+        results = run_method(genetic_algorithm, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full', fitness_population_function=fitness_population, timer=profiler, num_learner_workers=args.learner_workers)
     elif args.algorithm == 'de':
         label = 'DE'
-        results = run_method(differential_evolution, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full')
+        results = run_method(differential_evolution, fitness, instance, config, args.repetitions, seed=args.seed, result_format='full', fitness_population_function=fitness_population, timer=profiler, num_learner_workers=args.learner_workers)
+
+    if profiler is not None:
+        profiler.save_json(args.profile + '.json')
+        profiler.save_folded(args.profile + '.folded')
+
+    return (label, results)
+
+
+def get_cost(results):
+    # Valor informado ao irace: media da melhor avaliacao final
+    return np.mean(results[2], axis=(0, 1))[-1]
+
+
+if __name__ == '__main__':
+    args = create_parser().parse_args()
+    (label, results) = run(args)
 
     mean_best_fitness = np.mean(results[2], axis=(0, 1))
     mean_partial_fitness = np.mean(results[3], axis=(0, 1))
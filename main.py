@@ -1,14 +1,16 @@
 import sys
-import pickle
 
 import numpy as np
 import matplotlib.pyplot as plt
 
-from acs.objective import fitness
+from acs.objective import fitness, fitness_population
 from acs.instance import Instance, print_instance
+from acs.fitness_cache import FitnessCache
 
 from utils.misc import evaluate_population_fixed, evaluate_population_random
-from utils.runner import run_method
+from utils.result_store import ResultStore
+from utils.runner import get_method_keys, run_methods
+from utils.trace import log_cost_grid
 
 from ppa_b.main import prey_predator_algorithm_binary
 from ppa_c.main import prey_predator_algorithm_continuous
@@ -45,42 +47,84 @@ if __name__ == "__main__":
     config_ga.cost_budget = 100000
     config_de.cost_budget = 100000
 
+    # As curvas de todos os algoritmos sao reamostradas na mesma grade de
+    # custos, o que alinha algoritmos com tamanhos de populacao diferentes
+    cost_grid = log_cost_grid(100000, 200)
+    config_ppa_b.trace_cost_grid = cost_grid
+    config_ppa_c.trace_cost_grid = cost_grid
+    config_pso.trace_cost_grid = cost_grid
+    config_ga.trace_cost_grid = cost_grid
+    config_de.trace_cost_grid = cost_grid
+
     num_repetitions = 5
 
+    # Quantidade de processos usados para executar os pares (algoritmo,
+    # repeticao). None usa todos os processadores e 1 executa tudo em serie.
+    # Os resultados sao os mesmos em qualquer caso
+    num_workers = None
+
+    # Com use_cache=True os resultados ja salvos em store sao usados sem
+    # executar os algoritmos. Com use_cache=False apenas as repeticoes que
+    # ainda nao estao em store (ou que foram salvas com outra configuracao ou
+    # instancia) sao executadas, entao aumentar num_repetitions acrescenta
+    # repeticoes sem reescrever as existentes
     use_cache = False
-    filename = 'results/2020-01-14_andre_500_5_100000.pickle'
+    store = ResultStore('results/2020-01-14_andre_500_5_100000')
+
+    # Cada (algoritmo, repeticao, aluno) concluido e salvo neste diretorio.
+    # Se a execucao for interrompida, basta executar de novo para continuar de
+    # onde parou. O diretorio pode ser apagado depois que store for salvo
+    checkpoint_dirname = store.dirname + '.checkpoint'
+
+    # Reaproveita a avaliacao de individuos repetidos. Com count_hits=True as
+    # avaliacoes encontradas no cache continuam contando no orcamento
+    use_fitness_cache = False
+
+    fitness_function = fitness
+    fitness_population_function = fitness_population
+    if use_fitness_cache:
+        fitness_cache = FitnessCache(fitness, fitness_population, max_entries=1000000, count_hits=True)
+        fitness_function = fitness_cache
+        fitness_population_function = fitness_cache.fitness_population
+
+    methods = {
+        'ppa_b': (prey_predator_algorithm_binary, fitness_function, config_ppa_b, {'fitness_population_function': fitness_population_function}),
+        'ppa_c': (prey_predator_algorithm_continuous, fitness_function, config_ppa_c, {'fitness_population_function': fitness_population_function}),
+        'pso': (particle_swarm_optmization, fitness_function, config_pso, {'fitness_population_function': fitness_population_function}),
+        'ga': (genetic_algorithm, fitness_function, config_ga, {'fitness_population_function': fitness_population_function}),
+        'de': (differential_evolution, fitness_function, config_de, {'fitness_population_function': fitness_population_function}),
+    }
 
     if not use_cache:
-        results_ppa_b = run_method(prey_predator_algorithm_binary, fitness, instance, config_ppa_b, num_repetitions)
-        results_ppa_c = run_method(prey_predator_algorithm_continuous, fitness, instance, config_ppa_c, num_repetitions)
-        results_pso = run_method(particle_swarm_optmization, fitness, instance, config_pso, num_repetitions)
-        results_ga = run_method(genetic_algorithm, fitness, instance, config_ga, num_repetitions)
-        results_de = run_method(differential_evolution, fitness, instance, config_de, num_repetitions)
-
-        results = {
-            'ppa_b': results_ppa_b,
-            'ppa_c': results_ppa_c,
-            'pso': results_pso,
-            'ga': results_ga,
-            'de': results_de,
-        }
-        with open(filename, 'wb') as file:
-            pickle.dump(results, file)
-    else:
-        with open(filename, 'rb') as file:
-            results = pickle.load(file)
-
-        results_ppa_b = results['ppa_b']
-        results_ppa_c = results['ppa_c']
-        results_pso = results['pso']
-        results_ga = results['ga']
-        results_de = results['de']
-
-    fitness_ppa_b = np.sum(results_ppa_b[2], axis=3)
-    fitness_ppa_c = np.sum(results_ppa_c[2], axis=3)
-    fitness_pso = np.sum(results_pso[2], axis=3)
-    fitness_ga = np.sum(results_ga[2], axis=3)
-    fitness_de = np.sum(results_de[2], axis=3)
+        run_methods(methods, instance, num_repetitions, num_workers=num_workers, checkpoint_dirname=checkpoint_dirname, result_store=store)
+
+        # Com num_workers != 1 cada processo usa sua propria copia do cache
+        if use_fitness_cache:
+            print(fitness_cache)
+
+    # Apenas os campos usados nas analises sao lidos do store, e apenas das
+    # repeticoes 0..num_repetitions-1 salvas com a configuracao atual. Para
+    # analisar um unico aluno, passe learners=[aluno] para store.load
+    repetitions = range(num_repetitions)
+    keys = get_method_keys(methods, instance, repetitions)
+
+    cost_value_ppa_b = store.load_cost_value('ppa_b', repetitions, keys=keys['ppa_b'])
+    cost_value_ppa_c = store.load_cost_value('ppa_c', repetitions, keys=keys['ppa_c'])
+    cost_value_pso = store.load_cost_value('pso', repetitions, keys=keys['pso'])
+    cost_value_ga = store.load_cost_value('ga', repetitions, keys=keys['ga'])
+    cost_value_de = store.load_cost_value('de', repetitions, keys=keys['de'])
+
+    partial_fitness_ppa_b = store.load('ppa_b', 'partial_fitness', repetitions, keys=keys['ppa_b'])
+    partial_fitness_ppa_c = store.load('ppa_c', 'partial_fitness', repetitions, keys=keys['ppa_c'])
+    partial_fitness_pso = store.load('pso', 'partial_fitness', repetitions, keys=keys['pso'])
+    partial_fitness_ga = store.load('ga', 'partial_fitness', repetitions, keys=keys['ga'])
+    partial_fitness_de = store.load('de', 'partial_fitness', repetitions, keys=keys['de'])
+
+    fitness_ppa_b = np.sum(partial_fitness_ppa_b, axis=3)
+    fitness_ppa_c = np.sum(partial_fitness_ppa_c, axis=3)
+    fitness_pso = np.sum(partial_fitness_pso, axis=3)
+    fitness_ga = np.sum(partial_fitness_ga, axis=3)
+    fitness_de = np.sum(partial_fitness_de, axis=3)
 
     mean_ppa_b = np.mean(fitness_ppa_b, axis=(0, 1))
     mean_ppa_c = np.mean(fitness_ppa_c, axis=(0, 1))
@@ -100,17 +144,17 @@ if __name__ == "__main__":
     deviation_ga = np.std(fitness_ga, axis=(0, 1))
     deviation_de = np.std(fitness_de, axis=(0, 1))
 
-    mean_partial_ppa_b = np.mean(results_ppa_b[2], axis=(0, 1))
-    mean_partial_ppa_c = np.mean(results_ppa_c[2], axis=(0, 1))
-    mean_partial_pso = np.mean(results_pso[2], axis=(0, 1))
-    mean_partial_ga = np.mean(results_ga[2], axis=(0, 1))
-    mean_partial_de = np.mean(results_de[2], axis=(0, 1))
+    mean_partial_ppa_b = np.mean(partial_fitness_ppa_b, axis=(0, 1))
+    mean_partial_ppa_c = np.mean(partial_fitness_ppa_c, axis=(0, 1))
+    mean_partial_pso = np.mean(partial_fitness_pso, axis=(0, 1))
+    mean_partial_ga = np.mean(partial_fitness_ga, axis=(0, 1))
+    mean_partial_de = np.mean(partial_fitness_de, axis=(0, 1))
 
-    student_mean_partial_ppa_b = np.mean(results_ppa_b[2], axis=0)
-    student_mean_partial_ppa_c = np.mean(results_ppa_c[2], axis=0)
-    student_mean_partial_pso = np.mean(results_pso[2], axis=0)
-    student_mean_partial_ga = np.mean(results_ga[2], axis=0)
-    student_mean_partial_de = np.mean(results_de[2], axis=0)
+    student_mean_partial_ppa_b = np.mean(partial_fitness_ppa_b, axis=0)
+    student_mean_partial_ppa_c = np.mean(partial_fitness_ppa_c, axis=0)
+    student_mean_partial_pso = np.mean(partial_fitness_pso, axis=0)
+    student_mean_partial_ga = np.mean(partial_fitness_ga, axis=0)
+    student_mean_partial_de = np.mean(partial_fitness_de, axis=0)
 
     factor = np.empty((student_mean_ga.shape[0], 1))
     for i in range(student_mean_ga.shape[0]):
@@ -124,11 +168,11 @@ if __name__ == "__main__":
     # Colorblind colors: https://gist.github.com/thriveth/8560036
     # plt.xlabel('# execuções da função de avaliação')
     # plt.ylabel('valor da avaliação')
-    # plt.plot(results_ppa_b[1], mean_ppa_b, color='#4daf4a', label="APPD")
-    # plt.plot(results_ppa_c[1], mean_ppa_c, color='#f781bf', label="APPC")
-    # plt.plot(results_pso[1], mean_pso, color='#a65628', label="OEP")
-    # plt.plot(results_ga[1], mean_ga, color='#377eb8', label="AG")
-    # plt.plot(results_de[1], mean_de, color='#ff7f00', label="ED")
+    # plt.plot(cost_value_ppa_b, mean_ppa_b, color='#4daf4a', label="APPD")
+    # plt.plot(cost_value_ppa_c, mean_ppa_c, color='#f781bf', label="APPC")
+    # plt.plot(cost_value_pso, mean_pso, color='#a65628', label="OEP")
+    # plt.plot(cost_value_ga, mean_ga, color='#377eb8', label="AG")
+    # plt.plot(cost_value_de, mean_de, color='#ff7f00', label="ED")
     # plt.legend(loc=1)
     # plt.show()
 
@@ -141,11 +185,11 @@ if __name__ == "__main__":
     #     plt.xlabel('# execuções da função de avaliação')
     #     plt.ylabel('valor da avaliação')
     #     plt.ylim((0.8, 5))
-    #     plt.plot(results_ppa_b[1], student_mean_ppa_b[i] / factor[i], color='#4daf4a', label="APPD")
-    #     plt.plot(results_ppa_c[1], student_mean_ppa_c[i] / factor[i], color='#f781bf', label="APPC")
-    #     plt.plot(results_pso[1], student_mean_pso[i] / factor[i], color='#a65628', label="OEP")
-    #     plt.plot(results_ga[1], student_mean_ga[i] / factor[i], color='#377eb8', label="AG")
-    #     plt.plot(results_de[1], student_mean_de[i] / factor[i], color='#ff7f00', label="ED")
+    #     plt.plot(cost_value_ppa_b, student_mean_ppa_b[i] / factor[i], color='#4daf4a', label="APPD")
+    #     plt.plot(cost_value_ppa_c, student_mean_ppa_c[i] / factor[i], color='#f781bf', label="APPC")
+    #     plt.plot(cost_value_pso, student_mean_pso[i] / factor[i], color='#a65628', label="OEP")
+    #     plt.plot(cost_value_ga, student_mean_ga[i] / factor[i], color='#377eb8', label="AG")
+    #     plt.plot(cost_value_de, student_mean_de[i] / factor[i], color='#ff7f00', label="ED")
     #     plt.legend(loc=1)
     #     plt.savefig('results/all/real_test_%d.png' % (i))
     #     plt.close()
@@ -164,11 +208,11 @@ if __name__ == "__main__":
     # # Média normalizada
     # plt.xlabel('# execuções da função de avaliação')
     # plt.ylabel('valor da avaliação')
-    # plt.plot(results_ppa_b[1], global_mean_ppa_b, color='#4daf4a', label="APPD")
-    # plt.plot(results_ppa_c[1], global_mean_ppa_c, color='#f781bf', label="APPC")
-    # plt.plot(results_pso[1], global_mean_pso, color='#a65628', label="OEP")
-    # plt.plot(results_ga[1], global_mean_ga, color='#377eb8', label="AG")
-    # plt.plot(results_de[1], global_mean_de, color='#ff7f00', label="ED")
+    # plt.plot(cost_value_ppa_b, global_mean_ppa_b, color='#4daf4a', label="APPD")
+    # plt.plot(cost_value_ppa_c, global_mean_ppa_c, color='#f781bf', label="APPC")
+    # plt.plot(cost_value_pso, global_mean_pso, color='#a65628', label="OEP")
+    # plt.plot(cost_value_ga, global_mean_ga, color='#377eb8', label="AG")
+    # plt.plot(cost_value_de, global_mean_de, color='#ff7f00', label="ED")
     # plt.legend(loc=1)
     # plt.savefig('results/real_test_all.png')
     # plt.close()
@@ -234,11 +278,11 @@ if __name__ == "__main__":
     # plt.xlabel('# execuções da função de avaliação')
     # plt.ylabel(axis)
     # plt.ylim(ylim)
-    # plt.plot(results_ppa_b[1], mean_ppa_b_1 - mean_ppa_b_0, color='#4daf4a', label="PPAB")
-    # plt.plot(results_ppa_c[1], mean_ppa_c_1 - mean_ppa_c_0, color='#f781bf', label="PPAC")
-    # plt.plot(results_pso[1], mean_pso_1 - mean_pso_0, color='#a65628', label="PSO")
-    # plt.plot(results_ga[1], mean_ga_1 - mean_ga_0, color='#377eb8', label="GA")
-    # plt.plot(results_de[1], mean_de_1 - mean_de_0, color='#ff7f00', label="DE")
+    # plt.plot(cost_value_ppa_b, mean_ppa_b_1 - mean_ppa_b_0, color='#4daf4a', label="PPAB")
+    # plt.plot(cost_value_ppa_c, mean_ppa_c_1 - mean_ppa_c_0, color='#f781bf', label="PPAC")
+    # plt.plot(cost_value_pso, mean_pso_1 - mean_pso_0, color='#a65628', label="PSO")
+    # plt.plot(cost_value_ga, mean_ga_1 - mean_ga_0, color='#377eb8', label="GA")
+    # plt.plot(cost_value_de, mean_de_1 - mean_de_0, color='#ff7f00', label="DE")
     # plt.legend(loc=1)
     # plt.show()
     ############################################################################
@@ -253,7 +297,7 @@ if __name__ == "__main__":
     #     plt.ylabel('valor da avaliação')
     #     plt.ylim((0.8, 5))
     #     for j in range(fitness_de.shape[0]):
-    #         plt.plot(results_de[1], fitness_de[j, i] / factor[i])
+    #         plt.plot(cost_value_de, fitness_de[j, i] / factor[i])
     #
     #     plt.savefig('results/de/real_test_%d_de.png' % (i))
     #     plt.close()
@@ -268,24 +312,24 @@ if __name__ == "__main__":
 
     # plt.xlabel('# execuções da função de avaliação')
     # plt.ylabel('valor da avaliação')
-    # plt.plot(results_ga[1], mean_ga, color='#377eb8', label="AG")
-    # plt.plot(results_ga[1], mean_ga + deviation_ga, linestyle='--', color='#377eb8', linewidth=0.5)
-    # plt.plot(results_ga[1], mean_ga - deviation_ga, linestyle='--', color='#377eb8', linewidth=0.5)
-    # plt.fill_between(results_ga[1], mean_ga + deviation_ga, mean_ga - deviation_ga, facecolor='#377eb8', alpha=0.2)
-    # plt.plot(results_de[1], mean_de, color='#ff7f00', label="ED")
-    # plt.plot(results_de[1], mean_de - deviation_de, linestyle='--', color='#ff7f00', linewidth=0.5)
-    # plt.plot(results_de[1], mean_de + deviation_de, linestyle='--', color='#ff7f00', linewidth=0.5)
-    # plt.fill_between(results_de[1], mean_de + deviation_de, mean_de - deviation_de, facecolor='#ff7f00', alpha=0.2)
+    # plt.plot(cost_value_ga, mean_ga, color='#377eb8', label="AG")
+    # plt.plot(cost_value_ga, mean_ga + deviation_ga, linestyle='--', color='#377eb8', linewidth=0.5)
+    # plt.plot(cost_value_ga, mean_ga - deviation_ga, linestyle='--', color='#377eb8', linewidth=0.5)
+    # plt.fill_between(cost_value_ga, mean_ga + deviation_ga, mean_ga - deviation_ga, facecolor='#377eb8', alpha=0.2)
+    # plt.plot(cost_value_de, mean_de, color='#ff7f00', label="ED")
+    # plt.plot(cost_value_de, mean_de - deviation_de, linestyle='--', color='#ff7f00', linewidth=0.5)
+    # plt.plot(cost_value_de, mean_de + deviation_de, linestyle='--', color='#ff7f00', linewidth=0.5)
+    # plt.fill_between(cost_value_de, mean_de + deviation_de, mean_de - deviation_de, facecolor='#ff7f00', alpha=0.2)
     # plt.legend(loc=1)
     # plt.show()
 
     # plt.xlabel('# execuções da função de avaliação')
     # plt.ylabel('valor da avaliação')
-    # plt.plot(results_de[1], mean_partial_de[:, 0], color='#377eb8', label="Cobertura")
-    # plt.plot(results_de[1], mean_partial_de[:, 1], color='#ff7f00', label="Dificuldade")
-    # plt.plot(results_de[1], mean_partial_de[:, 2], color='#4daf4a', label="Tempo")
-    # plt.plot(results_de[1], mean_partial_de[:, 3], color='#f781bf', label="Balanceamento")
-    # plt.plot(results_de[1], mean_partial_de[:, 4], color='#a65628', label="Estilo")
+    # plt.plot(cost_value_de, mean_partial_de[:, 0], color='#377eb8', label="Cobertura")
+    # plt.plot(cost_value_de, mean_partial_de[:, 1], color='#ff7f00', label="Dificuldade")
+    # plt.plot(cost_value_de, mean_partial_de[:, 2], color='#4daf4a', label="Tempo")
+    # plt.plot(cost_value_de, mean_partial_de[:, 3], color='#f781bf', label="Balanceamento")
+    # plt.plot(cost_value_de, mean_partial_de[:, 4], color='#a65628', label="Estilo")
     # plt.legend(loc=1)
     # plt.show()
 
@@ -293,11 +337,11 @@ if __name__ == "__main__":
     #     plt.xlabel('# execuções da função de avaliação')
     #     plt.ylabel('valor da avaliação')
     #     plt.ylim((-0.5, 10))
-    #     plt.plot(results_de[1], student_mean_partial_de[i, :, 0], color='#377eb8', label="Cobertura")
-    #     plt.plot(results_de[1], student_mean_partial_de[i, :, 1], color='#ff7f00', label="Dificuldade")
-    #     plt.plot(results_de[1], student_mean_partial_de[i, :, 2], color='#4daf4a', label="Tempo")
-    #     plt.plot(results_de[1], student_mean_partial_de[i, :, 3], color='#f781bf', label="Balanceamento")
-    #     plt.plot(results_de[1], student_mean_partial_de[i, :, 4], color='#a65628', label="Estilo")
+    #     plt.plot(cost_value_de, student_mean_partial_de[i, :, 0], color='#377eb8', label="Cobertura")
+    #     plt.plot(cost_value_de, student_mean_partial_de[i, :, 1], color='#ff7f00', label="Dificuldade")
+    #     plt.plot(cost_value_de, student_mean_partial_de[i, :, 2], color='#4daf4a', label="Tempo")
+    #     plt.plot(cost_value_de, student_mean_partial_de[i, :, 3], color='#f781bf', label="Balanceamento")
+    #     plt.plot(cost_value_de, student_mean_partial_de[i, :, 4], color='#a65628', label="Estilo")
     #     plt.legend(loc=1)
     #     plt.savefig('results/de/real_test_%d_de.png' % (i))
     #     plt.close()
@@ -306,11 +350,11 @@ if __name__ == "__main__":
     # fig = plt.figure()
     # fig.suptitle('Materiais selecionados')
     # # plt.hist(results[0], bins=10, range=(0, num_repetitions))
-    # plt.bar(np.arange(results_ga[0].shape[2]), results_ga[0].sum(axis=(0, 1)))
+    # plt.bar(np.arange(store.load('ga', 'selected_materials').shape[2]), store.load('ga', 'selected_materials').sum(axis=(0, 1)))
     # plt.show()
 
     # fig = plt.figure()
     # fig.suptitle('Histograma de materiais')
     # # plt.hist(results[0], bins=10, range=(0, num_repetitions))
-    # plt.hist(results_ga[0].sum(axis=(0, 1)))
+    # plt.hist(store.load('ga', 'selected_materials').sum(axis=(0, 1)))
     # plt.show()
@@ -5,168 +5,202 @@ import timeit
 import numpy as np
 import matplotlib.pyplot as plt
 
-from acs.objective import fitness, fitness_population
+from acs.objective import fitness, fitness_population, looped_fitness_population, evaluation_cost
+from acs.student_context import StudentContext
 from acs.instance import Instance, print_instance
 
-from utils.timer import Timer
-from utils.roulette import Roulette
-from utils.misc import hamming_distance
+from utils.timer import Timer, NULL_TIMER
+from utils.learner_runner import run_learners
+from utils.trace import ConvergenceTrace
+from utils.roulette import StackedRoulette
+from utils.misc import hamming_distance_matrix
 
 from ppa_b.config import Config
 from ppa_b.population_movement import move_population_roulette, move_population_direction, move_population_random, move_population_random_complement, move_population_local_search
 
 
-def prey_predator_algorithm_binary(instance, config, fitness_function, out_info=None):
-    population_size = config.population_size
+def prey_predator_algorithm_binary(instance, config, fitness_function, out_info=None, fitness_population_function=None, timer=None, num_learner_workers=1, seed=None, checkpoint=None):
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
+    timer.push("ppa_b")
+
+    results = run_learners(prey_predator_algorithm_binary_student, instance, config, fitness_function, out_info, fitness_population_function, timer, num_learner_workers, seed, checkpoint)
+
+    timer.pop()
+
+    return results
+
 
+def prey_predator_algorithm_binary_student(instance, config, fitness_function, student, rng, out_info=None, fitness_population_function=None, timer=None):
     if config.max_steps > instance.num_materials:
         config.max_steps = instance.num_materials
 
     if config.min_steps > config.max_steps:
         config.min_steps = config.max_steps
 
-    def counter_fitness(individual, instance, student, timer, print_results=False, data=None):
+    population_size = config.population_size
+
+    def counter_fitness(individual, instance, student, timer=None, print_results=False, data=None):
         nonlocal cost_counter
-        cost_counter += 1
-        return fitness_function(individual, instance, student, timer, print_results, data=data)
+        result = fitness_function(individual, instance, student, timer, print_results, data=data)
+        cost_counter += evaluation_cost(fitness_function, 1)
+        return result
 
-    if out_info is not None:
-        out_info["best_fitness"] = []
-        out_info["partial_fitness"] = []
-        out_info["perf_counter"] = []
-        out_info["process_time"] = []
-        out_info["cost_value"] = []
-
-    results = []
-
-    for student in range(instance.num_learners):
-        cost_counter = 0
-        iteration_counter = 0
-        stagnation_counter = 0
-
-        if out_info is not None:
-            out_info['best_fitness'].append([])
-            out_info['partial_fitness'].append([])
-            out_info['perf_counter'].append([])
-            out_info['process_time'].append([])
-            out_info['cost_value'].append([])
+    # A busca local avalia cada tentativa pela troca dos materiais que mudaram
+    # (acs.incremental_fitness), o que so reproduz a funcao de avaliacao padrao
+    incremental_local_search = (fitness_function is fitness and fitness_population_function in (None, fitness_population))
 
-        timer = Timer()
+    if fitness_population_function is None:
+        fitness_population_function = looped_fitness_population(fitness_function)
+
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
 
-        population = np.random.randint(2, size=(population_size, instance.num_materials), dtype=bool)
+    def counter_fitness_population(population, instance, student, timer=None, print_results=False, data=None):
+        nonlocal cost_counter
+        result = fitness_population_function(population, instance, student, timer, print_results, data=data)
+        cost_counter += evaluation_cost(fitness_population_function, population.shape[0])
+        return result
 
-        population_best_individual = population[0]
-        population_best_fitness = counter_fitness(population[0], instance, student, timer)
+    def count_evaluations(num_evaluations):
+        nonlocal cost_counter
+        cost_counter += num_evaluations
 
-        start_perf_counter = time.perf_counter()
-        start_process_time = time.process_time()
-        while ((not config.cost_budget or cost_counter < config.cost_budget) and
-               (not config.num_iterations or iteration_counter < config.num_iterations) and
-               (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
-            timer.add_time()
+    cost_counter = 0
+    iteration_counter = 0
+    stagnation_counter = 0
 
-            survival_values = np.apply_along_axis(counter_fitness, 1, population, instance, student, timer)
-            sorted_indices = np.argsort(survival_values)
-            population = population[sorted_indices]
-            survival_values = survival_values[sorted_indices]
+    student_context = StudentContext(instance, student)
 
-            iteration_counter += 1
-            if survival_values[0] < population_best_fitness:
-                population_best_individual = population[0]
-                population_best_fitness = survival_values[0]
+    trace = None
+    if out_info is not None:
+        trace = ConvergenceTrace.from_config(config)
+
+    population = rng.integers(2, size=(population_size, instance.num_materials), dtype=bool)
+
+    # Com trace as penalidades parciais vem da avaliacao que encontrou a melhor solucao
+    data = None if trace is None else []
+    population_best_individual = population[0]
+    population_best_fitness = counter_fitness(population[0], instance, student_context, timer, data=data)
+    population_best_partial_fitness = None if trace is None else data[0]
+
+    start_perf_counter = time.perf_counter()
+    start_process_time = time.process_time()
+    while ((not config.cost_budget or cost_counter < config.cost_budget) and
+           (not config.num_iterations or iteration_counter < config.num_iterations) and
+           (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
+        timer.push("iteration")
+        timer.add_time()
+
+        data = None if trace is None else []
+        survival_values = counter_fitness_population(population, instance, student_context, timer, data=data)
+        sorted_indices = np.argsort(survival_values)
+        population = population[sorted_indices]
+        survival_values = survival_values[sorted_indices]
 
-                stagnation_counter = 0
-            else:
-                stagnation_counter += 1
+        iteration_counter += 1
+        if survival_values[0] < population_best_fitness:
+            population_best_individual = population[0]
+            population_best_fitness = survival_values[0]
+            if trace is not None:
+                population_best_partial_fitness = data[sorted_indices[0]]
 
-            if out_info is not None:
-                out_info["best_fitness"][-1].append(population_best_fitness)
-                fitness_function(population_best_individual, instance, student, timer, data=out_info["partial_fitness"][-1])
-                out_info["perf_counter"][-1].append(time.perf_counter() - start_perf_counter)
-                out_info["process_time"][-1].append(time.process_time() - start_process_time)
-                out_info["cost_value"][-1].append(cost_counter)
+            stagnation_counter = 0
+        else:
+            stagnation_counter += 1
 
-            new_population = np.copy(population)
+        if trace is not None and trace.should_record(cost_counter, population_best_fitness):
+            trace.record(population_best_fitness, population_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
 
-            timer.add_time("creation")
+        new_population = np.copy(population)
 
-            # Cria as mascaras para separar os diferentes tipos de individuo
-            best_prey_mask = np.zeros(population_size, dtype=bool)
-            best_prey_mask[0] = True
+        timer.add_time("creation")
 
-            predator_mask = np.zeros(population_size, dtype=bool)
-            predator_mask[-1] = True
+        # Cria as mascaras para separar os diferentes tipos de individuo
+        best_prey_mask = np.zeros(population_size, dtype=bool)
+        best_prey_mask[0] = True
 
-            follow_mask = (np.random.rand(population_size) < config.follow_chance)
-            run_mask = ~follow_mask
+        predator_mask = np.zeros(population_size, dtype=bool)
+        predator_mask[-1] = True
 
-            follow_mask[best_prey_mask] = False  # Ignora as melhores presas
-            follow_mask[predator_mask] = False  # Ignora os predadores
+        follow_mask = (rng.random(population_size) < config.follow_chance)
+        run_mask = ~follow_mask
 
-            run_mask[best_prey_mask] = False  # Ignora as melhores presas
-            run_mask[predator_mask] = False  # Ignora os predadores
+        follow_mask[best_prey_mask] = False  # Ignora as melhores presas
+        follow_mask[predator_mask] = False  # Ignora os predadores
 
-            timer.add_time()
+        run_mask[best_prey_mask] = False  # Ignora as melhores presas
+        run_mask[predator_mask] = False  # Ignora os predadores
 
-            follow_indices = np.where(follow_mask)[0]
-            follow_quant = len(follow_indices)
+        timer.add_time()
 
-            population_distance = [[hamming_distance(population[j], population[i]) / instance.num_materials for j in range(i)] for i in follow_indices]
-            survival_ratio = [[survival_values[j] / survival_values[i] for j in range(i)] for i in follow_indices]
-            follow_chance = [[(2 - config.follow_distance_parameter * population_distance[i][j] - config.follow_survival_parameter * survival_ratio[i][j]) / 2 for j in range(follow_indices[i])] for i in range(follow_quant)]
-            roulette_array = np.array([Roulette(follow_chance[i]) for i in range(follow_quant)])
+        follow_indices = np.where(follow_mask)[0]
+        follow_quant = len(follow_indices)
 
-            timer.add_time("follow_chance")
+        # Matrizes (seguidores, presas). Cada seguidor so pode seguir as presas
+        # melhores do que ele, entao as demais chances ficam com zero
+        population_distance = hamming_distance_matrix(population[follow_indices], population) / instance.num_materials
+        survival_ratio = survival_values[np.newaxis, :] / survival_values[follow_indices, np.newaxis]
+        follow_chance = (2 - config.follow_distance_parameter * population_distance - config.follow_survival_parameter * survival_ratio) / 2
+        allowed_mask = np.arange(population_size)[np.newaxis, :] < follow_indices[:, np.newaxis]
+        follow_chance[~allowed_mask] = 0
+        # Sem chance para nenhuma das presas melhores, o sorteio e uniforme entre
+        # elas e nao entre toda a populacao
+        zero_rows = (follow_chance.sum(axis=1) == 0)
+        follow_chance[zero_rows] = allowed_mask[zero_rows]
+        roulette = StackedRoulette(follow_chance, rng)
 
-            # TODO(andre:2018-05-28): Garantir que max_steps nunca é maior do que o numero de materiais
-            # TODO(andre:2018-12-20): Verificar o calculo do número de passos. Ele está usando a distância até a proxima presa e não a distância até o predador
-            num_steps = np.round(config.max_steps * np.random.rand(follow_quant) / np.exp(config.steps_distance_parameter * np.array([i[-1] for i in population_distance])))
-            new_population[follow_mask] = move_population_roulette(new_population[follow_mask], num_steps, roulette_array, population)
+        timer.add_time("follow_chance")
 
-            timer.add_time("follow_roulette")
+        # TODO(andre:2018-05-28): Garantir que max_steps nunca é maior do que o numero de materiais
+        # TODO(andre:2018-12-20): Verificar o calculo do número de passos. Ele está usando a distância até a proxima presa e não a distância até o predador
+        num_steps = np.round(config.max_steps * rng.random(follow_quant) / np.exp(config.steps_distance_parameter * population_distance[np.arange(follow_quant), follow_indices - 1]))
+        new_population[follow_mask] = move_population_roulette(new_population[follow_mask], num_steps, roulette, population, rng)
 
-            num_steps = np.round(config.min_steps * np.random.rand(follow_quant))
-            new_population[follow_mask] = move_population_random(new_population[follow_mask], num_steps)
+        timer.add_time("follow_roulette")
 
-            timer.add_time("follow_random")
+        num_steps = np.round(config.min_steps * rng.random(follow_quant))
+        new_population[follow_mask] = move_population_random(new_population[follow_mask], num_steps, rng)
 
-            num_steps = np.round(config.max_steps * np.random.rand(np.count_nonzero(run_mask)))
-            new_population[run_mask] = move_population_random_complement(new_population[run_mask], num_steps, population[-1])
+        timer.add_time("follow_random")
 
-            timer.add_time("run")
+        num_steps = np.round(config.max_steps * rng.random(np.count_nonzero(run_mask)))
+        new_population[run_mask] = move_population_random_complement(new_population[run_mask], num_steps, population[-1], rng)
 
-            new_population[best_prey_mask] = move_population_local_search(new_population[best_prey_mask], counter_fitness, config.min_steps, config.local_search_tries, instance, student, timer)
+        timer.add_time("run")
 
-            timer.add_time()
+        new_population[best_prey_mask] = move_population_local_search(new_population[best_prey_mask], counter_fitness_population, config.min_steps, config.local_search_tries, instance, student_context, timer, rng,
+                                                                     count_evaluations if incremental_local_search else None)
 
-            num_steps = np.round(config.max_steps * np.random.rand(np.count_nonzero(predator_mask)))
-            new_population[predator_mask] = move_population_random(new_population[predator_mask], num_steps)
+        timer.add_time()
 
-            timer.add_time("predator_random")
+        num_steps = np.round(config.max_steps * rng.random(np.count_nonzero(predator_mask)))
+        new_population[predator_mask] = move_population_random(new_population[predator_mask], num_steps, rng)
 
-            num_steps = np.round(config.min_steps * np.random.rand(np.count_nonzero(predator_mask)))
-            worst_prey = np.repeat(population[-2][np.newaxis, :], np.count_nonzero(predator_mask), axis=0)
-            new_population[predator_mask] = move_population_direction(new_population[predator_mask], num_steps, worst_prey)
+        timer.add_time("predator_random")
 
-            timer.add_time("predator_follow")
+        num_steps = np.round(config.min_steps * rng.random(np.count_nonzero(predator_mask)))
+        worst_prey = np.repeat(population[-2][np.newaxis, :], np.count_nonzero(predator_mask), axis=0)
+        new_population[predator_mask] = move_population_direction(new_population[predator_mask], num_steps, worst_prey, rng)
 
-            population = new_population
+        timer.add_time("predator_follow")
 
-        survival_values = np.apply_along_axis(counter_fitness, 1, population, instance, student, timer)
-        sorted_indices = np.argsort(survival_values)
-        population = population[sorted_indices]
-        survival_values = survival_values[sorted_indices]
+        population = new_population
 
-        if out_info is not None:
-            out_info["best_fitness"][-1].append(population_best_fitness)
-            fitness_function(population_best_individual, instance, student, timer, data=out_info["partial_fitness"][-1])
-            out_info["perf_counter"][-1].append(time.perf_counter() - start_perf_counter)
-            out_info["process_time"][-1].append(time.process_time() - start_process_time)
-            out_info["cost_value"][-1].append(cost_counter)
+        timer.pop()
 
-        results.append((population_best_individual, population_best_fitness))
+    survival_values = counter_fitness_population(population, instance, student_context, timer)
+    sorted_indices = np.argsort(survival_values)
+    population = population[sorted_indices]
+    survival_values = survival_values[sorted_indices]
 
-    return results
+    if trace is not None:
+        trace.record(population_best_fitness, population_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
+        trace.save(out_info)
+
+    return (population_best_individual, population_best_fitness)
 
 
 def read_files(instance_config_filename, config_filename):
@@ -209,8 +243,7 @@ if __name__ == "__main__":
     popularity = np.zeros((instance.num_materials,))
 
     for i in range(num_repetitions):
-        np.random.seed(i)
-        (individual, survival_value) = prey_predator_algorithm_binary(instance, config, fitness, out_info=out_info)
+        (individual, survival_value) = prey_predator_algorithm_binary(instance, config, fitness, out_info=out_info, seed=i)
 
         best_fitness.append(out_info["best_fitness"])
         perf_counter.append(out_info["perf_counter"])
@@ -1,5 +1,7 @@
 import numpy as np
 
+from acs.incremental_fitness import IncrementalFitness
+
 from utils.misc import hamming_distance
 
 # TODO(andre:2018-05-29): Fazer com que as funcoes de movimento realizem o
@@ -8,62 +10,55 @@ from utils.misc import hamming_distance
 # nenhuma mudanca seja realizada
 
 
-def move_population_roulette(population, num_steps, roulette, roulette_population):
-    new_population = np.copy(population)
-
-    step_order = np.random.rand(population.shape[0], population.shape[1]).argsort()
+def _get_move_mask(num_steps, shape, rng):
+    # Marca em cada linha as num_steps[i] primeiras posicoes da ordem dada por
+    # um sorteio (as mesmas posicoes que seriam percorridas passo a passo com
+    # argsort). Basta comparar cada chave com a num_steps[i]-esima menor chave
+    # da linha, obtida com np.partition
+    step_keys = rng.random(shape)
 
-    try:
-        biggest_num_steps = int(np.max(num_steps))
-    except ValueError:  # Caso follow_num_steps esteja vazio
-        biggest_num_steps = 0
+    # TODO(andre:2018-05-28): Garantir que max_steps nunca é maior do que o numero de materiais
+    num_steps = np.minimum(np.asarray(num_steps, dtype=int), shape[1])
 
-    for i in range(biggest_num_steps):
-        still_moving_mask = (num_steps > i)
+    if len(num_steps) == 0 or np.max(num_steps) == 0:  # Caso follow_num_steps esteja vazio
+        return np.zeros(shape, dtype=bool)
 
-        still_moving_indices = np.where(still_moving_mask)[0]
-        # TODO(andre:2018-05-28): Garantir que max_steps nunca é maior do que o numero de materiais
-        materials_indices = step_order[still_moving_mask, i]
+    biggest_num_steps = int(np.max(num_steps))
+    smallest_keys = np.sort(np.partition(step_keys, biggest_num_steps - 1, axis=1)[:, :biggest_num_steps], axis=1)
+    threshold = smallest_keys[np.arange(shape[0]), np.maximum(num_steps - 1, 0)]
 
-        still_moving_roulette = roulette[still_moving_mask]
-        follow_individual = [still_moving_roulette[index].spin() for index in np.ndindex(still_moving_roulette.shape)]
+    return (step_keys <= threshold[:, np.newaxis]) & (num_steps > 0)[:, np.newaxis]
 
-        new_population[still_moving_indices, materials_indices] = roulette_population[follow_individual, materials_indices]
-
-    return new_population
 
-
-def move_population_direction(population, num_steps, direction):
+def move_population_roulette(population, num_steps, roulette, roulette_population, rng):
     new_population = np.copy(population)
 
-    step_order = np.random.rand(population.shape[0], population.shape[1]).argsort()
+    move_mask = _get_move_mask(num_steps, population.shape, rng)
+
+    # Cada material copiado vem de uma presa sorteada pela roleta do individuo
+    (moving_indices, materials_indices) = np.where(move_mask)
+    follow_individual = roulette.spin(moving_indices)
 
-    try:
-        biggest_num_steps = int(np.max(num_steps))
-    except ValueError:  # Caso follow_num_steps esteja vazio
-        biggest_num_steps = 0
+    new_population[moving_indices, materials_indices] = roulette_population[follow_individual, materials_indices]
 
-    for i in range(biggest_num_steps):
-        still_moving_mask = (num_steps > i)
+    return new_population
 
-        still_moving_indices = np.where(still_moving_mask)[0]
-        # TODO(andre:2018-05-28): Garantir que max_steps nunca é maior do que o numero de materiais
-        materials_indices = step_order[still_moving_mask, i]
 
-        new_population[still_moving_indices, materials_indices] = direction[still_moving_indices, materials_indices]
+def move_population_direction(population, num_steps, direction, rng):
+    move_mask = _get_move_mask(num_steps, population.shape, rng)
 
-    return new_population
+    return np.where(move_mask, direction, population)
 
 
-def move_population_random(population, num_steps):
-    directions = np.random.randint(2, size=population.shape, dtype=bool)
-    new_population = move_population_direction(population, num_steps, directions)
+def move_population_random(population, num_steps, rng):
+    directions = rng.integers(2, size=population.shape, dtype=bool)
+    new_population = move_population_direction(population, num_steps, directions, rng)
 
     return new_population
 
 
-def move_population_random_complement(population, num_steps, away_direction):
-    directions = np.random.randint(2, size=population.shape, dtype=bool)
+def move_population_random_complement(population, num_steps, away_direction, rng):
+    directions = rng.integers(2, size=population.shape, dtype=bool)
     complement_directions = ~directions
 
     distances = hamming_distance(directions, away_direction, axis=1)
@@ -71,20 +66,48 @@ def move_population_random_complement(population, num_steps, away_direction):
 
     farther_directions = np.where(np.repeat((distances > complement_distances)[:, np.newaxis], population.shape[1], axis=1), directions, complement_directions)
 
-    new_population = move_population_direction(population, num_steps, farther_directions)
+    new_population = move_population_direction(population, num_steps, farther_directions, rng)
 
     return new_population
 
 
-def move_population_local_search(population, fitness_function, max_steps, num_tries, instance, student, timer):
-    best_survival_values = np.apply_along_axis(fitness_function, 1, population, instance, student, timer)
+def move_population_local_search(population, fitness_population_function, max_steps, num_tries, instance, student, timer, rng, count_evaluations=None):
+    # Com count_evaluations cada tentativa muda poucos materiais e e avaliada
+    # pela troca apenas desses materiais (acs.incremental_fitness), que
+    # reproduz acs.objective.fitness. count_evaluations(n) cobra as avaliacoes
+    # no orcamento. Sem count_evaluations as tentativas sao avaliadas com
+    # fitness_population_function
+    if count_evaluations is not None:
+        return _move_population_local_search_incremental(population, count_evaluations, max_steps, num_tries, instance, student, rng)
+
+    best_survival_values = fitness_population_function(population, instance, student, timer)
     for i in range(num_tries):
-        num_steps = np.round(max_steps * np.random.rand(population.shape[0]))
-        temp_population = move_population_random(population, num_steps)
-        temp_survival_values = np.apply_along_axis(fitness_function, 1, temp_population, instance, student, timer)
+        num_steps = np.round(max_steps * rng.random(population.shape[0]))
+        temp_population = move_population_random(population, num_steps, rng)
+        temp_survival_values = fitness_population_function(temp_population, instance, student, timer)
 
         better_survival_values = (temp_survival_values < best_survival_values)
         population = np.where(np.repeat(better_survival_values[:, np.newaxis], population.shape[1], axis=1), temp_population, population)
         best_survival_values = np.where(better_survival_values, temp_survival_values, best_survival_values)
 
     return population
+
+
+def _move_population_local_search_incremental(population, count_evaluations, max_steps, num_tries, instance, student, rng):
+    evaluators = [IncrementalFitness(instance, student, individual) for individual in population]
+    best_survival_values = np.array([evaluator.fitness() for evaluator in evaluators])
+    count_evaluations(population.shape[0])
+
+    for i in range(num_tries):
+        num_steps = np.round(max_steps * rng.random(population.shape[0]))
+        temp_population = move_population_random(population, num_steps, rng)
+        count_evaluations(population.shape[0])
+
+        for k, evaluator in enumerate(evaluators):
+            changed_materials = np.where(temp_population[k] != population[k])[0]
+            if evaluator.flip_fitness(changed_materials) < best_survival_values[k]:
+                best_survival_values[k] = evaluator.flip(changed_materials)
+
+        population = np.array([evaluator.individual for evaluator in evaluators])
+
+    return population
@@ -4,189 +4,205 @@ import time
 import numpy as np
 import matplotlib.pyplot as plt
 
-from acs.objective import fitness, fitness_population
+from acs.objective import fitness, looped_fitness_population, evaluation_cost
+from acs.student_context import StudentContext
 from acs.instance import Instance, print_instance
 
-from utils.timer import Timer
+from utils.timer import Timer, NULL_TIMER
+from utils.learner_runner import run_learners
+from utils.trace import ConvergenceTrace
 from utils.roulette import Roulette
-from utils.misc import sigmoid, vector_size, random_on_unit_sphere, evaluate_population_random, evaluate_population_fixed, improve_population
+from utils.misc import sigmoid, vector_size, distance_matrix, random_on_unit_sphere, evaluate_population_random, evaluate_population_fixed, improve_population
 
 from ppa_c.config import Config, Evaluator
 from ppa_c.population_movement import move_population_direction, move_population_random, move_population_random_complement, move_population_local_search
 
 
-def prey_predator_algorithm_continuous(instance, config, fitness_function, out_info=None):
-    population_size = config.population_size
+def prey_predator_algorithm_continuous(instance, config, fitness_function, out_info=None, fitness_population_function=None, timer=None, num_learner_workers=1, seed=None, checkpoint=None):
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
+    timer.push("ppa_c")
+
+    results = run_learners(prey_predator_algorithm_continuous_student, instance, config, fitness_function, out_info, fitness_population_function, timer, num_learner_workers, seed, checkpoint)
+
+    timer.pop()
+
+    return results
 
+
+def prey_predator_algorithm_continuous_student(instance, config, fitness_function, student, rng, out_info=None, fitness_population_function=None, timer=None):
     if config.max_steps > instance.num_materials:
         config.max_steps = instance.num_materials
 
     if config.min_steps > config.max_steps:
         config.min_steps = config.max_steps
 
+    population_size = config.population_size
+
     if config.evaluator == Evaluator.FIXED_EVALUATOR:
         evaluate_function = evaluate_population_fixed
     else:
         evaluate_function = evaluate_population_random
 
-    def counter_fitness(individual, instance, student, timer, print_results=False, data=None):
+    def counter_fitness(individual, instance, student, timer=None, print_results=False, data=None):
         nonlocal cost_counter
-        cost_counter += 1
-        return fitness_function(individual, instance, student, timer, print_results, data=data)
+        result = fitness_function(individual, instance, student, timer, print_results, data=data)
+        cost_counter += evaluation_cost(fitness_function, 1)
+        return result
 
-    if out_info is not None:
-        out_info["best_fitness"] = []
-        out_info["partial_fitness"] = []
-        out_info["perf_counter"] = []
-        out_info["process_time"] = []
-        out_info["cost_value"] = []
-
-    results = []
-
-    for student in range(instance.num_learners):
-        cost_counter = 0
-        iteration_counter = 0
-        stagnation_counter = 0
-
-        if out_info is not None:
-            out_info['best_fitness'].append([])
-            out_info['partial_fitness'].append([])
-            out_info['perf_counter'].append([])
-            out_info['process_time'].append([])
-            out_info['cost_value'].append([])
+    if fitness_population_function is None:
+        fitness_population_function = looped_fitness_population(fitness_function)
 
-        timer = Timer()
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
 
-        population = np.random.rand(population_size, instance.num_materials) * (2 * config.max_position) - config.max_position
-        population_best_evaluation = evaluate_function(population[0])
-        population_best_fitness = counter_fitness(population_best_evaluation, instance, student, timer)
+    def counter_fitness_population(population, instance, student, timer=None, print_results=False, data=None):
+        nonlocal cost_counter
+        result = fitness_population_function(population, instance, student, timer, print_results, data=data)
+        cost_counter += evaluation_cost(fitness_population_function, population.shape[0])
+        return result
 
-        start_perf_counter = time.perf_counter()
-        start_process_time = time.process_time()
-        while ((not config.cost_budget or cost_counter < config.cost_budget) and
-               (not config.num_iterations or iteration_counter < config.num_iterations) and
-               (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
-            timer.add_time()
-            population_evaluation = evaluate_function(population)
-            survival_values = np.apply_along_axis(counter_fitness, 1, population_evaluation, instance, student, timer)
+    cost_counter = 0
+    iteration_counter = 0
+    stagnation_counter = 0
 
-            sorted_indices = np.argsort(survival_values)
-            population = population[sorted_indices]
-            survival_values = survival_values[sorted_indices]
+    student_context = StudentContext(instance, student)
 
-            iteration_counter += 1
-            if survival_values[0] < population_best_fitness:
-                population_best_evaluation = population_evaluation[sorted_indices[0]]
-                population_best_fitness = survival_values[0]
+    trace = None
+    if out_info is not None:
+        trace = ConvergenceTrace.from_config(config)
+
+    population = rng.random((population_size, instance.num_materials)) * (2 * config.max_position) - config.max_position
+
+    # Com trace as penalidades parciais vem da avaliacao que encontrou a melhor solucao
+    data = None if trace is None else []
+    population_best_evaluation = evaluate_function(population[0], rng)
+    population_best_fitness = counter_fitness(population_best_evaluation, instance, student_context, timer, data=data)
+    population_best_partial_fitness = None if trace is None else data[0]
+
+    start_perf_counter = time.perf_counter()
+    start_process_time = time.process_time()
+    while ((not config.cost_budget or cost_counter < config.cost_budget) and
+           (not config.num_iterations or iteration_counter < config.num_iterations) and
+           (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
+        timer.push("iteration")
+        timer.add_time()
+        population_evaluation = evaluate_function(population, rng)
+        data = None if trace is None else []
+        survival_values = counter_fitness_population(population_evaluation, instance, student_context, timer, data=data)
 
-                stagnation_counter = 0
-            else:
-                stagnation_counter += 1
+        sorted_indices = np.argsort(survival_values)
+        population = population[sorted_indices]
+        survival_values = survival_values[sorted_indices]
 
-            if out_info is not None:
-                out_info["best_fitness"][-1].append(population_best_fitness)
-                fitness_function(population_best_evaluation, instance, student, timer, data=out_info["partial_fitness"][-1])
-                out_info["perf_counter"][-1].append(time.perf_counter() - start_perf_counter)
-                out_info["process_time"][-1].append(time.process_time() - start_process_time)
-                out_info["cost_value"][-1].append(cost_counter)
+        iteration_counter += 1
+        if survival_values[0] < population_best_fitness:
+            population_best_evaluation = population_evaluation[sorted_indices[0]]
+            population_best_fitness = survival_values[0]
+            if trace is not None:
+                population_best_partial_fitness = data[sorted_indices[0]]
 
-            new_population = np.copy(population)
+            stagnation_counter = 0
+        else:
+            stagnation_counter += 1
 
-            timer.add_time("creation")
+        if trace is not None and trace.should_record(cost_counter, population_best_fitness):
+            trace.record(population_best_fitness, population_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
 
-            # Cria as mascaras para separar os diferentes tipos de individuo
-            best_prey_mask = np.zeros(population_size, dtype=bool)
-            best_prey_mask[0] = True
+        new_population = np.copy(population)
 
-            predator_mask = np.zeros(population_size, dtype=bool)
-            predator_mask[-1] = True
+        timer.add_time("creation")
 
-            follow_mask = (np.random.rand(population_size) < config.follow_chance)
-            run_mask = ~follow_mask
+        # Cria as mascaras para separar os diferentes tipos de individuo
+        best_prey_mask = np.zeros(population_size, dtype=bool)
+        best_prey_mask[0] = True
 
-            follow_mask[best_prey_mask] = False  # Ignora as melhores presas
-            follow_mask[predator_mask] = False  # Ignora os predadores
+        predator_mask = np.zeros(population_size, dtype=bool)
+        predator_mask[-1] = True
 
-            run_mask[best_prey_mask] = False  # Ignora as melhores presas
-            run_mask[predator_mask] = False  # Ignora os predadores
+        follow_mask = (rng.random(population_size) < config.follow_chance)
+        run_mask = ~follow_mask
 
-            timer.add_time()
+        follow_mask[best_prey_mask] = False  # Ignora as melhores presas
+        follow_mask[predator_mask] = False  # Ignora os predadores
 
-            follow_indices = np.where(follow_mask)[0]
-            follow_quant = len(follow_indices)
+        run_mask[best_prey_mask] = False  # Ignora as melhores presas
+        run_mask[predator_mask] = False  # Ignora os predadores
 
-            tau = 1
-            follow_direction = np.empty((follow_quant, instance.num_materials))
-            for index in range(follow_quant):
-                i = follow_indices[index]
-                population_distance = vector_size(population - population[i])
-                survival_ratio = survival_values[i] / survival_values
+        timer.add_time()
 
-                population_direction = np.exp(survival_ratio ** tau - population_distance * 0.05)[:, np.newaxis] * (population - population[i])
-                individual_direction = np.sum(population_direction, axis=0)
-                normalized_direction = individual_direction / vector_size(individual_direction)
-                follow_direction[index] = normalized_direction
+        follow_indices = np.where(follow_mask)[0]
+        follow_quant = len(follow_indices)
 
-            # Gerar direção multidimensional
-            # https://stackoverflow.com/questions/6283080/random-unit-vector-in-multi-dimensional-space
+        # Matrizes (seguidores, populacao). A direcao de cada seguidor i e
+        # sum_j w_ij * (x_j - x_i) = (W . X)_i - (sum_j w_ij) * x_i
+        tau = 1
+        population_distance = distance_matrix(population[follow_indices], population)
+        survival_ratio = survival_values[follow_indices, np.newaxis] / survival_values[np.newaxis, :]
+        weights = np.exp(survival_ratio ** tau - population_distance * 0.05)
 
-            timer.add_time("follow_calculate_direction")
+        follow_direction = np.dot(weights, population) - np.sum(weights, axis=1)[:, np.newaxis] * population[follow_indices]
+        follow_direction /= vector_size(follow_direction)[:, np.newaxis]
 
-            # TODO(andre:2018-05-28): Garantir que max_steps nunca é maior do que o numero de materiais
-            omega = .5
-            predator_distance = survival_values[-1] - survival_values[follow_mask]
-            num_steps = config.max_steps * np.random.rand(follow_quant) / np.exp(config.steps_distance_parameter * predator_distance ** omega)
-            new_population[follow_mask] = move_population_direction(new_population[follow_mask], num_steps, follow_direction)
+        # Gerar direção multidimensional
+        # https://stackoverflow.com/questions/6283080/random-unit-vector-in-multi-dimensional-space
 
-            timer.add_time("follow_direction")
+        timer.add_time("follow_calculate_direction")
 
-            num_steps = np.round(config.min_steps * np.random.rand(follow_quant))
-            new_population[follow_mask] = move_population_random(new_population[follow_mask], num_steps)
+        # TODO(andre:2018-05-28): Garantir que max_steps nunca é maior do que o numero de materiais
+        omega = .5
+        predator_distance = survival_values[-1] - survival_values[follow_mask]
+        num_steps = config.max_steps * rng.random(follow_quant) / np.exp(config.steps_distance_parameter * predator_distance ** omega)
+        new_population[follow_mask] = move_population_direction(new_population[follow_mask], num_steps, follow_direction, rng)
 
-            timer.add_time("follow_random")
+        timer.add_time("follow_direction")
 
-            num_steps = np.round(config.max_steps * np.random.rand(np.count_nonzero(run_mask)))
-            new_population[run_mask] = move_population_random_complement(new_population[run_mask], num_steps, population[-1])
+        num_steps = np.round(config.min_steps * rng.random(follow_quant))
+        new_population[follow_mask] = move_population_random(new_population[follow_mask], num_steps, rng)
 
-            timer.add_time("run")
+        timer.add_time("follow_random")
 
-            new_population[best_prey_mask] = move_population_local_search(new_population[best_prey_mask], counter_fitness, evaluate_function, config.min_steps, config.local_search_tries, instance, student, timer)
+        num_steps = np.round(config.max_steps * rng.random(np.count_nonzero(run_mask)))
+        new_population[run_mask] = move_population_random_complement(new_population[run_mask], num_steps, population[-1], rng)
 
-            timer.add_time()
+        timer.add_time("run")
 
-            # TODO(andre:2018-12-17): Gerar uma direção dentro de um circulo unitário
-            # e multiplicar por max_steps para determinar a direção aleatória
-            num_steps = np.round(config.max_steps * np.random.rand(np.count_nonzero(predator_mask)))
-            new_population[predator_mask] = move_population_random(new_population[predator_mask], num_steps)
+        new_population[best_prey_mask] = move_population_local_search(new_population[best_prey_mask], counter_fitness_population, evaluate_function, config.min_steps, config.local_search_tries, instance, student_context, timer, rng)
 
-            timer.add_time("predator_random")
+        timer.add_time()
 
-            num_steps = np.round(config.min_steps * np.random.rand(np.count_nonzero(predator_mask)))
-            worst_prey = np.repeat(population[-2][np.newaxis, :], np.count_nonzero(predator_mask), axis=0)
-            new_population[predator_mask] = move_population_direction(new_population[predator_mask], num_steps, worst_prey)
+        # TODO(andre:2018-12-17): Gerar uma direção dentro de um circulo unitário
+        # e multiplicar por max_steps para determinar a direção aleatória
+        num_steps = np.round(config.max_steps * rng.random(np.count_nonzero(predator_mask)))
+        new_population[predator_mask] = move_population_random(new_population[predator_mask], num_steps, rng)
 
-            timer.add_time("predator_follow")
+        timer.add_time("predator_random")
 
-            new_population = np.clip(new_population, -config.max_position, config.max_position)
+        num_steps = np.round(config.min_steps * rng.random(np.count_nonzero(predator_mask)))
+        worst_prey = np.repeat(population[-2][np.newaxis, :], np.count_nonzero(predator_mask), axis=0)
+        new_population[predator_mask] = move_population_direction(new_population[predator_mask], num_steps, worst_prey, rng)
 
-            population = new_population
+        timer.add_time("predator_follow")
 
-        population_evaluation = evaluate_function(population)
-        survival_values = np.apply_along_axis(counter_fitness, 1, population_evaluation, instance, student, timer)
-        sorted_indices = np.argsort(survival_values)
-        population_evaluation = population_evaluation[sorted_indices]
-        survival_values = survival_values[sorted_indices]
+        new_population = np.clip(new_population, -config.max_position, config.max_position)
 
-        if out_info is not None:
-            out_info["best_fitness"][-1].append(population_best_fitness)
-            fitness_function(population_best_evaluation, instance, student, timer, data=out_info["partial_fitness"][-1])
-            out_info["perf_counter"][-1].append(time.perf_counter() - start_perf_counter)
-            out_info["process_time"][-1].append(time.process_time() - start_process_time)
-            out_info["cost_value"][-1].append(cost_counter)
+        population = new_population
 
-        results.append((population_best_evaluation, population_best_fitness))
+        timer.pop()
 
-    return results
+    population_evaluation = evaluate_function(population, rng)
+    survival_values = counter_fitness_population(population_evaluation, instance, student_context, timer)
+    sorted_indices = np.argsort(survival_values)
+    population_evaluation = population_evaluation[sorted_indices]
+    survival_values = survival_values[sorted_indices]
+
+    if trace is not None:
+        trace.record(population_best_fitness, population_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
+        trace.save(out_info)
+
+    return (population_best_evaluation, population_best_fitness)
 
 
 def read_files(instance_config_filename, config_filename):
@@ -229,8 +245,7 @@ if __name__ == "__main__":
     popularity = np.zeros((instance.num_materials,))
 
     for i in range(num_repetitions):
-        np.random.seed(i)
-        (individual, survival_value) = prey_predator_algorithm_continuous(instance, config, fitness, out_info=out_info)
+        (individual, survival_value) = prey_predator_algorithm_continuous(instance, config, fitness, out_info=out_info, seed=i)
 
         best_fitness.append(out_info["best_fitness"])
         perf_counter.append(out_info["perf_counter"])
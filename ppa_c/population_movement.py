@@ -3,7 +3,7 @@ import numpy as np
 from utils.misc import sigmoid, vector_size, random_on_unit_sphere, improve_population
 
 
-def move_population_direction(population, num_steps, direction):
+def move_population_direction(population, num_steps, direction, rng=None):
     new_population = np.copy(population)
     direction = direction / vector_size(direction)[:, np.newaxis]
 
@@ -12,16 +12,16 @@ def move_population_direction(population, num_steps, direction):
     return new_population
 
 
-def move_population_random(population, num_steps):
-    directions = random_on_unit_sphere((population.shape[0],), population.shape[1])
+def move_population_random(population, num_steps, rng):
+    directions = random_on_unit_sphere((population.shape[0],), population.shape[1], rng)
     # directions = np.random.randint(2, size=population.shape, dtype=bool)
     new_population = move_population_direction(population, num_steps, directions)
 
     return new_population
 
 
-def move_population_random_complement(population, num_steps, away_direction):
-    directions = random_on_unit_sphere((population.shape[0],), population.shape[1])
+def move_population_random_complement(population, num_steps, away_direction, rng):
+    directions = random_on_unit_sphere((population.shape[0],), population.shape[1], rng)
 
     distances = vector_size(away_direction - (population + directions), axis=1)
     complement_distances = vector_size(away_direction - (population - directions), axis=1)
@@ -33,15 +33,15 @@ def move_population_random_complement(population, num_steps, away_direction):
     return new_population
 
 
-def move_population_local_search(population, fitness_function, evaluate_function, max_steps, num_tries, instance, student, timer):
-    population_evaluation = evaluate_function(population)
-    best_survival_values = np.apply_along_axis(fitness_function, 1, population_evaluation, instance, student, timer)
+def move_population_local_search(population, fitness_population_function, evaluate_function, max_steps, num_tries, instance, student, timer, rng):
+    population_evaluation = evaluate_function(population, rng)
+    best_survival_values = fitness_population_function(population_evaluation, instance, student, timer)
 
     for i in range(num_tries):
-        num_steps = np.round(max_steps * np.random.rand(population.shape[0]))
-        temp_population = move_population_random(population, num_steps)
-        temp_population_evaluation = evaluate_function(temp_population)
-        temp_survival_values = np.apply_along_axis(fitness_function, 1, temp_population_evaluation, instance, student, timer)
+        num_steps = np.round(max_steps * rng.random(population.shape[0]))
+        temp_population = move_population_random(population, num_steps, rng)
+        temp_population_evaluation = evaluate_function(temp_population, rng)
+        temp_survival_values = fitness_population_function(temp_population_evaluation, instance, student, timer)
 
         (population, best_survival_values) = improve_population(population, best_survival_values, temp_population, temp_survival_values)
 
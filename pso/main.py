@@ -4,16 +4,32 @@ import time
 import numpy as np
 import matplotlib.pyplot as plt
 
-from acs.objective import fitness, fitness_population
+from acs.objective import fitness, looped_fitness_population, evaluation_cost
+from acs.student_context import StudentContext
 from acs.instance import Instance, print_instance
 
-from utils.timer import Timer
+from utils.timer import Timer, NULL_TIMER
+from utils.learner_runner import run_learners
+from utils.trace import ConvergenceTrace
 from utils.misc import sigmoid, evaluate_population_random, evaluate_population_fixed
 
 from pso.config import Config, Evaluator
 
 
-def particle_swarm_optmization(instance, config, fitness_function, out_info=None):
+def particle_swarm_optmization(instance, config, fitness_function, out_info=None, fitness_population_function=None, timer=None, num_learner_workers=1, seed=None, checkpoint=None):
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
+    timer.push("pso")
+
+    results = run_learners(particle_swarm_optmization_student, instance, config, fitness_function, out_info, fitness_population_function, timer, num_learner_workers, seed, checkpoint)
+
+    timer.pop()
+
+    return results
+
+
+def particle_swarm_optmization_student(instance, config, fitness_function, student, rng, out_info=None, fitness_population_function=None, timer=None):
     num_particles = config.num_particles
 
     if config.evaluator == Evaluator.FIXED_EVALUATOR:
@@ -21,112 +37,110 @@ def particle_swarm_optmization(instance, config, fitness_function, out_info=None
     else:
         evaluate_function = evaluate_population_random
 
-    def counter_fitness(individual, instance, student, timer, print_results=False, data=None):
-        nonlocal cost_counter
-        cost_counter += 1
-        return fitness_function(individual, instance, student, timer, print_results, data=data)
-
-    if out_info is not None:
-        out_info['best_fitness'] = []
-        out_info['partial_fitness'] = []
-        out_info['perf_counter'] = []
-        out_info['process_time'] = []
-        out_info['cost_value'] = []
-
-    results = []
-
-    for student in range(instance.num_learners):
-        cost_counter = 0
-        iteration_counter = 0
-        stagnation_counter = 0
-
-        if out_info is not None:
-            out_info['best_fitness'].append([])
-            out_info['partial_fitness'].append([])
-            out_info['perf_counter'].append([])
-            out_info['process_time'].append([])
-            out_info['cost_value'].append([])
-
-        timer = Timer()
-
-        timer.add_time()
-        particle_velocity = np.random.rand(num_particles, instance.num_materials) * (2 * config.max_velocity) - config.max_velocity
-        particle_position = evaluate_function(particle_velocity)
-
-        local_best_position = np.copy(particle_position)
-        local_best_fitness = np.apply_along_axis(counter_fitness, 1, local_best_position, instance, student, timer)
+    if fitness_population_function is None:
+        fitness_population_function = looped_fitness_population(fitness_function)
 
-        global_best_index = np.argmin(local_best_fitness, axis=0)
-        global_best_position = np.copy(local_best_position[global_best_index])
-        global_best_fitness = local_best_fitness[global_best_index]
+    # Os tempos so sao medidos quando um Timer e passado explicitamente
+    if timer is None:
+        timer = NULL_TIMER
 
-        timer.add_time("initialization")
+    def counter_fitness_population(population, instance, student, timer=None, print_results=False, data=None):
+        nonlocal cost_counter
+        result = fitness_population_function(population, instance, student, timer, print_results, data=data)
+        cost_counter += evaluation_cost(fitness_population_function, population.shape[0])
+        return result
 
-        start_perf_counter = time.perf_counter()
-        start_process_time = time.process_time()
-        while ((not config.cost_budget or cost_counter < config.cost_budget) and
-               (not config.num_iterations or iteration_counter < config.num_iterations) and
-               (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
-            old_global_best_fitness = global_best_fitness
+    cost_counter = 0
+    iteration_counter = 0
+    stagnation_counter = 0
 
-            if out_info is not None:
-                out_info["best_fitness"][-1].append(global_best_fitness)
-                fitness_function(global_best_position, instance, student, timer, data=out_info["partial_fitness"][-1])
-                out_info["perf_counter"][-1].append(time.perf_counter() - start_perf_counter)
-                out_info["process_time"][-1].append(time.process_time() - start_process_time)
-                out_info["cost_value"][-1].append(cost_counter)
+    student_context = StudentContext(instance, student)
 
-            timer.add_time()
-            local_influence = np.tile(config.local_influence_parameter * np.random.random(num_particles), (instance.num_materials, 1)).T
-            global_influence = np.tile(config.global_influence_parameter * np.random.random(num_particles), (instance.num_materials, 1)).T
+    trace = None
+    if out_info is not None:
+        trace = ConvergenceTrace.from_config(config)
 
-            local_distance = local_best_position.astype(int) - particle_position.astype(int)
-            global_distance = global_best_position.astype(int) - particle_position.astype(int)
+    timer.add_time()
+    particle_velocity = rng.random((num_particles, instance.num_materials)) * (2 * config.max_velocity) - config.max_velocity
+    particle_position = evaluate_function(particle_velocity, rng)
 
-            particle_velocity = (config.inertia_parameter * particle_velocity
-                                 + local_influence * local_distance
-                                 + global_influence * global_distance)
-            particle_velocity = np.clip(particle_velocity, -config.max_velocity, config.max_velocity)
-            timer.add_time("update_velocity")
+    # Com trace as penalidades parciais vem da avaliacao que encontrou a melhor solucao
+    data = None if trace is None else []
+    local_best_position = np.copy(particle_position)
+    local_best_fitness = counter_fitness_population(local_best_position, instance, student_context, timer, data=data)
+    local_best_partial_fitness = None if trace is None else np.array(data)
 
-            # Calcula as novas posições
-            particle_position = evaluate_function(particle_velocity)
-            timer.add_time("update_position")
+    global_best_index = np.argmin(local_best_fitness, axis=0)
+    global_best_position = np.copy(local_best_position[global_best_index])
+    global_best_fitness = local_best_fitness[global_best_index]
+    global_best_partial_fitness = None if trace is None else local_best_partial_fitness[global_best_index]
 
-            # Calcula os novos resultados
-            particle_new_fitness = np.apply_along_axis(counter_fitness, 1, particle_position, instance, student, timer)
-            timer.add_time("update_fitness")
+    timer.add_time("initialization")
 
-            # Calcula a mascara de melhores valores para cada particula
-            change_mask = (particle_new_fitness < local_best_fitness)
+    start_perf_counter = time.perf_counter()
+    start_process_time = time.process_time()
+    while ((not config.cost_budget or cost_counter < config.cost_budget) and
+           (not config.num_iterations or iteration_counter < config.num_iterations) and
+           (not config.max_stagnation or stagnation_counter < config.max_stagnation)):
+        timer.push("iteration")
+        old_global_best_fitness = global_best_fitness
 
-            # Altera o melhor resultado de cada particula
-            local_best_position[change_mask] = np.copy(particle_position[change_mask])
-            local_best_fitness[change_mask] = particle_new_fitness[change_mask]
+        if trace is not None and trace.should_record(cost_counter, global_best_fitness):
+            trace.record(global_best_fitness, global_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
 
-            # Encontra o melhor resultado entre todas as particulas
-            global_best_index = np.argmin(local_best_fitness)
-            global_best_position = np.copy(local_best_position[global_best_index])
-            global_best_fitness = local_best_fitness[global_best_index]
+        timer.add_time()
+        local_influence = np.tile(config.local_influence_parameter * rng.random(num_particles), (instance.num_materials, 1)).T
+        global_influence = np.tile(config.global_influence_parameter * rng.random(num_particles), (instance.num_materials, 1)).T
+
+        local_distance = local_best_position.astype(int) - particle_position.astype(int)
+        global_distance = global_best_position.astype(int) - particle_position.astype(int)
+
+        particle_velocity = (config.inertia_parameter * particle_velocity
+                             + local_influence * local_distance
+                             + global_influence * global_distance)
+        particle_velocity = np.clip(particle_velocity, -config.max_velocity, config.max_velocity)
+        timer.add_time("update_velocity")
+
+        # Calcula as novas posições
+        particle_position = evaluate_function(particle_velocity, rng)
+        timer.add_time("update_position")
+
+        # Calcula os novos resultados
+        data = None if trace is None else []
+        particle_new_fitness = counter_fitness_population(particle_position, instance, student_context, timer, data=data)
+        timer.add_time("update_fitness")
+
+        # Calcula a mascara de melhores valores para cada particula
+        change_mask = (particle_new_fitness < local_best_fitness)
+
+        # Altera o melhor resultado de cada particula
+        local_best_position[change_mask] = np.copy(particle_position[change_mask])
+        local_best_fitness[change_mask] = particle_new_fitness[change_mask]
+        if trace is not None:
+            local_best_partial_fitness[change_mask] = np.array(data)[change_mask]
+
+        # Encontra o melhor resultado entre todas as particulas
+        global_best_index = np.argmin(local_best_fitness)
+        global_best_position = np.copy(local_best_position[global_best_index])
+        global_best_fitness = local_best_fitness[global_best_index]
+        if trace is not None:
+            global_best_partial_fitness = local_best_partial_fitness[global_best_index]
 
-            iteration_counter += 1
-            if global_best_fitness < old_global_best_fitness:
-                stagnation_counter = 0
-            else:
-                stagnation_counter += 1
+        iteration_counter += 1
+        if global_best_fitness < old_global_best_fitness:
+            stagnation_counter = 0
+        else:
+            stagnation_counter += 1
 
-            timer.add_time("update_best")
+        timer.add_time("update_best")
 
-        if out_info is not None:
-            out_info["best_fitness"][-1].append(global_best_fitness)
-            fitness_function(global_best_position, instance, student, timer, data=out_info["partial_fitness"][-1])
-            out_info["perf_counter"][-1].append(time.perf_counter() - start_perf_counter)
-            out_info["process_time"][-1].append(time.process_time() - start_process_time)
-            out_info["cost_value"][-1].append(cost_counter)
+        timer.pop()
 
-        results.append((global_best_position, global_best_fitness))
+    if trace is not None:
+        trace.record(global_best_fitness, global_best_partial_fitness, time.perf_counter() - start_perf_counter, time.process_time() - start_process_time, cost_counter)
+        trace.save(out_info)
 
-    return results
+    return (global_best_position, global_best_fitness)
 
 
 def read_files(instance_config_filename, config_filename):
@@ -169,8 +183,7 @@ if __name__ == "__main__":
     popularity = np.zeros((instance.num_materials,))
 
     for i in range(num_repetitions):
-        np.random.seed(i)
-        (population, survival_values) = particle_swarm_optmization(instance, config, fitness, out_info=out_info)
+        (population, survival_values) = particle_swarm_optmization(instance, config, fitness, out_info=out_info, seed=i)
 
         best_fitness.append(out_info["best_fitness"])
         perf_counter.append(out_info["perf_counter"])
@@ -0,0 +1 @@
+python3 -m utils.scheduler instances/experiment_config.txt > results/experiment_output.txt
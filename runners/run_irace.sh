@@ -1,4 +1,10 @@
 export IRACE_HOME=/usr/local/lib/R/site-library/irace
 export PATH=${IRACE_HOME}/bin/:$PATH
 
+# O targetRunner (irace.client) usa o servidor para nao recarregar as
+# instancias a cada candidato. Sem o servidor, o irace.test e executado direto
+python3 -m irace.server --preload irace/ga/instances.txt &
+SERVER_PID=$!
+trap "kill $SERVER_PID" EXIT
+
 irace -s /evolutionary-computation/irace/ga/scenario.txt > results/irace_ga_output.txt
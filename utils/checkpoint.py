@@ -0,0 +1,85 @@
+import hashlib
+import os
+import pickle
+
+import numpy as np
+
+from acs.fitness_cache import FitnessCache
+from acs.instance_cache import instance_fingerprint
+
+
+def _describe_function(function):
+    if function is None:
+        return None
+
+    # FitnessCache ou FitnessCache.fitness_population
+    cache = getattr(function, '__self__', function)
+    if isinstance(cache, FitnessCache):
+        # Sem count_hits o custo depende dos acertos, que dependem do tamanho do cache
+        max_entries = None if cache.count_hits else cache.max_entries
+        return ('FitnessCache', getattr(function, '__name__', None), cache.count_hits, max_entries,
+                _describe_function(cache.fitness_function), _describe_function(cache.fitness_population_function))
+
+    return '{}.{}'.format(getattr(function, '__module__', None), getattr(function, '__qualname__', repr(function)))
+
+
+def _describe_value(value):
+    # Arrays (ex.: trace_cost_grid) sao identificados pelo conteudo e nao pelo pickle
+    if isinstance(value, np.ndarray):
+        return ('ndarray', value.dtype.str, value.shape, value.tobytes())
+
+    return value
+
+
+def get_checkpoint_key(name, config, seed, instance, fitness_function=None, fitness_population_function=None):
+    # Identifica a configuracao da execucao. Um checkpoint salvo com outra
+    # configuracao (incluindo a grade de custos do trace), semente, instancia
+    # (dados dos alunos e materiais ou pesos da funcao de avaliacao) ou forma
+    # de avaliacao (em lote ou individuo a individuo, com ou sem FitnessCache e
+    # seu count_hits) e ignorado e a unidade e executada de novo
+    config_values = [(attribute, _describe_value(value)) for attribute, value in sorted(vars(config).items())]
+    evaluation = (_describe_function(fitness_function), _describe_function(fitness_population_function))
+
+    key = hashlib.sha1()
+    key.update(pickle.dumps((name, config_values, seed, instance_fingerprint(instance), evaluation)))
+
+    return key.hexdigest()
+
+
+class Checkpoint:
+    # Guarda o resultado de cada aluno de uma repeticao de um algoritmo em
+    # dirname/name/<repeticao>/<aluno>.pickle assim que o aluno termina. Em uma
+    # nova execucao os alunos que ja possuem checkpoint sao carregados em vez
+    # de executados
+    def __init__(self, dirname, name, repetition, key):
+        self.dirname = os.path.join(dirname, name, str(repetition))
+        self.key = key
+
+    def get_filename(self, student):
+        return os.path.join(self.dirname, '{}.pickle'.format(student))
+
+    def load(self, student):
+        try:
+            with open(self.get_filename(student), 'rb') as file:
+                (key, result, student_info) = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+
+        if key != self.key:
+            return None
+
+        return (result, student_info)
+
+    def save(self, student, result, student_info):
+        filename = self.get_filename(student)
+
+        # O arquivo e escrito com outro nome e depois renomeado para que uma
+        # interrupcao durante a escrita nunca deixe um checkpoint incompleto
+        temp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        os.makedirs(self.dirname, exist_ok=True)
+        with open(temp_filename, 'wb') as file:
+            pickle.dump((self.key, result, student_info), file)
+        os.replace(temp_filename, filename)
+
+    def is_complete(self, num_learners):
+        return all(self.load(student) is not None for student in range(num_learners))
@@ -0,0 +1,82 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.timer import NULL_TIMER
+
+
+OUT_INFO_KEYS = ['best_fitness', 'partial_fitness', 'perf_counter', 'process_time', 'cost_value']
+
+
+def get_seed_sequence(seed):
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+
+    return np.random.SeedSequence(seed)
+
+
+def get_learner_rng(seed_sequence, student):
+    # Equivalente a seed_sequence.spawn(...)[student], mas nao depende de
+    # quantos filhos ja foram gerados a partir de seed_sequence
+    learner_sequence = np.random.SeedSequence(seed_sequence.entropy, spawn_key=seed_sequence.spawn_key + (student,))
+    return np.random.default_rng(learner_sequence)
+
+
+def run_learner(student_function, instance, config, fitness_function, student, fitness_population_function, timer, seed_sequence, record, checkpoint):
+    rng = get_learner_rng(seed_sequence, student)
+
+    student_info = {} if record else None
+    result = student_function(instance, config, fitness_function, student, rng, out_info=student_info,
+                              fitness_population_function=fitness_population_function, timer=timer)
+
+    if checkpoint is not None:
+        checkpoint.save(student, result, student_info)
+
+    return (result, student_info)
+
+
+def run_learners(student_function, instance, config, fitness_function, out_info=None, fitness_population_function=None, timer=None, num_workers=1, seed=None, checkpoint=None):
+    # Resolve o problema de cada aluno com student_function e junta os
+    # resultados e os dados de out_info na ordem dos alunos.
+    #
+    # seed pode ser um inteiro ou uma SeedSequence. Cada aluno recebe um
+    # numpy.random.Generator proprio derivado de seed, o que torna o resultado
+    # independente da ordem e da quantidade de processos. Sem seed, a
+    # SeedSequence usa entropia do sistema.
+    #
+    # Com checkpoint (utils.checkpoint.Checkpoint) o resultado de cada aluno e
+    # salvo assim que ele termina e os alunos ja salvos nao sao executados de novo
+    if timer is None:
+        timer = NULL_TIMER
+
+    seed_sequence = get_seed_sequence(seed)
+
+    # Os dados de out_info sempre sao salvos no checkpoint para que uma
+    # execucao retomada possa usa-los
+    record = out_info is not None or checkpoint is not None
+
+    learners = [None] * instance.num_learners
+    arguments = []
+    for student in range(instance.num_learners):
+        if checkpoint is not None:
+            learners[student] = checkpoint.load(student)
+            if learners[student] is not None:
+                continue
+
+        arguments.append((student_function, instance, config, fitness_function, student, fitness_population_function, timer, seed_sequence, record, checkpoint))
+
+    if (num_workers is None or num_workers > 1) and len(arguments) > 1:
+        # O timer e copiado para cada processo e os tempos medidos nao voltam
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(run_learner, *zip(*arguments)))
+    else:
+        results = [run_learner(*learner_arguments) for learner_arguments in arguments]
+
+    for learner_arguments, learner in zip(arguments, results):
+        learners[learner_arguments[4]] = learner
+
+    if out_info is not None:
+        for key in OUT_INFO_KEYS:
+            out_info[key] = [student_info[key] for result, student_info in learners]
+
+    return [result for result, student_info in learners]
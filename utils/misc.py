@@ -8,6 +8,16 @@ def hamming_distance(a, b, axis=None):
         return np.sum(a != b, axis=axis)
 
 
+def hamming_distance_matrix(a, b):
+    # Distancia de Hamming entre cada linha de a e cada linha de b, pelo
+    # produto de matrizes: |x| + |y| - 2 * (x . y). Os valores sao inteiros
+    # exatos em float64
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+
+    return np.sum(a, axis=1)[:, np.newaxis] + np.sum(b, axis=1)[np.newaxis, :] - 2 * np.dot(a, b.T)
+
+
 def get_integer(array):
     total = 0
     for shift, bit in enumerate(array[::-1]):
@@ -26,8 +36,8 @@ def sigmoid(array):
     return 1 / (1 + np.exp(-array));
 
 
-def random_on_unit_sphere(shape, ndim):
-    coord = np.random.normal(size=(shape + (ndim,)))
+def random_on_unit_sphere(shape, ndim, rng):
+    coord = rng.normal(size=(shape + (ndim,)))
     normalized_coord = coord / vector_size(coord)[:, np.newaxis]
     return normalized_coord
 
@@ -36,18 +46,42 @@ def vector_size(vector, axis=-1):
     return np.sqrt(np.sum(vector ** 2, axis))
 
 
-def evaluate_population_random(population):
+def distance_matrix(a, b):
+    # Distancia euclidiana entre cada linha de a e cada linha de b, pela
+    # identidade |x - y|^2 = |x|^2 + |y|^2 - 2 * (x . y). Os valores negativos
+    # causados por arredondamento sao trocados por zero
+    squared_distance = np.sum(a ** 2, axis=1)[:, np.newaxis] + np.sum(b ** 2, axis=1)[np.newaxis, :] - 2 * np.dot(a, b.T)
+
+    return np.sqrt(np.maximum(squared_distance, 0))
+
+
+def evaluate_population_random(population, rng):
     population_sigmoid = sigmoid(population)
-    population_random = np.random.random(population.shape)
+    population_random = rng.random(population.shape)
     population_evaluation = (population_sigmoid > population_random).astype(bool)
 
     return population_evaluation
 
 
-def evaluate_population_fixed(population):
+def evaluate_population_fixed(population, rng=None):
     return (population > 0)
 
 
+def sample_distinct_indices(size, num_indices, rng):
+    # Para cada i em range(size) sorteia num_indices indices distintos entre
+    # si e diferentes de i, na ordem em que foram sorteados. Cada indice e
+    # sorteado entre os que restam e depois deslocado para pular os ja
+    # escolhidos, em ordem crescente
+    chosen = np.arange(size)[:, np.newaxis]
+    for i in range(num_indices):
+        index = rng.integers(size - 1 - i, size=size)
+        for excluded in np.sort(chosen, axis=1).T:
+            index += (index >= excluded)
+        chosen = np.hstack((chosen, index[:, np.newaxis]))
+
+    return chosen[:, 1:]
+
+
 def improve_population(old_population, old_fitness, new_population, new_fitness):
     improve_mask = (new_fitness < old_fitness)
     best_population = np.where(improve_mask[:, np.newaxis], new_population, old_population)
@@ -0,0 +1,173 @@
+import json
+import time
+
+
+class _ProfileNode:
+    def __init__(self, name):
+        self.name = name
+        self.total_time = 0
+        self.calls = 0
+        self.sampled_calls = 0
+        self.children = {}
+
+    def child(self, name):
+        node = self.children.get(name)
+        if node is None:
+            node = _ProfileNode(name)
+            self.children[name] = node
+
+        return node
+
+
+class _ProfileFrame:
+    def __init__(self, node, active, entry_time, last_time):
+        self.node = node
+        self.active = active
+        self.entry_time = entry_time
+        self.last_time = last_time
+
+
+class _ProfileScope:
+    def __init__(self, profiler, name, sample):
+        self.profiler = profiler
+        self.name = name
+        self.sample = sample
+
+    def __enter__(self):
+        self.profiler.push(self.name, self.sample)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.pop()
+
+
+class Profiler:
+    # Substituto hierarquico do Timer. Os tempos sao medidos com perf_counter_ns
+    # e organizados em escopos aninhados (ex.: algoritmo -> iteration -> fase ->
+    # fitness -> componente da avaliacao).
+    #
+    # add_time(name) tem a mesma semantica do Timer: atribui a name o tempo
+    # desde a ultima marcacao dentro do escopo atual. O tempo gasto em escopos
+    # filhos nao e contado nas marcacoes do escopo pai.
+    #
+    # Escopos abertos com sample=True so sao medidos a cada sample_every
+    # entradas. O tempo total desses escopos e estimado a partir das entradas medidas
+    def __init__(self, name='root', sample_every=1):
+        self.sample_every = sample_every
+        self.init_time(name)
+
+    def init_time(self, name='root'):
+        self.root = _ProfileNode(name)
+        self.root.calls = 1
+        self.root.sampled_calls = 1
+
+        now = time.perf_counter_ns()
+        self.start_time = now
+        self.stack = [_ProfileFrame(self.root, True, now, now)]
+
+    def add_time(self, name=None):
+        frame = self.stack[-1]
+        if not frame.active:
+            return
+
+        now = time.perf_counter_ns()
+        if name is not None:
+            node = frame.node.child(name)
+            node.total_time += now - frame.last_time
+            node.calls += 1
+            node.sampled_calls += 1
+
+        frame.last_time = now
+
+    def push(self, name, sample=False):
+        parent = self.stack[-1]
+        now = time.perf_counter_ns()
+
+        if not parent.active:
+            self.stack.append(_ProfileFrame(None, False, now, now))
+            return
+
+        node = parent.node.child(name)
+        node.calls += 1
+
+        active = (not sample) or self.sample_every <= 1 or (node.calls % self.sample_every == 1)
+        if active:
+            node.sampled_calls += 1
+
+        self.stack.append(_ProfileFrame(node, active, now, now))
+
+    def pop(self):
+        frame = self.stack.pop()
+        parent = self.stack[-1]
+        now = time.perf_counter_ns()
+
+        elapsed = now - frame.entry_time
+        if frame.active:
+            frame.node.total_time += elapsed
+
+        # O tempo do escopo filho nao e atribuido a proxima marcacao do pai
+        parent.last_time += elapsed
+
+    def scope(self, name, sample=False):
+        return _ProfileScope(self, name, sample)
+
+    def _estimated_tree(self, node, factor=1.0):
+        if node.sampled_calls > 0:
+            factor = factor * node.calls / node.sampled_calls
+
+        children = [self._estimated_tree(child, factor) for child in node.children.values()]
+        total_time = node.total_time * factor
+        if node is self.root:
+            total_time = max(time.perf_counter_ns() - self.start_time, sum(child['total_time'] for child in children))
+
+        return {
+            'name': node.name,
+            'total_time': total_time,
+            'calls': node.calls,
+            'sampled_calls': node.sampled_calls,
+            'children': children,
+        }
+
+    def to_dict(self):
+        return self._estimated_tree(self.root)
+
+    def save_json(self, filename):
+        with open(filename, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def folded(self):
+        # Formato usado pelo flamegraph.pl: "a;b;c <tempo exclusivo em ns>"
+        lines = []
+
+        def visit(tree, path):
+            path = path + [tree['name']]
+            self_time = tree['total_time'] - sum(child['total_time'] for child in tree['children'])
+            if self_time > 0:
+                lines.append('{} {}'.format(';'.join(path), int(round(self_time))))
+
+            for child in tree['children']:
+                visit(child, path)
+
+        visit(self.to_dict(), [])
+
+        return lines
+
+    def save_folded(self, filename):
+        with open(filename, 'w') as file:
+            for line in self.folded():
+                file.write(line + '\n')
+
+    def get_time(self):
+        result = []
+
+        def visit(tree, path):
+            for child in tree['children']:
+                child_path = path + [child['name']]
+                result.append('/'.join(child_path) + ": " + str(child['total_time'] / 1e9) + "s")
+                visit(child, child_path)
+
+        visit(self.to_dict(), [])
+
+        return result
+
+    def get_total_time(self):
+        return self.to_dict()['total_time'] / 1e9
@@ -0,0 +1,199 @@
+import os
+
+import numpy as np
+
+
+ITERATION_FIELDS = ['best_fitness', 'partial_fitness', 'perf_counter', 'process_time']
+
+KEY_FILENAME = 'key.txt'
+
+
+class ResultStore:
+    # Guarda os resultados em dirname/<algoritmo>/<repeticao>/<aluno>/<campo>.npy,
+    # um arquivo por campo de cada (algoritmo, repeticao, aluno). Novas
+    # repeticoes sao escritas em novos diretorios sem alterar os dados
+    # existentes, e as leituras usam np.load com mmap_mode para carregar
+    # apenas os trechos usados.
+    #
+    # Os campos sao 'selected_materials', 'cost_value' e os de ITERATION_FIELDS.
+    #
+    # Com key (ver utils.checkpoint.get_checkpoint_key) a chave da execucao e
+    # salva junto dos campos, e has_learner so considera os resultados salvos
+    # com a mesma chave. Assim uma nova execucao com outra configuracao,
+    # orcamento ou instancia nao reaproveita resultados antigos. Da mesma
+    # forma, load e load_cost_value com keys ({repeticao: chave}, ver
+    # utils.runner.get_method_keys) ignoram as repeticoes salvas com outra chave
+    def __init__(self, dirname):
+        self.dirname = dirname
+
+    def _get_dirname(self, name, repetition=None, learner=None):
+        path = [self.dirname, name]
+        if repetition is not None:
+            path.append(str(repetition))
+        if learner is not None:
+            path.append(str(learner))
+
+        return os.path.join(*path)
+
+    def _list(self, dirname):
+        if not os.path.isdir(dirname):
+            return []
+
+        return sorted(int(entry) for entry in os.listdir(dirname) if entry.isdigit())
+
+    def get_names(self):
+        if not os.path.isdir(self.dirname):
+            return []
+
+        return sorted(entry for entry in os.listdir(self.dirname) if os.path.isdir(os.path.join(self.dirname, entry)))
+
+    def get_repetitions(self, name):
+        return self._list(self._get_dirname(name))
+
+    def get_learners(self, name, repetition):
+        return self._list(self._get_dirname(name, repetition))
+
+    def _read_key(self, dirname):
+        try:
+            with open(os.path.join(dirname, KEY_FILENAME), 'r') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def has_learner(self, name, repetition, learner, key=None):
+        dirname = self._get_dirname(name, repetition, learner)
+
+        if not all(os.path.exists(os.path.join(dirname, field + '.npy')) for field in ITERATION_FIELDS + ['cost_value', 'selected_materials']):
+            return False
+
+        return key is None or self._read_key(dirname) == key
+
+    def has_repetition(self, name, repetition, num_learners, key=None):
+        return all(self.has_learner(name, repetition, learner, key) for learner in range(num_learners))
+
+    def _write(self, filename, write):
+        # Escreve com outro nome e renomeia para nunca deixar um arquivo incompleto
+        temp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(temp_filename, 'wb') as file:
+            write(file)
+        os.replace(temp_filename, filename)
+
+    def save_learner(self, name, repetition, learner, selected_materials, student_info, key=None):
+        dirname = self._get_dirname(name, repetition, learner)
+        os.makedirs(dirname, exist_ok=True)
+
+        # A chave antiga e removida antes e a nova e escrita por ultimo, entao
+        # a chave so existe quando todos os campos correspondem a ela
+        key_filename = os.path.join(dirname, KEY_FILENAME)
+        if os.path.exists(key_filename):
+            os.remove(key_filename)
+
+        fields = {field: np.asarray(student_info[field]) for field in ITERATION_FIELDS}
+        fields['cost_value'] = np.asarray(student_info['cost_value'])
+        fields['selected_materials'] = np.asarray(selected_materials)
+
+        for field, value in fields.items():
+            self._write(os.path.join(dirname, field + '.npy'), lambda file: np.save(file, value))
+
+        if key is not None:
+            self._write(key_filename, lambda file: file.write(key.encode()))
+
+    def save_repetition(self, name, repetition, selected_materials, out_info, key=None):
+        for learner in range(selected_materials.shape[0]):
+            student_info = {field: out_info[field][learner] for field in ITERATION_FIELDS + ['cost_value']}
+            self.save_learner(name, repetition, learner, selected_materials[learner], student_info, key)
+
+    def load_repetition(self, name, repetition, num_learners):
+        # Retorna (selected_materials, out_info) no mesmo formato de
+        # utils.runner.run_repetition
+        selected_materials = np.array([self.load_chunk(name, repetition, learner, 'selected_materials', mmap=False) for learner in range(num_learners)], dtype=bool)
+
+        out_info = {}
+        for field in ITERATION_FIELDS + ['cost_value']:
+            out_info[field] = [self.load_chunk(name, repetition, learner, field, mmap=False) for learner in range(num_learners)]
+
+        return (selected_materials, out_info)
+
+    def load_chunk(self, name, repetition, learner, field, mmap=True):
+        filename = os.path.join(self._get_dirname(name, repetition, learner), field + '.npy')
+
+        return np.load(filename, mmap_mode='r' if mmap else None)
+
+    def select_repetitions(self, name, repetitions=None, learners=None, keys=None):
+        # Sem repetitions usa as repeticoes de keys ou, sem keys, todas as
+        # salvas. Com keys mantem apenas as repeticoes em que todos os alunos
+        # foram salvos com a chave da repeticao
+        if repetitions is None:
+            repetitions = self.get_repetitions(name) if keys is None else sorted(keys)
+
+        if keys is None:
+            return list(repetitions)
+
+        selected = []
+        for repetition in repetitions:
+            repetition_learners = learners
+            if repetition_learners is None:
+                repetition_learners = self.get_learners(name, repetition)
+
+            if repetition in keys and len(repetition_learners) > 0 and all(self.has_learner(name, repetition, learner, keys[repetition]) for learner in repetition_learners):
+                selected.append(repetition)
+
+        return selected
+
+    def load_cost_value(self, name, repetitions=None, learners=None, keys=None):
+        # NOTE(andre:2019-08-09): Assim como em collect_repetitions, considera
+        # que os valores de custo sao os mesmos para todos os alunos mudando
+        # apenas o tamanho
+        repetitions = self.select_repetitions(name, repetitions, learners, keys)
+
+        cost_value = np.empty(0)
+        for repetition, learner in self._chunks(name, repetitions, learners):
+            chunk = self.load_chunk(name, repetition, learner, 'cost_value')
+            if len(chunk) > len(cost_value):
+                cost_value = chunk
+
+        return np.array(cost_value)
+
+    def load(self, name, field, repetitions=None, learners=None, keys=None):
+        # Retorna um array (repeticoes, alunos, ...) com os mesmos formatos de
+        # collect_repetitions. Nos campos por iteracao, os alunos com menos
+        # iteracoes sao completados com o ultimo valor
+        repetitions = self.select_repetitions(name, repetitions, learners, keys)
+        if learners is None:
+            learners = self.get_learners(name, repetitions[0])
+
+        if field == 'cost_value':
+            return self.load_cost_value(name, repetitions, learners)
+
+        num_iterations = None
+        if field in ITERATION_FIELDS:
+            num_iterations = len(self.load_cost_value(name, repetitions, learners))
+
+        result = None
+        for i, repetition in enumerate(repetitions):
+            for j, learner in enumerate(learners):
+                chunk = self.load_chunk(name, repetition, learner, field)
+
+                if result is None:
+                    shape = chunk.shape if num_iterations is None else (num_iterations,) + chunk.shape[1:]
+                    result = np.empty((len(repetitions), len(learners)) + shape, dtype=chunk.dtype)
+
+                if num_iterations is None:
+                    result[i, j] = chunk
+                else:
+                    result[i, j, :len(chunk)] = chunk
+                    result[i, j, len(chunk):] = chunk[-1]
+
+        return result
+
+    def _chunks(self, name, repetitions=None, learners=None):
+        if repetitions is None:
+            repetitions = self.get_repetitions(name)
+
+        for repetition in repetitions:
+            repetition_learners = learners
+            if repetition_learners is None:
+                repetition_learners = self.get_learners(name, repetition)
+
+            for learner in repetition_learners:
+                yield (repetition, learner)
@@ -1,70 +1,128 @@
-import random
+import numpy as np
 
 # http://www.keithschwarz.com/darts-dice-coins/
 
 
+def _row_cumsum(values, rows):
+    # Soma acumulada reiniciada no inicio de cada linha (rows esta ordenado)
+    cumsum = np.cumsum(values)
+    first = np.concatenate(([True], rows[1:] != rows[:-1]))
+    first_indices = np.where(first)[0]
+    row_start = (cumsum - values)[first_indices]
+
+    return cumsum - np.repeat(row_start, np.diff(np.append(first_indices, len(values))))
+
+
+def _alias_tables(distributions):
+    # Metodo de Vose aplicado a todas as linhas ao mesmo tempo. Os elementos
+    # pequenos (p < 1) sao percorridos em ordem e cada um fica com o primeiro
+    # grande cuja sobra acumulada (p - 1) cobre o inicio da sua falta acumulada
+    # (1 - p). Um grande que fica abaixo de 1 completa a sua coluna com o
+    # proximo grande, como na versao sequencial
+    (num_rows, size) = distributions.shape
+
+    # TODO(andre:2018-05-28): Definir como tratar a situação em que a soma das probabilidades é zero
+    distributions = distributions.astype(float)
+    distributions_sum = distributions.sum(axis=1)
+    distributions[distributions_sum == 0] = 1
+    distributions_sum[distributions_sum == 0] = size
+
+    # Faz com que a soma dos elementos de cada linha seja igual ao tamanho da linha
+    mass = (distributions * (size / distributions_sum[:, np.newaxis])).ravel()
+
+    prob = np.ones(num_rows * size)
+    alias = np.tile(np.arange(size), num_rows)
+    rows = np.repeat(np.arange(num_rows), size)
+
+    small = np.where(mass < 1)[0]
+    large = np.where(mass >= 1)[0]
+    if len(small) == 0 or len(large) == 0:
+        return (prob.reshape(num_rows, size), alias.reshape(num_rows, size))
+
+    deficit_end = _row_cumsum(1 - mass[small], rows[small])
+    excess_end = _row_cumsum(mass[large] - 1, rows[large])
+
+    # O deslocamento por linha permite fazer as buscas de todas as linhas de uma vez
+    offset = size + 1
+    small_key = rows[small] * offset + deficit_end - (1 - mass[small])
+    large_key = rows[large] * offset + excess_end
+
+    server = np.minimum(np.searchsorted(large_key, small_key, side='left'), len(large) - 1)
+    served = (rows[large[server]] == rows[small])
+    prob[small[served]] = mass[small[served]]
+    alias[small[served]] = large[server[served]] % size
+
+    # Falta de cada grande depois de atender os pequenos
+    last_served = np.searchsorted(small_key, large_key, side='right') - 1
+    has_served = (last_served >= 0) & (rows[small[np.maximum(last_served, 0)]] == rows[large])
+    large_deficit = np.where(has_served, deficit_end[np.maximum(last_served, 0)], 0) - excess_end
+
+    has_next = np.append(rows[large[1:]] == rows[large[:-1]], False)
+    moved = (large_deficit > 0) & has_next
+    prob[large[moved]] = 1 - large_deficit[moved]
+    alias[large[moved]] = large[np.where(moved)[0] + 1] % size
+
+    return (prob.reshape(num_rows, size), alias.reshape(num_rows, size))
+
+
 class Roulette:
-    def __init__(self, roulette_distribution, data=None):
-        distribution = roulette_distribution.copy()
-        distribution_size = len(distribution)
+    # rng e um numpy.random.Generator. Sem rng usa um gerador novo, sem semente
+    def __init__(self, roulette_distribution, data=None, rng=None):
+        distribution = np.asarray(roulette_distribution, dtype=float)
 
         if data is None:
-            data = range(distribution_size)
+            data = range(len(distribution))
 
-        self.alias = [None] * distribution_size
-        self.prob = [None] * distribution_size
+        (prob, alias) = _alias_tables(distribution[np.newaxis, :])
+        self.prob = prob[0]
+        self.alias = alias[0]
         self.data = data
 
-        distribution_sum = 0
-        for i in range(distribution_size):
-            distribution_sum += distribution[i]
-
-        # TODO(andre:2018-05-28): Definir como tratar a situação em que a soma das probabilidades é zero
-        if (distribution_sum == 0):
-            return
-
-        # Faz com que a soma dos elementos seja igual o tamanho da lista
-        normalize_factor = distribution_size / distribution_sum
-        for i in range(distribution_size):
-            distribution[i] *= normalize_factor
-
-        small = []
-        large = []
-        for i in range(distribution_size):
-            if distribution[i] < 1:
-                small.append(i)
-            else:
-                large.append(i)
-
-        while (len(small) > 0 and len(large) > 0):
-            small_element = small.pop()
-            large_element = large.pop()
-            self.prob[small_element] = distribution[small_element]
-            self.alias[small_element] = large_element
-
-            distribution[large_element] = (distribution[large_element] + distribution[small_element]) - 1
-            if (distribution[large_element] < 1):
-                small.append(large_element)
-            else:
-                large.append(large_element)
-
-        while (len(large) > 0):
-            large_element = large.pop()
-            self.prob[large_element] = 1
-
-        while (len(small) > 0):
-            small_element = small.pop()
-            self.prob[small_element] = 1
-
-    def spin(self):
-        index = random.randrange(len(self.prob))
-        prob = random.random()
+        if rng is None:
+            rng = np.random.default_rng()
+        self.rng = rng
+
+    def spin(self, size=None):
+        # Com size retorna um array com size sorteios
+        if size is not None:
+            indexes = self.rng.integers(len(self.prob), size=size)
+            probs = self.rng.random(size)
+
+            indexes = np.where(probs >= self.prob[indexes], self.alias[indexes], indexes)
+
+            return np.asarray(self.data)[indexes]
+
+        index = int(self.rng.integers(len(self.prob)))
+        prob = self.rng.random()
 
         if (prob >= self.prob[index]):
-            index = self.alias[index]
+            index = int(self.alias[index])
 
         return self.data[index]
 
 
-def roulette_spin(distribution):
-    return Roulette(distribution).spin()
+class StackedRoulette:
+    # Uma roleta por linha de roulette_distributions, todas com o mesmo
+    # tamanho (linhas menores podem ser completadas com zeros). Cada giro
+    # sorteia um indice de cada linha. Uma linha com soma zero e sorteada de
+    # forma uniforme entre todas as colunas, inclusive as completadas
+    def __init__(self, roulette_distributions, rng):
+        (self.prob, self.alias) = _alias_tables(np.atleast_2d(np.asarray(roulette_distributions, dtype=float)))
+        self.rng = rng
+
+    def __len__(self):
+        return self.prob.shape[0]
+
+    def spin(self, rows=None):
+        # Com rows sorteia apenas das linhas indicadas
+        if rows is None:
+            rows = np.arange(self.prob.shape[0])
+
+        indexes = self.rng.integers(self.prob.shape[1], size=len(rows))
+        probs = self.rng.random(len(rows))
+
+        return np.where(probs >= self.prob[rows, indexes], self.alias[rows, indexes], indexes)
+
+
+def roulette_spin(distribution, rng=None):
+    return Roulette(distribution, rng=rng).spin()
@@ -1,28 +1,147 @@
-import random
+import os
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 
+from utils.checkpoint import Checkpoint, get_checkpoint_key
+
+
+def get_repetition_seed(seed, repetition):
+    # Cada repeticao usa o filho repetition da SeedSequence de seed, que por sua
+    # vez e dividido entre os alunos em run_learners
+    return np.random.SeedSequence(seed, spawn_key=(repetition,))
+
+
+def run_repetition(method_function, fitness_function, instance, config, seed, kwargs):
+    # Os geradores aleatorios da repeticao dependem apenas de seed, para que o
+    # resultado seja o mesmo em qualquer processo ou ordem de execucao
+    out_info = {}
+    results = method_function(instance, config, fitness_function, out_info=out_info, seed=seed, **kwargs)
+
+    selected_materials = np.zeros((instance.num_learners, instance.num_materials), dtype=bool)
+    for j, result in enumerate(results):
+        selected_materials[j] = result[0]
+
+    return (selected_materials, out_info)
+
+
+def _run_repetitions(arguments, num_workers):
+    if num_workers is None:
+        num_workers = os.cpu_count()
+
+    if num_workers > 1 and len(arguments) > 1:
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(arguments))) as executor:
+            return list(executor.map(run_repetition, *zip(*arguments)))
+
+    return [run_repetition(*repetition_arguments) for repetition_arguments in arguments]
+
+
+def run_method(method_function, fitness_function, instance, config, num_repetitions, seed=0, result_format='simple', num_workers=1, **kwargs):
+    # Com num_workers > 1 (ou None para usar todos os processadores) as
+    # repeticoes sao executadas em paralelo, com os mesmos resultados da
+    # execucao serial. Os objetos passados em kwargs (ex.: FitnessCache,
+    # Profiler) sao copiados para cada processo e as alteracoes feitas neles
+    # nao voltam para o processo principal
+    arguments = [(method_function, fitness_function, instance, config, get_repetition_seed(seed, i), kwargs) for i in range(num_repetitions)]
+    repetitions = _run_repetitions(arguments, num_workers)
+
+    return collect_repetitions(instance, repetitions, result_format)
+
+
+def get_method_keys(methods, instance, repetitions, seed=0):
+    # Retorna {nome: {repeticao: chave}} com as chaves usadas por run_methods,
+    # para ler do ResultStore apenas as repeticoes da configuracao atual
+    keys = {}
+    for name, (method_function, fitness_function, config, kwargs) in methods.items():
+        keys[name] = {i: get_checkpoint_key(name, config, (seed, i), instance, fitness_function, kwargs.get('fitness_population_function')) for i in repetitions}
+
+    return keys
+
+
+def run_methods(methods, instance, num_repetitions, seed=0, result_format='simple', num_workers=None, checkpoint_dirname=None, result_store=None, first_repetition=0):
+    # Executa varios algoritmos distribuindo todos os pares (algoritmo,
+    # repeticao) entre os processos. methods e um dicionario
+    # {nome: (method_function, fitness_function, config, kwargs)} e o retorno
+    # e um dicionario {nome: resultado de run_method}.
+    #
+    # Com checkpoint_dirname o resultado de cada (algoritmo, repeticao, aluno)
+    # e salvo nesse diretorio assim que termina. Ao executar de novo, apenas as
+    # unidades sem checkpoint sao executadas e o resultado e o mesmo de uma
+    # execucao sem interrupcoes.
+    #
+    # Com result_store (utils.result_store.ResultStore) cada repeticao tambem e
+    # salva no armazenamento por aluno, junto com a mesma chave usada nos
+    # checkpoints. As repeticoes ja salvas com a mesma chave sao carregadas do
+    # armazenamento em vez de executadas, e nunca sao reescritas. Assim, para
+    # acrescentar repeticoes basta aumentar num_repetitions. As repeticoes sao
+    # numeradas a partir de first_repetition
+    repetition_indices = range(first_repetition, first_repetition + num_repetitions)
+
+    method_keys = get_method_keys(methods, instance, repetition_indices, seed)
+
+    arguments = []
+    keys = []
+    for name, (method_function, fitness_function, config, kwargs) in methods.items():
+        for i in repetition_indices:
+            key = method_keys[name][i]
+            keys.append((name, i, key))
+
+            repetition_kwargs = kwargs
+            if checkpoint_dirname is not None:
+                repetition_kwargs = dict(kwargs, checkpoint=Checkpoint(checkpoint_dirname, name, i, key))
+
+            arguments.append((method_function, fitness_function, instance, config, get_repetition_seed(seed, i), repetition_kwargs))
+
+    stored = []
+    if result_store is not None:
+        stored = [k for k, (name, i, key) in enumerate(keys) if result_store.has_repetition(name, i, instance.num_learners, key)]
+
+    # As repeticoes ja concluidas sao apenas carregadas, sem ocupar os processos
+    complete = [k for k, repetition_arguments in enumerate(arguments) if k not in stored and _is_complete(repetition_arguments, instance)]
+    pending = [k for k in range(len(arguments)) if k not in stored and k not in complete]
+
+    repetitions = [None] * len(arguments)
+    for k, repetition in zip(pending, _run_repetitions([arguments[k] for k in pending], num_workers)):
+        repetitions[k] = repetition
+    for k in complete:
+        repetitions[k] = run_repetition(*arguments[k])
+    for k in stored:
+        (name, i, key) = keys[k]
+        repetitions[k] = result_store.load_repetition(name, i, instance.num_learners)
+
+    if result_store is not None:
+        for k in pending + complete:
+            (name, i, key) = keys[k]
+            result_store.save_repetition(name, i, *repetitions[k], key=key)
+
+    results = {}
+    for k, name in enumerate(methods):
+        results[name] = collect_repetitions(instance, repetitions[k * num_repetitions:(k + 1) * num_repetitions], result_format)
+
+    return results
+
+
+def _is_complete(repetition_arguments, instance):
+    checkpoint = repetition_arguments[5].get('checkpoint')
+
+    return checkpoint is not None and checkpoint.is_complete(instance.num_learners)
+
+
+def collect_repetitions(instance, repetitions, result_format='simple'):
+    num_repetitions = len(repetitions)
 
-def run_method(method_function, fitness_function, instance, config, num_repetitions, seed=0, result_format='simple', **kwargs):
     best_fitness = []
     partial_fitness = []
     perf_counter = []
     process_time = []
     cost_value = []
 
-    out_info = {}
-
     selected_materials = np.zeros((num_repetitions, instance.num_learners, instance.num_materials), dtype=bool)
 
     # TODO(andre:2019-08-10): Calcular a quantidade de vezes que cada material foi selecionado para cada aluno
 
-    for i in range(num_repetitions):
-        np.random.seed(seed + i)
-        random.seed(seed + i)
-        results = method_function(instance, config, fitness_function, out_info=out_info, **kwargs)
-
-        for j, result in enumerate(results):
-            selected_materials[i, j] = result[0]
+    for i, (repetition_selected_materials, out_info) in enumerate(repetitions):
+        selected_materials[i] = repetition_selected_materials
 
         best_fitness.append(out_info["best_fitness"])
         partial_fitness.append(out_info["partial_fitness"])
@@ -30,7 +149,8 @@ def run_method(method_function, fitness_function, instance, config, num_repetiti
         process_time.append(out_info["process_time"])
 
         # NOTE(andre:2019-08-09): Considera que a lista de valores de custo
-        # possuem sempre os mesmo valores para cada algoritmo mudando apenas o tamanho
+        # possuem sempre os mesmo valores para cada algoritmo mudando apenas o tamanho.
+        # Com trace_cost_grid na configuracao todos os alunos usam a mesma grade
         for student_cost_value in out_info["cost_value"]:
             if len(student_cost_value) > len(cost_value):
                 new_cost_values = student_cost_value[len(cost_value):]
@@ -0,0 +1,237 @@
+import argparse
+import configparser
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from acs.objective import fitness, fitness_population
+from acs.instance import Instance
+
+from utils.checkpoint import get_checkpoint_key
+from utils.learner_runner import run_learner
+from utils.result_store import ResultStore
+from utils.runner import get_repetition_seed
+from utils.timer import NULL_TIMER
+
+from ppa_b.main import prey_predator_algorithm_binary_student
+from ppa_c.main import prey_predator_algorithm_continuous_student
+from pso.main import particle_swarm_optmization_student
+from ga.main import genetic_algorithm_student
+from de.main import differential_evolution_student
+
+import ppa_b.config
+import ppa_c.config
+import pso.config
+import ga.config
+import de.config
+
+
+# Executa uma matriz de experimentos (algoritmos x arquivos de configuracao x
+# instancias x sementes) dividida em tarefas de um aluno cada. Ver
+# instances/experiment_config.txt.
+#
+# Para executar:
+# python -m utils.scheduler instances/experiment_config.txt -w 8
+
+ALGORITHMS = {
+    'ppa_b': (prey_predator_algorithm_binary_student, ppa_b.config.Config),
+    'ppa_c': (prey_predator_algorithm_continuous_student, ppa_c.config.Config),
+    'pso': (particle_swarm_optmization_student, pso.config.Config),
+    'ga': (genetic_algorithm_student, ga.config.Config),
+    'de': (differential_evolution_student, de.config.Config),
+}
+
+
+class ExperimentConfig:
+    def __init__(self):
+        self.algorithms = list(ALGORITHMS)
+        self.configs = ['instances/{algorithm}_config.txt']
+        self.instances = []
+        self.seeds = [0]
+        self.cost_budget = None
+        self.results = 'results/experiment'
+
+    @classmethod
+    def load_from_file(cls, config_filename):
+        config = cls()
+
+        with open(config_filename, 'r') as config_file:
+            config_string = config_file.read()
+        config_values = configparser.ConfigParser(inline_comment_prefixes=(";",))
+        config_values.read_string(config_string)
+
+        section = config_values['section']
+
+        if config_values.has_option('section', 'acs.experiment.algorithms'):
+            config.algorithms = section['acs.experiment.algorithms'].split()
+
+        if config_values.has_option('section', 'acs.experiment.configs'):
+            config.configs = section['acs.experiment.configs'].split()
+
+        config.instances = section['acs.experiment.instances'].split()
+
+        if config_values.has_option('section', 'acs.experiment.seeds'):
+            config.seeds = [int(seed) for seed in section['acs.experiment.seeds'].split()]
+
+        if config_values.has_option('section', 'acs.experiment.costBudget'):
+            config.cost_budget = int(section['acs.experiment.costBudget'])
+
+        if config_values.has_option('section', 'acs.experiment.results'):
+            config.results = section['acs.experiment.results']
+
+        return config
+
+
+def _expand(patterns, **kwargs):
+    filenames = []
+    for pattern in patterns:
+        pattern = pattern.format(**kwargs)
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            raise FileNotFoundError("Nenhum arquivo encontrado para '{}'".format(pattern))
+        filenames.extend(matches)
+
+    return filenames
+
+
+def get_instance_label(instance_filename):
+    # instances/andre/500/instance.txt -> instances_andre_500_instance
+    return os.path.splitext(os.path.normpath(instance_filename))[0].replace(os.sep, '_')
+
+
+def get_run_name(algorithm, config_filename):
+    return '{}-{}'.format(algorithm, os.path.splitext(os.path.basename(config_filename))[0])
+
+
+def load_algorithm_config(algorithm, config_filename, cost_budget=None):
+    config = ALGORITHMS[algorithm][1].load_from_file(config_filename)
+    if cost_budget is not None:
+        config.cost_budget = cost_budget
+
+    return config
+
+
+def expand_tasks(experiment, store_dirname=None):
+    # Retorna as tarefas (algoritmo, configuracao, instancia, semente, aluno)
+    # ordenadas pelo custo esperado, das mais longas para as mais curtas, com
+    # o custo esperado e a chave da execucao de cada uma. A chave identifica a
+    # configuracao (incluindo o orcamento), a semente e o conteudo da
+    # instancia. As tarefas ja salvas em store_dirname com a mesma chave sao
+    # ignoradas, e as salvas com outra chave sao executadas de novo
+    tasks = []
+    for instance_filename in _expand(experiment.instances):
+        instance = Instance.load_from_file(instance_filename)
+        store = None if store_dirname is None else ResultStore(os.path.join(store_dirname, get_instance_label(instance_filename)))
+
+        for algorithm in experiment.algorithms:
+            for config_filename in _expand(experiment.configs, algorithm=algorithm):
+                config = load_algorithm_config(algorithm, config_filename, experiment.cost_budget)
+                name = get_run_name(algorithm, config_filename)
+
+                # O tempo de cada avaliacao cresce com a quantidade de materiais
+                expected_cost = (config.cost_budget or 0) * instance.num_materials
+
+                for seed in experiment.seeds:
+                    # Mesma chave de run_methods para a repeticao seed com seed=0
+                    key = get_checkpoint_key(name, config, (0, seed), instance, fitness, fitness_population)
+
+                    for learner in range(instance.num_learners):
+                        if store is not None and store.has_learner(name, seed, learner, key):
+                            continue
+
+                        tasks.append(((algorithm, config_filename, instance_filename, seed, learner), expected_cost, key))
+
+    tasks.sort(key=lambda task: -task[1])
+
+    return tasks
+
+
+# Instancias ja carregadas neste processo
+_instances = {}
+
+
+def get_instance(instance_filename):
+    instance = _instances.get(instance_filename)
+    if instance is None:
+        instance = Instance.load_from_file(instance_filename)
+        _instances[instance_filename] = instance
+
+    return instance
+
+
+def run_task(task, cost_budget=None):
+    (algorithm, config_filename, instance_filename, seed, learner) = task
+
+    instance = get_instance(instance_filename)
+
+    config = load_algorithm_config(algorithm, config_filename, cost_budget)
+    student_function = ALGORITHMS[algorithm][0]
+
+    # A semente s corresponde a repeticao s de run_method com seed=0, entao os
+    # resultados sao os mesmos de main.py
+    (result, student_info) = run_learner(student_function, instance, config, fitness, learner, fitness_population,
+                                         NULL_TIMER, get_repetition_seed(0, seed), True, None)
+
+    return (task, result[0], student_info)
+
+
+def _format_time(seconds):
+    seconds = int(seconds)
+    return '{}:{:02d}:{:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def run_experiment(experiment, num_workers=None, report_interval=5, file=sys.stdout):
+    # Os processos livres pegam a proxima tarefa da fila, entao um processo
+    # que termina tarefas curtas continua pegando tarefas enquanto outro
+    # executa uma longa. Como as tarefas mais longas sao enviadas primeiro, o
+    # final da execucao nao fica esperando por uma unica tarefa longa.
+    #
+    # Cada tarefa e salva no ResultStore de sua instancia assim que termina.
+    # Ao executar de novo, as tarefas ja salvas nao sao executadas
+    tasks = expand_tasks(experiment, experiment.results)
+    total_cost = sum(expected_cost for task, expected_cost, key in tasks)
+
+    print("{} tarefas".format(len(tasks)), file=file, flush=True)
+    if not tasks:
+        return
+
+    stores = {}
+    done_cost = 0
+    start_time = time.perf_counter()
+    last_report = start_time
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {executor.submit(run_task, task, experiment.cost_budget): (expected_cost, key) for task, expected_cost, key in tasks}
+
+        for done, future in enumerate(as_completed(futures), 1):
+            ((algorithm, config_filename, instance_filename, seed, learner), selected_materials, student_info) = future.result()
+            (expected_cost, key) = futures[future]
+
+            store = stores.get(instance_filename)
+            if store is None:
+                store = ResultStore(os.path.join(experiment.results, get_instance_label(instance_filename)))
+                stores[instance_filename] = store
+            store.save_learner(get_run_name(algorithm, config_filename), seed, learner, selected_materials, student_info, key)
+
+            done_cost += expected_cost
+
+            now = time.perf_counter()
+            if now - last_report >= report_interval or done == len(tasks):
+                last_report = now
+                elapsed = now - start_time
+                eta = elapsed * (total_cost - done_cost) / done_cost if done_cost else 0
+
+                print("[{}/{}] {:.1f}% decorrido {} restante {}".format(done, len(tasks), 100 * done_cost / total_cost if total_cost else 100,
+                                                                      _format_time(elapsed), _format_time(eta)), file=file, flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('experiment_config')
+    parser.add_argument('-w', '--workers', type=int)
+    parser.add_argument('--report-interval', type=float, default=5)
+    args = parser.parse_args()
+
+    run_experiment(ExperimentConfig.load_from_file(args.experiment_config), args.workers, args.report_interval)
@@ -1,4 +1,5 @@
 import time
+from contextlib import nullcontext
 
 
 class Timer:
@@ -22,6 +23,16 @@ class Timer:
 
         self.last_time = time.process_time()
 
+    # Escopos sao ignorados pelo Timer. Ver utils.profiler.Profiler
+    def push(self, name, sample=False):
+        pass
+
+    def pop(self):
+        pass
+
+    def scope(self, name, sample=False):
+        return nullcontext()
+
     def get_time(self):
         result = [name + ": " + str(duration) + "s" for (name, duration) in self.time_dict.items()]
 
@@ -44,3 +55,42 @@ class Timer:
             result += time
 
         return result
+
+
+class NullTimer:
+    # Mesma interface do Timer, mas sem medir nada. Usado por padrao nos
+    # algoritmos para que a instrumentacao nao tenha custo quando ninguem le os tempos
+    def __init__(self):
+        self.time_dict = {}
+        self.iterations_dict = {}
+        self.iterations = 0
+
+    def init_time(self):
+        pass
+
+    def add_time(self, name=None):
+        pass
+
+    def push(self, name, sample=False):
+        pass
+
+    def pop(self):
+        pass
+
+    def scope(self, name, sample=False):
+        return nullcontext()
+
+    def get_time(self):
+        return []
+
+    def get_iteration_time(self):
+        return []
+
+    def get_iterations(self):
+        return []
+
+    def get_total_time(self):
+        return 0
+
+
+NULL_TIMER = NullTimer()
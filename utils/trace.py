@@ -0,0 +1,137 @@
+import numpy as np
+
+
+NUM_PARTIAL_FITNESS = 5
+
+
+def log_cost_grid(cost_budget, num_points):
+    # Pontos espacados em escala logaritmica de 1 ate cost_budget
+    return np.unique(np.round(np.geomspace(1, cost_budget, num_points)).astype(np.int64))
+
+
+def linear_cost_grid(cost_budget, num_points):
+    return np.unique(np.round(np.linspace(1, cost_budget, num_points)).astype(np.int64))
+
+
+class ConvergenceTrace:
+    # Registro da convergencia de um aluno em arrays preenchidos por
+    # posicao, que dobram de tamanho quando ficam cheios. Substitui as listas
+    # de floats e tuplas de out_info.
+    #
+    # record_every registra apenas quando o custo passa de um multiplo de
+    # record_every e only_improvement apenas quando a melhor avaliacao
+    # melhora. Com as duas opcoes, basta uma delas ser satisfeita. O primeiro
+    # registro sempre e feito, e o registro final dos algoritmos nao consulta
+    # should_record.
+    #
+    # Com algum tipo de decimacao os alunos podem ter custos registrados
+    # diferentes, entao as curvas devem ser comparadas pelo cost_value.
+    #
+    # Com cost_grid (ver log_cost_grid) a curva e reamostrada durante a
+    # execucao nos custos da grade, e a decimacao e ignorada. Cada ponto da
+    # grade recebe o ultimo registro com custo menor ou igual a ele (melhor
+    # solucao ate aquele custo). Os pontos antes do primeiro registro recebem
+    # o primeiro registro e os pontos depois do ultimo, o ultimo. Assim todos
+    # os alunos e algoritmos ficam alinhados nos mesmos custos mesmo com
+    # tamanhos de populacao diferentes.
+    #
+    # As penalidades parciais da melhor solucao sao as da avaliacao que a
+    # encontrou (parametro data das funcoes de avaliacao), entao o registro
+    # nunca avalia a solucao de novo
+    def __init__(self, record_every=None, only_improvement=False, cost_grid=None, capacity=64):
+        self.record_every = record_every
+        self.only_improvement = only_improvement
+
+        self.cost_grid = None
+        if cost_grid is not None:
+            self.cost_grid = np.asarray(cost_grid, dtype=np.int64)
+            capacity = len(self.cost_grid)
+
+        # Ultimo registro recebido, usado para preencher a grade
+        self.last_record = None
+
+        self.size = 0
+        self.best_fitness = np.empty(capacity)
+        self.partial_fitness = np.empty((capacity, NUM_PARTIAL_FITNESS))
+        self.perf_counter = np.empty(capacity)
+        self.process_time = np.empty(capacity)
+        self.cost_value = np.empty(capacity, dtype=np.int64)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.trace_every, config.trace_only_improvement, config.trace_cost_grid)
+
+    def should_record(self, cost_value, best_fitness):
+        if self.cost_grid is not None:
+            return True
+
+        if self.size == 0 or (not self.record_every and not self.only_improvement):
+            return True
+
+        if self.record_every and cost_value // self.record_every > self.cost_value[self.size - 1] // self.record_every:
+            return True
+
+        return self.only_improvement and best_fitness < self.best_fitness[self.size - 1]
+
+    def _grow(self):
+        capacity = 2 * len(self.best_fitness)
+
+        for name in ['best_fitness', 'partial_fitness', 'perf_counter', 'process_time', 'cost_value']:
+            old_array = getattr(self, name)
+            new_array = np.empty((capacity,) + old_array.shape[1:], dtype=old_array.dtype)
+            new_array[:self.size] = old_array[:self.size]
+            setattr(self, name, new_array)
+
+    def _fill(self, end, record):
+        (best_fitness, partial_fitness, perf_counter, process_time) = record
+
+        self.best_fitness[self.size:end] = best_fitness
+        self.partial_fitness[self.size:end] = partial_fitness
+        self.perf_counter[self.size:end] = perf_counter
+        self.process_time[self.size:end] = process_time
+
+        self.size = end
+
+    def _record_grid(self, record, cost_value):
+        # Os pontos da grade com custo menor que cost_value ficam com o registro
+        # anterior e os pontos com custo igual, com o atual
+        before = np.searchsorted(self.cost_grid, cost_value, side='left')
+        if self.last_record is not None and before > self.size:
+            self._fill(before, self.last_record)
+
+        end = np.searchsorted(self.cost_grid, cost_value, side='right')
+        if end > self.size:
+            self._fill(end, record)
+
+        self.last_record = record
+
+    def record(self, best_fitness, best_partial_fitness, perf_counter, process_time, cost_value):
+        if self.cost_grid is not None:
+            record = (best_fitness, best_partial_fitness, perf_counter, process_time)
+            self._record_grid(record, cost_value)
+            return
+
+        if self.size == len(self.best_fitness):
+            self._grow()
+
+        i = self.size
+        self.best_fitness[i] = best_fitness
+        self.partial_fitness[i] = best_partial_fitness
+        self.perf_counter[i] = perf_counter
+        self.process_time[i] = process_time
+        self.cost_value[i] = cost_value
+
+        self.size += 1
+
+    def save(self, out_info):
+        if self.cost_grid is not None:
+            if self.last_record is not None:
+                self._fill(len(self.cost_grid), self.last_record)
+            self.cost_value[:self.size] = self.cost_grid[:self.size]
+
+        # Copia apenas as posicoes preenchidas para nao guardar a folga dos arrays
+        out_info['best_fitness'] = self.best_fitness[:self.size].copy()
+        out_info['partial_fitness'] = self.partial_fitness[:self.size].copy()
+        out_info['perf_counter'] = self.perf_counter[:self.size].copy()
+        out_info['process_time'] = self.process_time[:self.size].copy()
+        out_info['cost_value'] = self.cost_value[:self.size].copy()